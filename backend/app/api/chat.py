@@ -1,100 +1,127 @@
 """
 对话相关API - 集成Agent服务
 """
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Header
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Optional, AsyncIterator, Dict, List
+import asyncio
 import uuid
 import json
 import time
+from app.config import settings
 from app.utils.logger import logger
+from app.utils.turn_metrics import begin_turn
+from app.utils.deadline import DeadlineExceeded, start_deadline
 from app.services.ai.agent_service import agent_service
+from app.services.ai.scheduler import agent_scheduler, SchedulerBusyError, PRIORITY_VOICE, PRIORITY_CHAT
 from app.services.ai.context_manager import context_manager
+from app.services.ai.idempotency import idempotency_store
+from app.services.realtime.connection_manager import connection_manager, Connection
+from app.services.voice.stt_service import stt_service
+from app.utils.constants import SystemConfig
 
 router = APIRouter()
+
+AUDIO_QUEUE_SIZE = 256  # 流式音频块缓冲上限
+
+
 @router.get("/status")
 async def ws_status():
     """WebSocket连接状态"""
-    return {"connections": len(manager.active_connections)}
+    return {
+        **connection_manager.get_stats(),
+        "idempotency": idempotency_store.get_stats(),
+        "scheduler": agent_scheduler.get_stats()
+    }
 
 
 class SendMessageRequest(BaseModel):
     """发送消息请求"""
     message: str
     session_id: Optional[str] = None
+    idempotency_key: Optional[str] = None  # 也可通过 Idempotency-Key 请求头提供
 
 
 @router.post("/send")
-async def send_message(request: SendMessageRequest):
+async def send_message(request: SendMessageRequest,
+                       idempotency_key: Optional[str] = Header(None)):
     """
     发送对话消息 - 使用Agent执行
     
     - 接收用户消息
     - 通过Agent智能执行
     - 返回AI回复和执行结果
+    
+    带幂等键的重复请求共享同一次执行，完成后5分钟内直接返回原结果；
+    同一会话中正在执行的相同指令也会合并（replayed为true）
     """
     try:
-        session_id = request.session_id or str(uuid.uuid4())
-        user_message = request.message
-        
-        logger.info(f"📨 收到消息: {user_message}")
-        
-        # 获取会话上下文
-        context = await context_manager.get_context(session_id)
-        
-        # 如果是新会话，创建
-        if not context.get("history"):
-            await context_manager.create_session(session_id)
-        
-        # 保存用户消息
-        await context_manager.add_message(session_id, "user", user_message)
-        
-        # 解析指代
-        resolved_message = context_manager.resolve_reference(
-            user_message,
-            context
+        key = idempotency_store.make_key(
+            "http", request.session_id, request.message,
+            request.idempotency_key or idempotency_key
         )
-        
-        # 使用Agent执行
-        chat_history = [
-            {"role": msg["role"], "content": msg["content"]}
-            for msg in context.get("history", [])[-5:]  # 最近5条
-        ]
-        
-        result = await agent_service.execute(resolved_message, chat_history)
-        
-        reply = result["output"]
-        steps = result["intermediate_steps"]
-        
-        # 如果没有回复内容，使用默认友好回复
-        if not reply or reply.strip() == "":
-            reply = "收到了，请稍等..."
-        
-        logger.info(f"💬 AI回复: {reply}")
-        
-        # 保存AI回复
-        await context_manager.add_message(session_id, "assistant", reply)
-        
-        # 更新上下文（保存最后的实体）
-        if steps:
-            last_tool_input = steps[-1].get("tool_input", {})
-            if "app_name" in last_tool_input:
-                await context_manager.update_context(session_id, {
-                    "last_entity": last_tool_input["app_name"]
-                })
-        
-        return {
-            "session_id": session_id,
-            "reply": reply,
-            "steps": steps,
-            "success": result["success"]
-        }
+        result, status = await idempotency_store.run(key, lambda: _handle_send(request))
+        return {**result, "replayed": status != "executed"}
     
+    except SchedulerBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"对话处理失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _handle_send(request: SendMessageRequest) -> Dict:
+    """执行一轮HTTP对话"""
+    session_id = request.session_id or str(uuid.uuid4())
+    user_message = request.message
+    metrics = begin_turn(session_id, settings.DEEPSEEK_MODEL)
+    start_deadline(SystemConfig.REQUEST_TIMEOUT)
+    
+    logger.info(f"📨 收到消息: {user_message}")
+    
+    # 获取会话上下文
+    context = await context_manager.get_context(session_id)
+    
+    # 解析指代
+    resolved_message = context_manager.resolve_reference(
+        user_message,
+        context
+    )
+    
+    # 使用Agent执行
+    chat_history = [
+        {"role": msg["role"], "content": msg["content"]}
+        for msg in context.get("history", [])[-5:]  # 最近5条
+    ]
+    
+    result = await agent_service.execute(resolved_message, chat_history)
+    
+    reply = result["output"]
+    steps = result["intermediate_steps"]
+    
+    # 如果没有回复内容，使用默认友好回复
+    if not reply or reply.strip() == "":
+        reply = "收到了，请稍等..."
+    
+    logger.info(f"💬 AI回复: {reply}")
+    
+    # 一次事务保存本轮对话（会话、用户消息、AI回复、最后的实体）
+    await context_manager.commit_turn(
+        session_id, user_message, reply, _next_context(context, steps), metrics.finish()
+    )
+    
+    return {
+        "session_id": session_id,
+        "reply": reply,
+        "steps": steps,
+        "success": result["success"],
+        "route": result.get("route")
+    }
+
+
 @router.get("/history")
 async def get_history(session_id: str, limit: int = 50):
     """
@@ -108,34 +135,388 @@ async def get_history(session_id: str, limit: int = 50):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-class ConnectionManager:
-    """WebSocket连接管理器 - 性能优化版"""
+@router.get("/stream")
+async def stream_message_get(message: str, session_id: Optional[str] = None):
+    """
+    SSE流式对话（GET，供浏览器EventSource使用）
+    """
+    return _sse_response(session_id or str(uuid.uuid4()), message)
+
+
+@router.post("/stream")
+async def stream_message(request: SendMessageRequest):
+    """
+    SSE流式对话 - 不支持WebSocket的客户端/代理使用
+    
+    与WebSocket推送相同的事件（thinking、token、step_update、chat_response），
+    每个事件立即写出；无事件时定期发送保活注释
+    """
+    return _sse_response(request.session_id or str(uuid.uuid4()), request.message)
+
+
+def _sse_response(session_id: str, user_message: str) -> StreamingResponse:
+    """创建SSE响应"""
+    return StreamingResponse(
+        _sse_events(session_id, user_message),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",  # 禁止Nginx缓冲，保证事件立即送达
+        }
+    )
+
+
+def _sse_format(event_id: int, event_type: str, data: Dict) -> str:
+    """格式化为一条SSE事件"""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+
+async def _sse_events(session_id: str, user_message: str) -> AsyncIterator[str]:
+    """
+    执行一轮对话并产出SSE文本
+    
+    对话在独立任务中执行，等待事件超时即发送保活注释；
+    客户端断开时取消对话
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def produce():
+        try:
+            async for reply in _stream_chat_turn(session_id, user_message):
+                await queue.put(reply)
+        except Exception as e:
+            logger.error(f"❌ SSE对话执行失败: {e}")
+            await queue.put({"type": "error", "data": {"code": _error_code(e), "message": str(e)}})
+        finally:
+            await queue.put(None)
+    
+    task = asyncio.create_task(produce())
+    event_id = 0
+    try:
+        yield _sse_format(event_id, "session", {"session_id": session_id})
+        while True:
+            try:
+                reply = await asyncio.wait_for(queue.get(), timeout=SystemConfig.SSE_KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if reply is None:
+                break
+            event_id += 1
+            data = reply.get("data", {})
+            if "timestamp" in reply:
+                data = {**data, "timestamp": reply["timestamp"]}
+            yield _sse_format(event_id, reply["type"], data)
+    finally:
+        if not task.done():
+            task.cancel()
+            logger.info(f"🛑 SSE客户端已断开，取消对话: {user_message}")
+
+
+def _error_code(error: Exception) -> str:
+    """对话失败时返回给客户端的错误码"""
+    if isinstance(error, SchedulerBusyError):
+        return "server_busy"
+    if isinstance(error, DeadlineExceeded):
+        return "timeout"
+    return "turn_failed"
+
+
+def _next_context(context: Dict, steps: List[Dict]) -> Optional[Dict]:
+    """
+    根据本轮执行步骤计算新的会话上下文（记录最后操作的实体，供"关闭它"等指代使用）
+
+    Returns:
+        新的上下文；无需更新时返回None
+    """
+    if not steps:
+        return None
+    last_tool_input = steps[-1].get("tool_input") or {}
+    if isinstance(last_tool_input, dict) and "app_name" in last_tool_input:
+        return {**context.get("context", {}), "last_entity": last_tool_input["app_name"]}
+    return None
+
+
+async def _stream_chat_turn(session_id: str, user_message: str,
+                            priority: int = PRIORITY_CHAT) -> AsyncIterator[Dict]:
+    """
+    执行一轮对话，边执行边产出需要推送给客户端的消息（priority为调度优先级）
+    
+    - thinking: 开始处理
+    - token: LLM输出增量
+    - step_update: 工具开始（running）/结束（completed）
+    - chat_response: 最终回复
+    """
+    metrics = begin_turn(session_id, settings.DEEPSEEK_MODEL)
+    start_deadline(SystemConfig.REQUEST_TIMEOUT)
+    
+    # 推送"思考中"状态
+    yield {
+        "type": "thinking",
+        "data": {"status": "processing"}
+    }
+    
+    # 获取上下文（重连后沿用同一会话的历史和last_entity）
+    context = await context_manager.get_context(session_id)
+    
+    # 解析指代
+    resolved_message = context_manager.resolve_reference(user_message, context)
+    
+    chat_history = [
+        {"role": msg["role"], "content": msg["content"]}
+        for msg in context.get("history", [])[-5:]
+    ]
+    
+    if user_message:
+        events = agent_service.execute_stream(resolved_message, chat_history, priority)
+    else:
+        events = _single_event({
+            "type": "final",
+            "output": "请提供有效的文本指令",
+            "intermediate_steps": [],
+            "success": False
+        })
+    
+    # Agent执行，逐个事件实时转发
+    async for event in events:
+        event_type = event["type"]
+        
+        if event_type == "token":
+            yield {
+                "type": "token",
+                "data": {"delta": event["delta"]}
+            }
+        
+        elif event_type == "tool_start":
+            yield {
+                "type": "step_update",
+                "data": {
+                    "step_index": event["step_index"],
+                    "tool": event["tool"],
+                    "status": "running",
+                    "tool_input": event["tool_input"]
+                }
+            }
+        
+        elif event_type == "tool_end":
+            yield {
+                "type": "step_update",
+                "data": {
+                    "step_index": event["step_index"],
+                    "tool": event["tool"],
+                    "status": "completed",
+                    "result": event["result"]
+                }
+            }
+        
+        elif event_type == "final":
+            # 规范回复文本（避免空字符串导致前端无显示）
+            reply_text = event["output"] or "收到了，请稍等..."
+            
+            # 先发送最终回复，再落库
+            yield {
+                "type": "chat_response",
+                "data": {
+                    "text": reply_text,
+                    "steps": event["intermediate_steps"],
+                    "success": event["success"],
+                    "route": event.get("route")
+                },
+                "timestamp": int(time.time() * 1000)
+            }
+            
+            # 一次事务保存本轮对话（取消或失败的对话不落库）
+            await context_manager.commit_turn(
+                session_id, user_message, reply_text,
+                _next_context(context, event["intermediate_steps"]),
+                metrics.finish()
+            )
+
+
+async def _single_event(event: Dict) -> AsyncIterator[Dict]:
+    """把单个事件包装为异步事件流"""
+    yield event
+
+
+async def _turn_worker(conn: Connection):
+    """
+    连接级对话执行器：按顺序取出排队的对话，每轮在独立任务中执行，
+    使接收循环始终保持响应（心跳、取消）
+    """
+    while True:
+        user_message, idempotency_key = await conn.message_queue.get()
+        conn.running_turn = asyncio.create_task(
+            _run_chat_turn(conn, user_message, idempotency_key)
+        )
+        
+        try:
+            await conn.running_turn
+        except asyncio.CancelledError:
+            # 执行器自身被取消（连接关闭）时继续向上抛出
+            if asyncio.current_task().cancelling():
+                raise
+            logger.info(f"🛑 对话已取消: {user_message}")
+        except Exception as e:
+            logger.error(f"❌ 对话执行失败: {e}")
+            connection_manager.publish(conn.session_id, {
+                "type": "error",
+                "data": {"code": _error_code(e), "message": str(e)}
+            })
+        finally:
+            conn.running_turn = None
+
+
+async def _run_chat_turn(conn: Connection, user_message: str,
+                         idempotency_key: Optional[str] = None):
+    """
+    执行一轮对话，事件推送给订阅该会话的所有设备
+    （各设备独立排队发送；断线期间的消息暂存待补发）
     
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.heartbeat_interval = 30  # 心跳间隔（秒）
-        self.message_queue = {}  # 消息队列，支持优先级处理
+    带幂等键的重复指令不再执行，只向本连接重放原执行的最终回复
+    （客户端按幂等键去重；不带幂等键的合并指令已通过会话推送收到事件）
+    """
+    session_id = conn.session_id
     
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"✅ WebSocket已连接，当前连接数: {len(self.active_connections)}")
+    async def execute() -> Optional[Dict]:
+        final = None
+        async for reply in _stream_chat_turn(session_id, user_message, PRIORITY_VOICE):
+            connection_manager.publish(session_id, reply)
+            if reply["type"] == "chat_response":
+                final = reply
+        return final
     
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        logger.info(f"👋 WebSocket已断开，当前连接数: {len(self.active_connections)}")
+    key = idempotency_store.make_key("ws", session_id, user_message, idempotency_key)
+    final, status = await idempotency_store.run(key, execute)
+    if status != "executed" and idempotency_key and final is not None:
+        await connection_manager.send_message({
+            **final,
+            "data": {**final["data"], "replayed": True}
+        }, conn)
+
+
+async def _submit_turn(conn: Connection, user_message: str,
+                       idempotency_key: Optional[str] = None):
+    """提交对话到连接队列，队列已满时通知客户端"""
+    if not idempotency_key:
+        key = idempotency_store.make_key("ws", conn.session_id, user_message)
+        if idempotency_store.join_pending(key):
+            # 同一会话正在执行相同指令（如重复按键），其事件已推送给本连接，直接忽略
+            return
     
-    async def send_message(self, message: dict, websocket: WebSocket):
-        await websocket.send_text(json.dumps(message, ensure_ascii=False))
+    if not connection_manager.enqueue_turn(conn, user_message, idempotency_key):
+        logger.warning(f"⚠️ 对话队列已满，拒绝: {user_message}")
+        await connection_manager.send_message({
+            "type": "error",
+            "data": {
+                "code": "queue_full",
+                "message": "请求过多，请等待当前指令完成后再试"
+            }
+        }, conn)
 
 
-manager = ConnectionManager()
+def _start_audio_stream(conn: Connection, sample_rate: int):
+    """开始一段流式语音输入"""
+    _end_audio_stream(conn)
+    conn.audio_queue = asyncio.Queue(maxsize=AUDIO_QUEUE_SIZE)
+    conn.audio_task = asyncio.create_task(_run_audio_stream(conn, conn.audio_queue, sample_rate))
+
+
+def _end_audio_stream(conn: Connection):
+    """结束当前流式语音输入（已缓冲的音频仍会识别完）"""
+    if conn.audio_queue is not None:
+        if not _feed_audio(conn, None):
+            # 结束标记不能丢，否则识别任务一直等待：让出最早的音频块
+            conn.audio_queue.get_nowait()
+            conn.audio_queue.put_nowait(None)
+        conn.audio_queue = None
+
+
+def _feed_audio(conn: Connection, chunk: Optional[bytes]) -> bool:
+    """
+    写入一个PCM音频块，None表示音频结束
+
+    Returns:
+        是否已写入（识别跟不上、缓冲已满时丢弃并返回False）
+    """
+    try:
+        conn.audio_queue.put_nowait(chunk)
+    except asyncio.QueueFull:
+        conn.audio_dropped += 1
+        if conn.audio_dropped == 1:
+            logger.warning("⚠️ 音频缓冲已满，开始丢弃音频块")
+        return False
+    if conn.audio_dropped:
+        logger.warning(f"⚠️ 音频缓冲已恢复，共丢弃 {conn.audio_dropped} 个音频块")
+        conn.audio_dropped = 0
+    return True
+
+
+async def _run_audio_stream(conn: Connection, queue: asyncio.Queue, sample_rate: int):
+    """流式识别：推送中间/最终识别结果，最终结果直接作为对话提交"""
+    async def chunks() -> AsyncIterator[bytes]:
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                return
+            yield chunk
+    
+    try:
+        async for result in stt_service.recognize_stream(chunks(), sample_rate):
+            await connection_manager.send_message({
+                "type": "transcript",
+                "data": {
+                    "text": result.text,
+                    "confidence": result.confidence,
+                    "is_final": result.is_final
+                }
+            }, conn)
+            if result.is_final:
+                await _submit_turn(conn, result.text)
+        
+        await connection_manager.send_message({"type": "audio_end"}, conn)
+    except Exception as e:
+        logger.error(f"❌ 流式识别失败: {e}")
+        await connection_manager.send_message({
+            "type": "error",
+            "data": {"code": "stt_failed", "message": str(e)}
+        }, conn)
+
+
+async def _send_session(conn: Connection):
+    """通知客户端当前会话ID，并补发断线期间暂存的消息"""
+    session = await context_manager.get_session(conn.session_id)
+    await connection_manager.send_message({
+        "type": "session",
+        "data": {
+            "session_id": conn.session_id,
+            "resumed": session is not None
+        }
+    }, conn)
+    await connection_manager.replay(conn)
+
+
+def _extract_text(message: Dict) -> str:
+    """从客户端消息中提取对话文本"""
+    msg_data = message.get("data", {})
+    user_message = msg_data.get("text") if isinstance(msg_data, dict) else ""
+    if not user_message:
+        # 兼容纯文本或不同字段名
+        if isinstance(msg_data, str):
+            user_message = msg_data
+        else:
+            user_message = message.get("text") or message.get("content") or ""
+    return user_message
 
 
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """
     WebSocket连接 - 支持实时Agent执行
+    
+    接收循环只负责分发消息，对话在连接级执行器中运行，
+    执行期间仍可响应ping和cancel
     """
     # 记录握手来源信息，帮助排查跨域/地址问题
     try:
@@ -145,97 +526,90 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception:
         pass
 
-    await manager.connect(websocket)
-    session_id = str(uuid.uuid4())
+    # 客户端可通过 ?session_id= 恢复会话
+    conn = await connection_manager.connect(websocket, websocket.query_params.get("session_id"))
+    if not conn:
+        return
+    
+    if conn.worker is None:
+        conn.worker = asyncio.create_task(_turn_worker(conn))
+    await _send_session(conn)
     
     try:
         while True:
-            # 接收消息
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            # 接收消息（文本帧为JSON指令，二进制帧为PCM音频）
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            conn.touch()
+            
+            if frame.get("bytes") is not None:
+                # 未发送audio_start时按默认采样率自动开始
+                if conn.audio_queue is None:
+                    _start_audio_stream(conn, SystemConfig.AUDIO_SAMPLE_RATE)
+                if not _feed_audio(conn, frame["bytes"]) and conn.audio_dropped == 1:
+                    # 每次溢出只通知一次，客户端可提示用户重说
+                    await connection_manager.send_message({
+                        "type": "error",
+                        "data": {
+                            "code": "audio_overflow",
+                            "message": "语音识别跟不上，部分音频已丢弃"
+                        }
+                    }, conn)
+                continue
+            
+            message = json.loads(frame["text"])
             
             msg_type = message.get("type")
-            msg_data = message.get("data", {})
             
             logger.info(f"📨 WS收到: {msg_type}")
             
             # 处理不同类型的消息
             if msg_type == "ping":
                 # 心跳
-                await manager.send_message({
+                await connection_manager.send_message({
                     "type": "pong",
                     "timestamp": int(time.time() * 1000)
-                }, websocket)
+                }, conn)
             
             elif msg_type in ("chat", "text", "message"):
-                # 对话消息
-                user_message = msg_data.get("text") if isinstance(msg_data, dict) else ""
-                if not user_message:
-                    # 兼容纯文本或不同字段名
-                    if isinstance(msg_data, str):
-                        user_message = msg_data
-                    else:
-                        user_message = message.get("text") or message.get("content") or ""
-                
-                # 推送"思考中"状态
-                await manager.send_message({
-                    "type": "thinking",
-                    "data": {"status": "processing"}
-                }, websocket)
-                
-                # 获取上下文
-                context = await context_manager.get_context(session_id)
-                if not context.get("history"):
-                    await context_manager.create_session(session_id)
-                
-                # 保存用户消息
-                await context_manager.add_message(session_id, "user", user_message)
-                
-                # Agent执行
-                chat_history = [
-                    {"role": msg["role"], "content": msg["content"]}
-                    for msg in context.get("history", [])[-5:]
-                ]
-                
-                if user_message:
-                    result = await agent_service.execute(user_message, chat_history)
-                else:
-                    result = {"output": "请提供有效的文本指令", "intermediate_steps": [], "success": False}
-                
-                # 规范回复文本（避免空字符串导致前端无显示）
-                reply_text = result.get("output") or "收到了，请稍等..."
-
-                # 保存AI回复
-                await context_manager.add_message(session_id, "assistant", reply_text)
-                
-                # 推送执行步骤
-                for i, step in enumerate(result["intermediate_steps"]):
-                    await manager.send_message({
-                        "type": "step_update",
-                        "data": {
-                            "step_index": i,
-                            "tool": step["tool"],
-                            "status": "completed",
-                            "result": step["result"]
-                        }
-                    }, websocket)
-                
-                # 发送最终回复
-                await manager.send_message({
-                    "type": "chat_response",
-                    "data": {
-                        "text": reply_text,
-                        "steps": result["intermediate_steps"],
-                        "success": result["success"]
-                    },
+                # 对话消息：加入队列，由执行器异步处理
+                msg_data = message.get("data")
+                await _submit_turn(
+                    conn, _extract_text(message),
+                    msg_data.get("idempotency_key") if isinstance(msg_data, dict) else None
+                )
+            
+            elif msg_type == "audio_start":
+                # 开始流式语音：之后的二进制帧为16bit单声道PCM
+                msg_data = message.get("data") or {}
+                _start_audio_stream(conn, int(msg_data.get("sample_rate", SystemConfig.AUDIO_SAMPLE_RATE)))
+            
+            elif msg_type == "audio_end":
+                _end_audio_stream(conn)
+            
+            elif msg_type == "resume":
+                # 首帧恢复会话（不便携带查询参数的客户端）
+                msg_data = message.get("data") or {}
+                if msg_data.get("session_id"):
+                    conn = connection_manager.resume(conn, msg_data["session_id"])
+                    await _send_session(conn)
+            
+            elif msg_type == "cancel":
+                # 中止正在执行的对话（包括LLM调用和未完成的工具）
+                await connection_manager.send_message({
+                    "type": "cancelled",
+                    "data": connection_manager.cancel_turn(conn),
                     "timestamp": int(time.time() * 1000)
-                }, websocket)
+                }, conn)
             
             else:
                 logger.warning(f"未知消息类型: {msg_type}")
     
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
     except Exception as e:
         logger.error(f"❌ WebSocket错误: {e}")
-        manager.disconnect(websocket)
+    finally:
+        # 旧socket已被回收、连接由重连的新socket接管时，不能注销新socket
+        connection_manager.disconnect(conn.id, websocket)
@@ -0,0 +1,51 @@
+"""
+意图解析API - 批量解析（离线评估、回归测试）
+"""
+import time
+from collections import Counter
+from typing import List
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from app.services.ai.intent_parser import intent_parser
+from app.utils.constants import SystemConfig
+from app.utils.deadline import start_deadline
+
+router = APIRouter()
+
+
+class ParseBatchRequest(BaseModel):
+    """批量解析请求"""
+    texts: List[str]
+    use_llm: bool = True  # 为false时只使用规则和本地分类器
+
+
+@router.post("/parse_batch")
+async def parse_batch(request: ParseBatchRequest):
+    """
+    批量解析意图
+    
+    - 规则和本地分类器一次处理全部指令，剩余的才调用LLM（并发数受限）
+    - 每条结果附带来源：cache / rules / classifier / llm / fallback
+    """
+    if len(request.texts) > SystemConfig.INTENT_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"单次最多解析 {SystemConfig.INTENT_BATCH_MAX_SIZE} 条指令"
+        )
+    
+    start_deadline(SystemConfig.REQUEST_TIMEOUT)
+    start = time.perf_counter()
+    results = await intent_parser.parse_batch(request.texts, use_llm=request.use_llm)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    return {
+        "results": [
+            {**intent.model_dump(), "source": source}
+            for intent, source in results
+        ],
+        "stats": {
+            "count": len(results),
+            "sources": dict(Counter(source for _, source in results)),
+            "elapsed_ms": round(elapsed_ms, 2)
+        }
+    }
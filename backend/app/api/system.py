@@ -1,10 +1,14 @@
 """
 系统相关API
 """
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from typing import Optional
 import platform
 import psutil
+from app.services.ai.plan_cache import plan_cache
+from app.services.ai.intent_parser import intent_parser
+from app.services.ai.turn_ledger import turn_ledger
 
 router = APIRouter()
 
@@ -62,6 +66,40 @@ async def get_installed_apps():
     }
 
 
+@router.get("/caches")
+async def get_cache_stats():
+    """
+    获取缓存命中统计
+    """
+    return {
+        "plan_cache": plan_cache.get_stats(),
+        "intent_cache": intent_parser.get_stats()
+    }
+
+
+@router.get("/metrics/turns")
+async def get_turn_metrics(session_id: Optional[str] = None, limit: int = 50):
+    """
+    获取最近每轮对话的token与耗时统计
+    """
+    return {"turns": await turn_ledger.recent(session_id, limit)}
+
+
+@router.get("/metrics/{group_by}")
+async def get_aggregated_metrics(group_by: str, hours: int = 24):
+    """
+    按维度汇总最近若干小时的对话统计
+    
+    - hour: 按小时
+    - model: 按模型
+    - tool: 按工具（调用轮数和耗时）
+    - route: 按执行路径（fast_path / plan_cache / agent / simple）
+    """
+    if group_by not in ("hour", "model", "tool", "route"):
+        raise HTTPException(status_code=404, detail=f"不支持的汇总维度: {group_by}")
+    return {"group_by": group_by, "hours": hours, "rows": await turn_ledger.aggregate(group_by, hours)}
+
+
 @router.post("/config")
 async def update_config(request: ConfigRequest):
     """
@@ -6,6 +6,8 @@ from pydantic import BaseModel
 from typing import Optional, Dict, Any
 import uuid
 from app.tools.base_tool import tool_registry
+from app.services.ai.prompt_bundle import prompt_bundle_cache
+from app.services.ai.scheduler import agent_scheduler, SchedulerBusyError, PRIORITY_BATCH
 from app.utils.logger import logger
 
 router = APIRouter()
@@ -31,7 +33,7 @@ async def execute_task(request: ExecuteTaskRequest):
     执行工具任务
     
     - 接收工具名和参数
-    - 执行工具
+    - 执行工具（批量任务优先级最低，排在语音和对话之后）
     - 返回结果
     """
     try:
@@ -49,7 +51,8 @@ async def execute_task(request: ExecuteTaskRequest):
             )
         
         # 执行工具
-        result = await tool.safe_execute(**params)
+        async with agent_scheduler.slot(PRIORITY_BATCH):
+            result = await tool.safe_execute(**params)
         
         return {
             "task_id": str(uuid.uuid4()),
@@ -60,6 +63,10 @@ async def execute_task(request: ExecuteTaskRequest):
             "error": result.error
         }
     
+    except HTTPException:
+        raise
+    except SchedulerBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"任务执行失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -95,16 +102,10 @@ async def get_available_tools():
     """
     获取所有可用工具
     """
-    tools = tool_registry.get_all_tools()
+    bundle = prompt_bundle_cache.get()
     return {
-        "tools": [
-            {
-                "name": tool.name,
-                "description": tool.description,
-                "schema": tool.get_schema()
-            }
-            for tool in tools.values()
-        ]
+        "version": bundle.version,
+        "tools": bundle.tool_listing
     }
 
 
@@ -113,8 +114,8 @@ async def get_tool_schema(tool_name: str):
     """
     获取工具schema
     """
-    tool = tool_registry.get_tool(tool_name)
-    if not tool:
+    schema = prompt_bundle_cache.get().schemas.get(tool_name)
+    if schema is None:
         raise HTTPException(status_code=404, detail="工具不存在")
     
-    return tool.get_schema()
+    return schema
@@ -6,6 +6,8 @@ from pydantic import BaseModel
 from app.services.voice.stt_service import stt_service
 from app.services.voice.tts_service import tts_service
 from app.utils.logger import logger
+from app.utils.constants import SystemConfig
+from app.utils.deadline import start_deadline
 
 router = APIRouter()
 
@@ -36,6 +38,7 @@ async def recognize_voice(audio: UploadFile = File(...)):
     - 接收音频文件
     - 返回识别的文本和置信度
     """
+    start_deadline(SystemConfig.REQUEST_TIMEOUT)
     try:
         # 读取音频数据
         audio_data = await audio.read()
@@ -69,6 +72,7 @@ async def synthesize_voice(request: SynthesizeRequest):
     - 接收文本
     - 返回合成的音频（base64编码）
     """
+    start_deadline(SystemConfig.REQUEST_TIMEOUT)
     try:
         # 调用TTS服务
         result = await tts_service.synthesize(request.text, request.voice)
@@ -14,6 +14,12 @@ class Settings(BaseSettings):
     DEEPSEEK_BASE_URL: str = "https://dashscope.aliyuncs.com/compatible-mode/v1"
     DEEPSEEK_MODEL: str = "qwen-turbo"
     
+    # Agent模式：tool_calling（原生工具调用，同一回复中的多个工具并发执行）/ langchain（LangChain AgentExecutor）
+    AGENT_MODE: str = "tool_calling"
+    
+    # 工具执行完成后是否再调用一次LLM总结结果（关闭时一轮工具执行完即用模板生成回复，节省一次LLM往返）
+    AGENT_LLM_SUMMARY: bool = False
+    
     # 阿里云语音配置
     ALI_APPKEY: str = ""
     ALI_ACCESS_KEY: str = ""
@@ -31,6 +37,12 @@ class Settings(BaseSettings):
     # 数据库配置
     DATABASE_PATH: str = "data/voicepc.db"
     
+    # 回复模板覆盖文件（JSON，含success / failure / labels，为空时使用内置模板）
+    REPLY_TEMPLATES_PATH: str = ""
+    
+    # 本地意图分类器模型（不存在时用随代码提供的样本启动时训练）
+    INTENT_MODEL_PATH: str = "data/intent_model.npz"
+    
     # 安全配置
     ALLOWED_ORIGINS: List[str] = [
         "http://localhost:*",
@@ -1,10 +1,14 @@
 """
 SQLite数据库管理
 """
+import asyncio
 import aiosqlite
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 from app.config import settings
 from app.utils.logger import logger
+from app.utils import deadline
+from app.utils.constants import SystemConfig
 
 
 class Database:
@@ -13,11 +17,16 @@ class Database:
     def __init__(self):
         self.db_path = settings.DATABASE_PATH
         self.conn: Optional[aiosqlite.Connection] = None
+        # 所有写操作共用一个连接，串行提交，避免并发请求提交到别人未完成的事务
+        self._write_lock = asyncio.Lock()
     
     async def connect(self):
         """建立数据库连接"""
         self.conn = await aiosqlite.connect(self.db_path)
         self.conn.row_factory = aiosqlite.Row
+        # WAL模式：读写不互斥，提交只追加日志，配合NORMAL同步级别减少fsync
+        await self.conn.execute("PRAGMA journal_mode=WAL")
+        await self.conn.execute("PRAGMA synchronous=NORMAL")
         return self.conn
     
     async def close(self):
@@ -26,26 +35,65 @@ class Database:
             await self.conn.close()
     
     async def execute(self, sql: str, params: tuple = ()):
-        """执行SQL"""
+        """执行SQL（单条语句，立即提交）"""
         if not self.conn:
             await self.connect()
-        async with self.conn.execute(sql, params) as cursor:
+        await self._acquire_write()
+        try:
+            async with self.conn.execute(sql, params) as cursor:
+                await self.conn.commit()
+                return cursor
+        finally:
+            self._write_lock.release()
+    
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        事务：块内的所有写操作一次提交，出错时整体回滚
+        
+        用法:
+            async with db.transaction() as conn:
+                await conn.execute(...)
+                await conn.execute(...)
+        """
+        if not self.conn:
+            await self.connect()
+        await self._acquire_write()
+        try:
+            yield self.conn
             await self.conn.commit()
-            return cursor
+        except BaseException:
+            await self.conn.rollback()
+            raise
+        finally:
+            self._write_lock.release()
+    
+    async def _acquire_write(self):
+        """
+        按请求剩余时间等待写锁（至少等待DB_MIN_TIMEOUT秒，截止后的落库仍有机会完成）
+        
+        只限制排队时间：已开始的写操作不取消，避免中断提交
+        """
+        await deadline.wait(self._write_lock.acquire(), "数据库", floor=SystemConfig.DB_MIN_TIMEOUT)
     
     async def fetchone(self, sql: str, params: tuple = ()):
         """查询单条记录"""
         if not self.conn:
             await self.connect()
-        async with self.conn.execute(sql, params) as cursor:
-            return await cursor.fetchone()
+        return await deadline.wait(self._fetch(sql, params, one=True), "数据库",
+                                   floor=SystemConfig.DB_MIN_TIMEOUT)
     
     async def fetchall(self, sql: str, params: tuple = ()):
         """查询多条记录"""
         if not self.conn:
             await self.connect()
+        return await deadline.wait(self._fetch(sql, params, one=False), "数据库",
+                                   floor=SystemConfig.DB_MIN_TIMEOUT)
+    
+    async def _fetch(self, sql: str, params: tuple, one: bool):
+        """执行查询"""
         async with self.conn.execute(sql, params) as cursor:
-            return await cursor.fetchall()
+            return await (cursor.fetchone() if one else cursor.fetchall())
 
 
 # 全局数据库实例
@@ -124,6 +172,38 @@ async def init_database():
         )
     """)
     
+    # 创建对话统计表（每轮一行，tools为 {工具名: 耗时ms} 的JSON）
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS turn_metrics (
+            turn_id TEXT PRIMARY KEY,
+            session_id TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            route TEXT,
+            model TEXT,
+            llm_calls INTEGER DEFAULT 0,
+            llm_call_ms TEXT,
+            prompt_tokens INTEGER DEFAULT 0,
+            completion_tokens INTEGER DEFAULT 0,
+            cached_tokens INTEGER DEFAULT 0,
+            llm_ms REAL DEFAULT 0,
+            tool_ms REAL DEFAULT 0,
+            queue_ms REAL DEFAULT 0,
+            total_ms REAL DEFAULT 0,
+            tools TEXT
+        )
+    """)
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_turn_metrics_session ON turn_metrics (session_id)"
+    )
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_turn_metrics_created ON turn_metrics (created_at)"
+    )
+    
+    # 按会话读取最近消息
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, timestamp)"
+    )
+    
     logger.info("✅ Database tables created successfully")
 
 
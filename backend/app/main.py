@@ -4,11 +4,14 @@ VoicePC Backend - FastAPI应用入口
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
+import time
+import psutil
 import uvicorn
 
 from app.config import settings
 from app.utils.logger import logger
-from app.api import voice, chat, task, system
+from app.api import voice, chat, task, system, intent
 from app.database.sqlite_db import init_database
 
 # 导入工具以注册
@@ -16,8 +19,32 @@ from app.tools import app_control, file_operation, browser_control
 from app.tools import text_processing, media_control, scene_manager
 from app.tools.base_tool import tool_registry
 
-# 导入Agent服务以初始化
+# Agent在启动后由后台任务构建，见lifespan
 from app.services.ai.agent_service import agent_service
+from app.services.ai.intent_classifier import intent_classifier
+from app.services.ai.intent_examples import intent_example_index
+from app.services.realtime.connection_manager import connection_manager
+
+# 进程启动时间，用于统计绑定端口和Agent就绪耗时
+PROCESS_STARTED_AT = psutil.Process().create_time()
+startup_timings = {}
+
+
+def _since_process_start() -> float:
+    """距进程启动的毫秒数"""
+    return round((time.time() - PROCESS_STARTED_AT) * 1000, 1)
+
+
+async def _warm_up_agent():
+    """后台构建并预热Agent（及本地意图分类器、示例索引），记录就绪时间"""
+    try:
+        await asyncio.to_thread(intent_classifier.load)
+        await asyncio.to_thread(intent_example_index.load)
+        await agent_service.warm_up()
+    except Exception as e:
+        logger.error(f"❌ Agent预热失败: {e}")
+    startup_timings["ready_ms"] = _since_process_start()
+    logger.info(f"⏱️ 启动耗时: 绑定端口 {startup_timings.get('bind_ms')}ms，Agent就绪 {startup_timings['ready_ms']}ms")
 
 
 @asynccontextmanager
@@ -39,11 +66,15 @@ async def lifespan(app: FastAPI):
     for tool_name in tools.keys():
         logger.info(f"   ✓ {tool_name}")
     
-    # 显示Agent状态
-    if agent_service.agent_executor:
-        logger.info("🤖 AI Agent: READY (LangChain)")
-    else:
-        logger.info("🤖 AI Agent: SIMPLE MODE (需配置API Key)")
+    # 后台构建Agent并预热LLM连接，不阻塞端口绑定
+    warm_up_task = asyncio.create_task(_warm_up_agent())
+    logger.info("🤖 AI Agent: WARMING (后台构建中)")
+    
+    # 启动WebSocket心跳（回收空闲/失效连接）
+    connection_manager.start_heartbeat()
+    
+    # lifespan启动阶段结束后服务器即绑定端口
+    startup_timings["bind_ms"] = _since_process_start()
     
     logger.info("=" * 60)
     logger.info("✅ VoicePC Backend is ready!")
@@ -54,6 +85,8 @@ async def lifespan(app: FastAPI):
     
     # 关闭时执行
     logger.info("👋 VoicePC Backend shutting down...")
+    warm_up_task.cancel()
+    await connection_manager.stop_heartbeat()
 
 
 # 创建FastAPI应用
@@ -87,17 +120,20 @@ app.include_router(voice.router, prefix="/api/voice", tags=["语音"])
 app.include_router(chat.router, prefix="/api/chat", tags=["对话"])
 app.include_router(task.router, prefix="/api/task", tags=["任务"])
 app.include_router(system.router, prefix="/api/system", tags=["系统"])
+app.include_router(intent.router, prefix="/api/intent", tags=["意图"])
 
 
 @app.get("/health")
 async def health_check():
-    """健康检查"""
+    """健康检查（Agent后台构建期间status为warming）"""
     return {
-        "status": "ok",
+        "status": "ok" if agent_service.status == "ready" else "warming",
         "service": "VoicePC Backend",
         "version": "1.0.0",
         "tools_count": len(tool_registry.get_all_tools()),
-        "agent_mode": "langchain" if agent_service.agent_executor else "simple"
+        "agent_status": agent_service.status,
+        "agent_mode": agent_service.mode(),
+        "startup": {**startup_timings, **agent_service.timings}
     }
 
 
@@ -121,7 +157,8 @@ def start_server() -> None:
         host=settings.APP_HOST,
         port=settings.APP_PORT,
         reload=settings.APP_ENV == "development",
-        log_level=settings.LOG_LEVEL.lower()
+        log_level=settings.LOG_LEVEL.lower(),
+        ws_per_message_deflate=True  # 客户端握手时提供permessage-deflate即启用压缩
     )
 
 
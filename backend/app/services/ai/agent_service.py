@@ -1,20 +1,85 @@
 """
 LangChain Agent核心服务
+
+Agent在服务启动后由后台任务构建（LangChain导入和构建较慢，不阻塞端口绑定），
+构建前到达的请求等待构建完成
 """
-from typing import Dict, List, Any, Optional
+import asyncio
+import time
+from typing import Dict, List, Any, Optional, AsyncIterator
 from app.config import settings
 from app.utils.logger import logger
-from app.tools.base_tool import tool_registry
+from app.utils.turn_metrics import current_turn
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded
+from app.tools.base_tool import tool_registry, BaseTool
 from app.services.ai.llm_client import llm_client
+from app.services.ai.intent_router import intent_router, build_tool_call, RouteDecision
+from app.services.ai.tool_agent import ToolCallingAgent, run_tool
+from app.services.ai.plan_cache import plan_cache
+from app.services.ai.prompt_bundle import prompt_bundle_cache
+from app.services.ai.reply_synthesizer import reply_synthesizer
+from app.services.ai.scheduler import agent_scheduler, PRIORITY_CHAT
+
+
+# JSON Schema类型 -> Python类型（生成LangChain工具参数模型）
+JSON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": float,
+    "boolean": bool,
+    "array": list,
+    "object": dict
+}
 
 
 class AgentService:
     """AI Agent服务"""
     
     def __init__(self):
-        self.agent_executor = None
+        self.agent_executor = None  # LangChain AgentExecutor（AGENT_MODE=langchain）
+        self.tool_agent: Optional[ToolCallingAgent] = None  # 原生Tool Calling Agent（AGENT_MODE=tool_calling）
         self.tools_list = []
-        self._init_agent()
+        self.status = "idle"  # idle / warming / ready
+        self.timings: Dict[str, float] = {}  # 构建和预热耗时（毫秒）
+        self._initialized = False
+        self._init_task: Optional[asyncio.Task] = None
+    
+    async def ensure_ready(self):
+        """确保Agent已构建（幂等；后台预热未完成时等待）"""
+        if self._initialized:
+            return
+        if self._init_task is None:
+            self._init_task = asyncio.create_task(self._build())
+        await asyncio.shield(self._init_task)
+    
+    async def _build(self):
+        """在线程中构建Agent，避免导入LangChain时阻塞事件循环"""
+        start = time.perf_counter()
+        await asyncio.to_thread(self._init_agent)
+        self._initialized = True
+        self.timings["build_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    
+    async def warm_up(self):
+        """后台预热：构建Agent，再预先建立到LLM服务的连接（首个请求不再等待TLS握手）"""
+        self.status = "warming"
+        start = time.perf_counter()
+        try:
+            await self.ensure_ready()
+            if self.agent_available():
+                await llm_client.warm_up()
+        finally:
+            self.status = "ready"
+            self.timings["warm_up_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        logger.info(f"🤖 AI Agent: READY ({self.mode()}，预热 {self.timings['warm_up_ms']}ms)")
+    
+    def mode(self) -> str:
+        """当前Agent模式：tool_calling / langchain / simple"""
+        if self.tool_agent is not None:
+            return "tool_calling"
+        if self.agent_executor is not None:
+            return "langchain"
+        return "simple"
     
     def _init_agent(self):
         """初始化Agent"""
@@ -25,8 +90,13 @@ class AgentService:
                 self.agent_executor = None
                 return
             
+            if settings.AGENT_MODE == "tool_calling":
+                self.tool_agent = ToolCallingAgent(max_iterations=5, summarize=settings.AGENT_LLM_SUMMARY)
+                logger.info(f"✅ Tool Calling Agent初始化成功，加载了 {len(tool_registry.get_all_tools())} 个工具")
+                return
+            
             # 延迟导入LangChain相关依赖，避免无Key时强依赖（便于无编译环境运行）
-            from langchain.agents import AgentExecutor, create_openai_functions_agent
+            from langchain.agents import AgentExecutor, create_openai_tools_agent
             from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
             from langchain_openai import ChatOpenAI
             # Tool 仅用于运行期注册，无需类型标注强约束
@@ -39,38 +109,28 @@ class AgentService:
                 base_url=settings.DEEPSEEK_BASE_URL,
                 api_key=settings.DEEPSEEK_API_KEY,
                 model=settings.DEEPSEEK_MODEL,
-                temperature=0.7
+                temperature=0.7,
+                streaming=True  # 流式输出token，供execute_stream实时推送
             )
             
-            # 创建提示词模板
+            # 创建提示词模板（系统提示词由工具注册表生成，花括号需转义）
+            system_prompt = prompt_bundle_cache.get().system_prompt
             prompt = ChatPromptTemplate.from_messages([
-                ("system", """你是VoicePC智能助手，帮助用户通过语音控制Windows电脑。
-
-你可以使用以下工具来完成用户的请求：
-- app_control: 控制应用程序（打开、关闭）
-- file_operation: 文件操作（创建、打开、搜索）
-- browser_control: 浏览器控制（打开网页、搜索）
-- text_processing: 文本处理（创建文档）
-- media_control: 多媒体控制（音量、播放音乐）
-- scene_manager: 场景管理（执行复杂场景）
-
-请根据用户的指令，选择合适的工具来完成任务。
-如果任务需要多个步骤，请逐步执行。
-执行完成后，用简洁友好的语言总结结果。"""),
+                ("system", system_prompt.replace("{", "{{").replace("}", "}}")),
                 MessagesPlaceholder(variable_name="chat_history", optional=True),
                 ("human", "{input}"),
                 MessagesPlaceholder(variable_name="agent_scratchpad")
             ])
             
-            # 创建Agent
-            agent = create_openai_functions_agent(llm, self.tools_list, prompt)
+            # 创建Agent（tools格式，一次回复可调用多个工具，AgentExecutor并发执行）
+            agent = create_openai_tools_agent(llm, self.tools_list, prompt)
             
-            # 创建AgentExecutor
+            # 创建AgentExecutor（不需要LLM总结时只执行一轮：本轮工具执行完即结束，回复由模板生成）
             self.agent_executor = AgentExecutor(
                 agent=agent,
                 tools=self.tools_list,
                 verbose=True,
-                max_iterations=5,
+                max_iterations=5 if settings.AGENT_LLM_SUMMARY else 1,
                 return_intermediate_steps=True
             )
             
@@ -81,107 +141,389 @@ class AgentService:
             self.agent_executor = None
     
     def _create_langchain_tools(self) -> List[Any]:
-        """将VoicePC工具转换为LangChain Tool格式"""
-        from langchain.tools import Tool
+        """将VoicePC工具转换为LangChain StructuredTool格式（参数结构来自工具定义）"""
+        from langchain.tools import StructuredTool
         langchain_tools: List[Any] = []
         
-        for tool_name, tool in tool_registry.get_all_tools().items():
-            # 创建工具的执行函数
-            async def tool_func(**kwargs):
-                result = await tool.safe_execute(**kwargs)
-                if result.success:
-                    return f"成功: {result.message}"
-                else:
-                    return f"失败: {result.error}"
-            
-            # 创建LangChain Tool
-            lc_tool = Tool(
+        for tool in tool_registry.get_all_tools().values():
+            lc_tool = StructuredTool(
                 name=tool.name,
                 description=tool.description,
-                func=tool_func,
-                coroutine=tool_func  # 支持异步
+                args_schema=self._args_schema(tool),
+                func=lambda **kwargs: None,  # 只支持异步调用
+                coroutine=self._tool_coroutine(tool)
             )
-            
             langchain_tools.append(lc_tool)
         
         return langchain_tools
     
-    async def execute(self, user_input: str, chat_history: List = None) -> Dict:
+    @staticmethod
+    def _tool_coroutine(tool: BaseTool):
+        """创建工具的执行函数（每个工具单独绑定，避免闭包共用最后一个工具）"""
+        async def tool_func(**kwargs):
+            kwargs = {k: v for k, v in kwargs.items() if v is not None}
+            result = await tool.safe_execute(**kwargs)
+            if result.success:
+                return f"成功: {result.message}"
+            return f"失败: {result.error or result.message}"
+        return tool_func
+    
+    @staticmethod
+    def _args_schema(tool: BaseTool):
+        """根据工具的JSON Schema参数定义生成LangChain参数模型"""
+        from langchain.pydantic_v1 import Field, create_model
+        
+        required = set(tool.parameters.get("required", []))
+        fields = {}
+        for name, spec in tool.parameters.get("properties", {}).items():
+            field_type = JSON_TYPES.get(spec.get("type"), str)
+            description = spec.get("description", "")
+            if name in required:
+                fields[name] = (field_type, Field(..., description=description))
+            else:
+                fields[name] = (Optional[field_type], Field(None, description=description))
+        return create_model(f"{tool.name}_args", **fields)
+    
+    def agent_available(self) -> bool:
+        """LLM Agent是否可用（否则使用简化模式）"""
+        return self.tool_agent is not None or self.agent_executor is not None
+    
+    async def execute(self, user_input: str, chat_history: List = None,
+                      priority: int = PRIORITY_CHAT) -> Dict:
         """
         执行Agent任务
         
         Args:
             user_input: 用户输入
             chat_history: 对话历史
+            priority: 调度优先级
             
         Returns:
             {
                 "output": "最终输出",
                 "intermediate_steps": [{"tool": "", "result": ""}],
-                "success": True/False
+                "success": True/False,
+                "route": {"path": "fast_path/plan_cache/agent/simple", "reason": ""}
             }
         """
-        try:
-            # 如果Agent未初始化，使用简化版
-            if not self.agent_executor:
-                return await self._execute_simple(user_input)
+        result = {"output": "", "intermediate_steps": [], "success": False}
+        async for event in self.execute_stream(user_input, chat_history, priority):
+            if event["type"] == "final":
+                result = {
+                    "output": event["output"],
+                    "intermediate_steps": event["intermediate_steps"],
+                    "success": event["success"],
+                    "route": event.get("route")
+                }
+        return result
+    
+    async def execute_stream(self, user_input: str,
+                             chat_history: List = None,
+                             priority: int = PRIORITY_CHAT) -> AsyncIterator[Dict]:
+        """
+        流式执行Agent任务，执行过程中实时产出事件
+        
+        Args:
+            user_input: 用户输入
+            chat_history: 对话历史
+            priority: 调度优先级（PRIORITY_VOICE / PRIORITY_CHAT / PRIORITY_BATCH）
             
+        Yields:
+            {"type": "token", "delta": "文本增量"}
+            {"type": "tool_start", "step_index": 0, "tool": "", "tool_input": {}}
+            {"type": "tool_end", "step_index": 0, "tool": "", "result": ""}
+            {"type": "final", "output": "", "intermediate_steps": [...], "success": True,
+             "route": {"path": "", "reason": ""}}
+        
+        高置信度、参数完整的单步指令直接执行工具（fast_path），
+        Agent执行成功过的指令重放缓存的执行计划（plan_cache），
+        其余交给LLM Agent；Agent未初始化时使用简化模式。
+        Agent和简化模式（意图解析可能调用LLM）占用调度器的执行槽，
+        不调用LLM的快速路径和计划重放不排队
+        
+        Raises:
+            SchedulerBusyError: 执行队列已满
+        """
+        await self.ensure_ready()
+        decision = intent_router.route(user_input, agent_available=self.agent_available())
+        
+        plan = plan_cache.lookup(user_input) if decision.path == "agent" else None
+        if plan is not None:
+            decision = RouteDecision(path="plan_cache", reason="hit", intent=decision.intent)
+            events = self._stream_plan(user_input, plan)
+        elif decision.path == "agent":
+            events = self._stream_agent(user_input, chat_history)
+        else:
+            events = self._stream_simple(user_input, decision.intent)
+        
+        if decision.path in ("fast_path", "plan_cache"):
+            async for event in self._with_route(events, decision, user_input):
+                yield event
+            return
+        
+        async with agent_scheduler.slot(priority):
+            async for event in self._with_route(events, decision, user_input):
+                yield event
+    
+    @staticmethod
+    async def _with_route(events: AsyncIterator[Dict], decision: RouteDecision,
+                          user_input: str) -> AsyncIterator[Dict]:
+        """在final事件中附加路由信息，Agent自然结束（非截断）的计划写入缓存"""
+        turn = current_turn()
+        if turn is not None:
+            turn.route = decision.path
+        async for event in events:
+            if event["type"] == "final":
+                event["route"] = decision.to_dict()
+                # 达到最大轮数或截止时间的部分执行不是完整计划，不能缓存重放
+                if decision.path == "agent" and event["success"] and event.get("complete"):
+                    plan_cache.record(user_input, event["intermediate_steps"], event["output"])
+            yield event
+    
+    async def _stream_plan(self, user_input: str, plan: Dict) -> AsyncIterator[Dict]:
+        """
+        按顺序重放缓存的执行计划（不调用LLM）
+        
+        任一步骤失败即停止并移除该计划，下次重新交给Agent
+        """
+        steps: List[Dict] = []
+        for step_index, step in enumerate(plan["steps"]):
+            if deadline.expired():
+                yield self._final(reply_synthesizer.partial(steps + plan["steps"][step_index:]), steps, False)
+                return
+            steps.append({"tool": step["tool"], "tool_input": step["tool_input"], "result": None})
+            yield {
+                "type": "tool_start",
+                "step_index": step_index,
+                "tool": step["tool"],
+                "tool_input": step["tool_input"]
+            }
+            
+            result = await run_tool(step["tool"], dict(step["tool_input"]))
+            steps[step_index]["result"] = result
+            yield {
+                "type": "tool_end",
+                "step_index": step_index,
+                "tool": step["tool"],
+                "result": result
+            }
+            
+            if not result.startswith("成功"):
+                plan_cache.invalidate(user_input)
+                logger.warning(f"⚠️ 执行计划重放失败，已移除: {user_input}")
+                yield {
+                    "type": "final",
+                    "output": result,
+                    "intermediate_steps": steps,
+                    "success": False
+                }
+                return
+        
+        logger.info(f"✅ 执行计划重放完成: {len(steps)} 步")
+        
+        yield {
+            "type": "final",
+            "output": plan["output"],
+            "intermediate_steps": steps,
+            "success": True
+        }
+    
+    async def _stream_agent(self, user_input: str,
+                            chat_history: List = None) -> AsyncIterator[Dict]:
+        """使用LLM Agent流式执行（原生Tool Calling或LangChain）"""
+        steps: List[Dict] = []
+        try:
             logger.info(f"🤖 Agent开始执行: {user_input}")
             
-            # 执行Agent
-            result = await self.agent_executor.ainvoke({
+            if self.tool_agent is not None:
+                # 只发送相关工具的定义，减少prompt token
+                tool_names = intent_router.select_tools(user_input)
+                if tool_names:
+                    logger.info(f"✂️ 工具裁剪: {len(tool_registry.get_all_tools())} -> {tool_names}")
+                async for event in self.tool_agent.astream(user_input, chat_history, tool_names):
+                    # 记录已执行的步骤，出错时随final返回
+                    if event["type"] == "tool_start":
+                        steps.append({"tool": event["tool"], "tool_input": event["tool_input"], "result": None})
+                    elif event["type"] == "tool_end":
+                        steps[event["step_index"]]["result"] = event["result"]
+                    yield event
+                return
+            
+            agent_input = {
                 "input": user_input,
                 "chat_history": chat_history or []
-            })
+            }
             
-            # 提取结果
-            output = result.get("output", "")
-            intermediate_steps = result.get("intermediate_steps", [])
+            # 旧版LangChain没有事件流，退化为执行完成后补发步骤事件
+            if not hasattr(self.agent_executor, "astream_events"):
+                async for event in self._stream_invoke(agent_input):
+                    yield event
+                return
             
-            # 格式化中间步骤
-            steps = []
-            for step in intermediate_steps:
-                action, observation = step
-                steps.append({
-                    "tool": action.tool,
-                    "tool_input": action.tool_input,
-                    "result": observation
-                })
+            output = ""
+            running: Dict[Any, int] = {}  # run_id -> step_index
+            llm_started: Dict[Any, float] = {}  # run_id -> LLM调用开始时间
+            turn = current_turn()
+            
+            events = self.agent_executor.astream_events(agent_input, version="v1")
+            async for event in deadline.iterate(events, "Agent执行"):
+                kind = event["event"]
+                data = event.get("data", {})
+                
+                if kind == "on_chat_model_start":
+                    llm_started[event["run_id"]] = time.perf_counter()
+                
+                elif kind == "on_chat_model_end":
+                    started = llm_started.pop(event["run_id"], None)
+                    if turn is not None and started is not None:
+                        turn.record_llm((time.perf_counter() - started) * 1000,
+                                        self._langchain_usage(data.get("output")))
+                
+                elif kind == "on_chat_model_stream":
+                    delta = getattr(data.get("chunk"), "content", "")
+                    if delta:
+                        yield {"type": "token", "delta": delta}
+                
+                elif kind == "on_tool_start":
+                    step_index = len(steps)
+                    running[event["run_id"]] = step_index
+                    tool_input = data.get("input", {})
+                    steps.append({
+                        "tool": event["name"],
+                        "tool_input": tool_input,
+                        "result": None
+                    })
+                    yield {
+                        "type": "tool_start",
+                        "step_index": step_index,
+                        "tool": event["name"],
+                        "tool_input": tool_input
+                    }
+                
+                elif kind == "on_tool_end":
+                    step_index = running.pop(event["run_id"], None)
+                    if step_index is None:
+                        continue
+                    steps[step_index]["result"] = data.get("output")
+                    yield {
+                        "type": "tool_end",
+                        "step_index": step_index,
+                        "tool": steps[step_index]["tool"],
+                        "result": steps[step_index]["result"]
+                    }
+                
+                elif kind == "on_chain_end" and event["name"] == "AgentExecutor":
+                    output = (data.get("output") or {}).get("output", "")
             
             logger.info(f"✅ Agent执行完成: {len(steps)} 步")
             
-            return {
-                "output": output,
+            yield {
+                "type": "final",
+                "output": self._synthesize(output, steps),
                 "intermediate_steps": steps,
-                "success": True
+                "success": True,
+                "complete": self._finished(output)
             }
             
+        except DeadlineExceeded:
+            logger.warning(f"⏰ Agent执行超时，已执行 {len(steps)} 步")
+            yield self._final(reply_synthesizer.partial(steps), steps, False)
+        
         except Exception as e:
             logger.error(f"❌ Agent执行失败: {e}")
-            return {
+            yield {
+                "type": "final",
                 "output": f"执行失败: {e}",
-                "intermediate_steps": [],
+                "intermediate_steps": steps,
                 "success": False
             }
     
-    async def _execute_simple(self, user_input: str) -> Dict:
-        """简化版执行（不使用LangChain）"""
+    async def _stream_invoke(self, agent_input: Dict) -> AsyncIterator[Dict]:
+        """一次性执行Agent，再按顺序补发步骤事件（超时时没有可返回的部分结果）"""
+        result = await deadline.wait(self.agent_executor.ainvoke(agent_input), "Agent执行")
+        
+        # 格式化中间步骤
+        steps = []
+        for step_index, (action, observation) in enumerate(result.get("intermediate_steps", [])):
+            steps.append({
+                "tool": action.tool,
+                "tool_input": action.tool_input,
+                "result": observation
+            })
+            yield {
+                "type": "tool_start",
+                "step_index": step_index,
+                "tool": action.tool,
+                "tool_input": action.tool_input
+            }
+            yield {
+                "type": "tool_end",
+                "step_index": step_index,
+                "tool": action.tool,
+                "result": observation
+            }
+        
+        logger.info(f"✅ Agent执行完成: {len(steps)} 步")
+        
+        yield {
+            "type": "final",
+            "output": self._synthesize(result.get("output", ""), steps),
+            "intermediate_steps": steps,
+            "success": True,
+            "complete": self._finished(result.get("output", ""))
+        }
+    
+    @staticmethod
+    def _langchain_usage(output: Any) -> Dict[str, int]:
+        """从LangChain模型输出中提取token用量（流式输出可能不带用量）"""
+        usage = getattr(output, "usage_metadata", None)
+        if usage:
+            return {
+                "prompt_tokens": usage.get("input_tokens", 0),
+                "completion_tokens": usage.get("output_tokens", 0)
+            }
+        metadata = getattr(output, "response_metadata", None) or {}
+        return llm_client._usage_dict(metadata.get("token_usage"))
+    
+    @staticmethod
+    def _finished(output: str) -> bool:
+        """
+        LangChain Agent是否正常结束（达到最大轮数时输出固定的停止提示）
+        
+        关闭LLM总结时只执行一轮，执行完本轮工具后停止属于正常结束
+        """
+        return not settings.AGENT_LLM_SUMMARY or not output.startswith("Agent stopped")
+    
+    @staticmethod
+    def _synthesize(output: str, steps: List[Dict]) -> str:
+        """关闭LLM总结时，由执行步骤生成回复（Agent执行完一轮工具即停止，输出只是停止提示）"""
+        if settings.AGENT_LLM_SUMMARY or not steps:
+            return output
+        return reply_synthesizer.compose(steps)
+    
+    async def _stream_simple(self, user_input: str,
+                             intent: Optional[Any] = None) -> AsyncIterator[Dict]:
+        """
+        简化版流式执行（不使用LangChain）
+        
+        Args:
+            user_input: 用户输入
+            intent: 路由时已解析的意图（为空时在此解析）
+        """
         from app.services.ai.intent_parser import intent_parser
         
         logger.info("📋 使用简化模式执行")
         
         # 解析意图
-        intent = await intent_parser.parse(user_input)
+        if intent is None:
+            intent = await intent_parser.parse(user_input)
 
         # 简单寒暄兜底（无LLM时支持"你好"等）
         if intent.type == "unknown":
             text_norm = (user_input or "").strip().lower()
             if any(k in text_norm for k in ["你好", "hi", "hello", "在吗", "您好"]):
-                return {
-                    "output": "你好，我在。可以试试：'打开记事本'、'搜索Python教程'、'音量调到50'。",
-                    "intermediate_steps": [],
-                    "success": True
-                }
+                yield self._final("你好，我在。可以试试：'打开记事本'、'搜索Python教程'、'音量调到50'。")
+                return
         
         # 处理系统查询（时间、日期等）
         if intent.type == "system_query":
@@ -189,74 +531,54 @@ class AgentService:
             now = datetime.now()
             if intent.action == "get_time":
                 time_str = now.strftime("%H:%M")
-                return {
-                    "output": f"现在是 {time_str}",
-                    "intermediate_steps": [],
-                    "success": True
-                }
+                yield self._final(f"现在是 {time_str}")
+                return
             elif intent.action == "get_date":
                 weekday = ["星期一", "星期二", "星期三", "星期四", "星期五", "星期六", "星期日"]
                 date_str = now.strftime("%Y年%m月%d日")
                 week_str = weekday[now.weekday()]
-                return {
-                    "output": f"今天是 {date_str} {week_str}",
-                    "intermediate_steps": [],
-                    "success": True
-                }
-        
-        # 映射意图到工具
-        tool_mapping = {
-            "app_control": "app_control",
-            "file_operation": "file_operation",
-            "browser_control": "browser_control",
-            "text_processing": "text_processing",
-            "media_control": "media_control",
-            "scene": "scene_manager"
-        }
+                yield self._final(f"今天是 {date_str} {week_str}")
+                return
         
-        tool_name = tool_mapping.get(intent.type)
-        if not tool_name:
-            return {
-                "output": "抱歉，我不知道如何处理这个请求",
-                "intermediate_steps": [],
-                "success": False
-            }
+        # 映射意图到工具调用
+        call = build_tool_call(intent)
+        if not call:
+            yield self._final("抱歉，我不知道如何处理这个请求", success=False)
+            return
+        tool_name, params = call
         
         # 获取工具
         tool = tool_registry.get_tool(tool_name)
         if not tool:
-            return {
-                "output": "工具不可用",
-                "intermediate_steps": [],
-                "success": False
-            }
+            yield self._final("工具不可用", success=False)
+            return
         
         # 执行工具
-        params = {"action": intent.action}
-        params.update(intent.entities)
-        
-        # 特殊处理场景工具
-        if tool_name == "scene_manager":
-            scene_mapping = {
-                "prepare_work": "prepare_work",
-                "create_mode": "create_mode",
-                "study_mode": "study_mode",
-                "relax_mode": "relax_mode"
-            }
-            params = {"scene_name": scene_mapping.get(intent.action, "prepare_work")}
+        yield {"type": "tool_start", "step_index": 0, "tool": tool_name, "tool_input": params}
         
         result = await tool.safe_execute(**params)
         
+        yield {"type": "tool_end", "step_index": 0, "tool": tool_name, "result": result.message}
+        
         steps = [{
             "tool": tool_name,
             "tool_input": params,
             "result": result.message
         }]
         
+        output = reply_synthesizer.render(
+            tool_name, params, result.success, result.message, result.error, intent
+        )
+        yield self._final(output, steps, result.success)
+    
+    @staticmethod
+    def _final(output: str, steps: Optional[List[Dict]] = None, success: bool = True) -> Dict:
+        """构造final事件"""
         return {
-            "output": result.message,
-            "intermediate_steps": steps,
-            "success": result.success
+            "type": "final",
+            "output": output,
+            "intermediate_steps": steps or [],
+            "success": success
         }
 
 
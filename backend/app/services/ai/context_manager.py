@@ -3,9 +3,12 @@
 """
 from typing import List, Dict, Optional
 import json
+import uuid
 from datetime import datetime
 from app.database.sqlite_db import db
 from app.utils.logger import logger
+from app.utils.turn_metrics import TurnMetrics
+from app.services.ai.turn_ledger import turn_ledger
 
 
 class ContextManager:
@@ -45,7 +48,6 @@ class ContextManager:
                          message_type: str = "text") -> bool:
         """添加消息"""
         try:
-            import uuid
             message_id = str(uuid.uuid4())
             
             await db.execute(
@@ -66,7 +68,7 @@ class ContextManager:
             rows = await db.fetchall(
                 """SELECT role, content, timestamp FROM messages
                    WHERE session_id = ?
-                   ORDER BY timestamp DESC
+                   ORDER BY timestamp DESC, rowid DESC
                    LIMIT ?""",
                 (session_id, limit)
             )
@@ -80,17 +82,37 @@ class ContextManager:
             return []
     
     async def get_context(self, session_id: str) -> Dict:
-        """获取会话上下文"""
+        """
+        获取会话上下文（一次查询取出会话数据和最近的对话）
+        
+        Returns:
+            {"session_id", "history": 从旧到新的消息, "context": 会话上下文数据}
+        """
         try:
-            # 获取最近的对话
-            history = await self.get_chat_history(session_id, self.max_history)
+            # 会话不存在时也返回一行（各列为NULL）
+            rows = await db.fetchall(
+                """SELECT s.context AS session_context, m.role, m.content, m.timestamp
+                   FROM (SELECT ? AS id) AS k
+                   LEFT JOIN sessions s ON s.id = k.id
+                   LEFT JOIN (
+                       SELECT role, content, timestamp, rowid AS seq FROM messages
+                       WHERE session_id = ?
+                       ORDER BY timestamp DESC, rowid DESC
+                       LIMIT ?
+                   ) m ON 1 = 1
+                   ORDER BY m.timestamp, m.seq""",
+                (session_id, session_id, self.max_history)
+            )
+            
+            history = [
+                {"role": row["role"], "content": row["content"], "timestamp": row["timestamp"]}
+                for row in rows if row["role"] is not None
+            ]
             
-            # 获取会话数据
-            session = await self.get_session(session_id)
             context_data = {}
-            if session and session.get("context"):
+            if rows and rows[0]["session_context"]:
                 try:
-                    context_data = json.loads(session["context"])
+                    context_data = json.loads(rows[0]["session_context"])
                 except:
                     pass
             
@@ -103,6 +125,52 @@ class ContextManager:
             logger.error(f"获取上下文失败: {e}")
             return {"session_id": session_id, "history": [], "context": {}}
     
+    async def commit_turn(self, session_id: str, user_message: str, reply: str,
+                          context_data: Optional[Dict] = None,
+                          metrics: Optional[TurnMetrics] = None) -> bool:
+        """
+        在一个事务中保存一轮对话：会话（不存在则创建）、用户消息、AI回复、会话上下文、本轮统计
+        
+        Args:
+            session_id: 会话ID
+            user_message: 用户消息
+            reply: AI回复
+            context_data: 新的会话上下文（None表示保持不变）
+            metrics: 本轮的token与耗时统计
+        
+        Returns:
+            是否保存成功（失败时整轮回滚）
+        """
+        try:
+            context_json = None
+            if context_data is not None:
+                context_json = json.dumps(context_data, ensure_ascii=False)
+            
+            async with db.transaction() as conn:
+                await conn.execute(
+                    """INSERT INTO sessions (id, status, context) VALUES (?, 'active', COALESCE(?, '{}'))
+                       ON CONFLICT(id) DO UPDATE SET
+                           context = COALESCE(?, sessions.context),
+                           updated_at = CURRENT_TIMESTAMP""",
+                    (session_id, context_json, context_json)
+                )
+                await conn.executemany(
+                    """INSERT INTO messages (id, session_id, role, content, type)
+                       VALUES (?, ?, ?, ?, 'text')""",
+                    [
+                        (str(uuid.uuid4()), session_id, "user", user_message),
+                        (str(uuid.uuid4()), session_id, "assistant", reply),
+                    ]
+                )
+                if metrics is not None:
+                    await turn_ledger.save(conn, metrics)
+            
+            logger.info(f"💾 保存对话: {session_id} - {user_message[:50]}")
+            return True
+        except Exception as e:
+            logger.error(f"保存对话失败: {e}")
+            return False
+    
     async def update_context(self, session_id: str, context_data: Dict) -> bool:
         """更新会话上下文"""
         try:
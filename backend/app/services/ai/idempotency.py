@@ -0,0 +1,133 @@
+"""
+幂等与重复指令合并 - 同一指令只执行一次
+
+- 带幂等键的请求：执行中的重复请求共享同一次执行，完成后的结果在短时间内直接重放
+- 不带幂等键的请求：同一会话中正在执行的相同指令合并（如语音端重复按键），完成后不重放
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from app.utils.logger import logger
+from app.utils.ttl_cache import TTLCache
+from app.utils.constants import SystemConfig
+
+
+class DuplicateTurnError(RuntimeError):
+    """被合并的原始执行失败或被取消"""
+
+
+class IdempotencyStore:
+    """进行中的执行 + 短期结果缓存"""
+
+    def __init__(self):
+        self.inflight: Dict[str, asyncio.Future] = {}  # 幂等键 -> 执行结果Future
+        self.completed = TTLCache(
+            maxsize=SystemConfig.IDEMPOTENCY_MAX_KEYS,
+            ttl=SystemConfig.IDEMPOTENCY_TTL
+        )
+        self.stats = {"executed": 0, "coalesced": 0, "replayed": 0}
+
+    @staticmethod
+    def make_key(scope: str, session_id: Optional[str], message: str,
+                 idempotency_key: Optional[str] = None) -> Optional[str]:
+        """
+        生成合并键
+
+        Args:
+            scope: 接口范围（http/ws，两者结果格式不同）
+            session_id: 会话ID（为空时只按幂等键合并）
+            message: 用户指令
+            idempotency_key: 客户端提供的幂等键
+
+        Returns:
+            合并键；既无幂等键也无会话ID时返回None（不合并）
+        """
+        if idempotency_key:
+            return f"{scope}|{session_id or '*'}|key:{idempotency_key}"
+        if session_id and message.strip():
+            return f"{scope}|{session_id}|text:{message.strip()}"
+        return None
+
+    @staticmethod
+    def is_explicit(key: str) -> bool:
+        """是否为客户端提供的幂等键（完成后可重放）"""
+        return "|key:" in key
+
+    def join_pending(self, key: Optional[str]) -> bool:
+        """
+        有相同的执行正在进行时合并到该执行（调用方不再提交）
+
+        Returns:
+            是否已合并
+        """
+        if key is None or key not in self.inflight:
+            return False
+        self.stats["coalesced"] += 1
+        logger.info(f"🔗 合并重复指令: {key}")
+        return True
+
+    async def run(self, key: Optional[str],
+                  factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """
+        执行或合并
+
+        Args:
+            key: 合并键（None表示直接执行）
+            factory: 实际执行的协程函数（在调用方任务中执行，调用方取消即取消执行）
+
+        Returns:
+            (结果, 状态)，状态为 executed / coalesced / replayed
+
+        Raises:
+            DuplicateTurnError: 合并到的原始执行失败或被取消
+        """
+        if key is None:
+            return await factory(), "executed"
+
+        if key in self.completed:
+            self.stats["replayed"] += 1
+            logger.info(f"♻️ 重放已完成的指令: {key}")
+            return self.completed.get(key), "replayed"
+
+        future = self.inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            logger.info(f"🔗 合并重复指令: {key}")
+            try:
+                return await asyncio.shield(future), "coalesced"
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    raise DuplicateTurnError("原始指令已取消")
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        # 没有等待者时也标记异常已读取，避免告警
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.inflight[key] = future
+        self.stats["executed"] += 1
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(DuplicateTurnError(f"原始指令执行失败: {e}"))
+            raise
+        finally:
+            self.inflight.pop(key, None)
+
+        future.set_result(result)
+        if self.is_explicit(key):
+            self.completed.set(key, result)
+        return result, "executed"
+
+    def get_stats(self) -> Dict:
+        """获取合并统计"""
+        return {
+            "inflight": len(self.inflight),
+            "completed": len(self.completed),
+            **self.stats
+        }
+
+
+# 全局实例
+idempotency_store = IdempotencyStore()
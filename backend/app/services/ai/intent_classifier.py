@@ -0,0 +1,302 @@
+"""
+本地意图分类器 - 字符n-gram特征 + 线性模型（softmax回归）
+
+规则未命中的说法（"把微信弄出来"、"声音大一点"）先交给本地分类器，
+置信度足够时不再调用LLM；CPU上单次预测不到1毫秒。
+
+训练数据为JSONL，每行 {"text": "...", "type": "...", "action": "..."}，
+类型为unknown的样本表示闲聊等非指令输入（预测为unknown时交给LLM）。
+
+命令行：
+    python -m app.services.ai.intent_classifier train [--data 样本文件] [--model 模型文件] [--holdout 0.2]
+    python -m app.services.ai.intent_classifier eval [--data 样本文件] [--model 模型文件]
+"""
+import argparse
+import json
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+from app.utils.logger import logger
+from app.utils.text_normalizer import normalize_text
+from app.utils.constants import SystemConfig
+from app.config import settings
+
+try:
+    import numpy as np
+except ImportError:  # 可选依赖，未安装时分类器不可用，低置信度输入直接交给LLM
+    np = None
+
+# 随代码提供的标注样本
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_utterances.jsonl")
+
+UNKNOWN_LABEL = "unknown/unknown"
+
+
+def char_ngrams(text: str, min_n: int = 1, max_n: int = 3) -> List[str]:
+    """规范化文本的字符n-gram（去重，两端加边界符）"""
+    text = f"^{normalize_text(text)}$"
+    grams = {
+        text[i:i + n]
+        for n in range(min_n, max_n + 1)
+        for i in range(len(text) - n + 1)
+    }
+    grams.discard("^")
+    grams.discard("$")
+    return sorted(grams)
+
+
+def load_samples(path: str) -> List[Tuple[str, str]]:
+    """
+    读取标注样本
+
+    Returns:
+        [(文本, "类型/动作")]
+    """
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            samples.append((row["text"], f"{row['type']}/{row['action']}"))
+    return samples
+
+
+class IntentClassifier:
+    """字符n-gram + softmax回归意图分类器"""
+
+    def __init__(self, model_path: Optional[str] = None, data_path: str = DEFAULT_DATA_PATH):
+        """
+        Args:
+            model_path: 训练好的模型文件（.npz，不存在时用data_path的样本现场训练）
+            data_path: 标注样本文件
+        """
+        self.model_path = model_path or settings.INTENT_MODEL_PATH
+        self.data_path = data_path
+        self.min_confidence = SystemConfig.INTENT_CLASSIFIER_MIN_CONFIDENCE
+        self.vocab: Dict[str, int] = {}
+        self.labels: List[str] = []
+        self.weights = None  # (特征数, 类别数)
+        self.bias = None
+        self._loaded = False
+
+    @property
+    def available(self) -> bool:
+        """是否安装了NumPy"""
+        return np is not None
+
+    @property
+    def ready(self) -> bool:
+        """模型是否已加载"""
+        return self.weights is not None
+
+    def load(self) -> bool:
+        """
+        加载模型：优先读取模型文件，否则用随代码提供的样本训练（只尝试一次）
+
+        Returns:
+            模型是否可用
+        """
+        if self._loaded or not self.available:
+            return self.ready
+        self._loaded = True
+        try:
+            if os.path.exists(self.model_path):
+                self._read(self.model_path)
+                logger.info(f"✅ 意图分类器已加载: {self.model_path}（{len(self.labels)}类）")
+            elif os.path.exists(self.data_path):
+                start = time.perf_counter()
+                self.fit(load_samples(self.data_path))
+                logger.info(f"✅ 意图分类器已训练: {len(self.labels)}类，耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        except Exception as e:
+            logger.warning(f"⚠️ 意图分类器加载失败: {e}")
+            self.weights = None
+        return self.ready
+
+    def fit(self, samples: List[Tuple[str, str]], epochs: int = 300,
+            learning_rate: float = 10.0, l2: float = 1e-4):
+        """
+        训练（全批量梯度下降）
+
+        Args:
+            samples: [(文本, "类型/动作")]
+            epochs: 迭代轮数
+            learning_rate: 学习率
+            l2: L2正则系数
+        """
+        grams = [char_ngrams(text) for text, _ in samples]
+        vocab = {gram: i for i, gram in enumerate(sorted({g for gs in grams for g in gs}))}
+        labels = sorted({label for _, label in samples})
+        label_index = {label: i for i, label in enumerate(labels)}
+
+        features = np.zeros((len(samples), len(vocab)), dtype=np.float32)
+        for row, sample_grams in enumerate(grams):
+            features[row, [vocab[g] for g in sample_grams]] = 1.0 / np.sqrt(len(sample_grams))
+        targets = np.zeros((len(samples), len(labels)), dtype=np.float32)
+        targets[np.arange(len(samples)), [label_index[label] for _, label in samples]] = 1.0
+
+        weights = np.zeros((len(vocab), len(labels)), dtype=np.float32)
+        bias = np.zeros(len(labels), dtype=np.float32)
+        for _ in range(epochs):
+            probs = self._softmax(features @ weights + bias)
+            error = (probs - targets) / len(samples)
+            weights -= learning_rate * (features.T @ error + l2 * weights)
+            bias -= learning_rate * error.sum(axis=0)
+
+        # 训练完成后一次性替换（后台线程训练时预测不会用到半成品）
+        self.vocab, self.labels, self.bias = vocab, labels, bias
+        self.weights = weights
+        self._loaded = True
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        预测意图
+
+        Returns:
+            ("类型/动作", 概率)；模型不可用或没有已知特征时返回 (unknown/unknown, 0.0)
+        """
+        if not self.load():
+            return UNKNOWN_LABEL, 0.0
+        columns = [self.vocab[g] for g in char_ngrams(text) if g in self.vocab]
+        if not columns:
+            return UNKNOWN_LABEL, 0.0
+        logits = self.weights[columns].sum(axis=0) / np.sqrt(len(columns)) + self.bias
+        probs = self._softmax(logits)
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+    def predict_batch(self, texts: List[str]) -> List[Tuple[str, float]]:
+        """批量预测（所有输入一次矩阵乘法），结果与逐条predict相同"""
+        if not texts:
+            return []
+        if not self.load():
+            return [(UNKNOWN_LABEL, 0.0)] * len(texts)
+
+        features = np.zeros((len(texts), len(self.vocab)), dtype=np.float32)
+        known = np.zeros(len(texts), dtype=bool)
+        for row, text in enumerate(texts):
+            columns = [self.vocab[g] for g in char_ngrams(text) if g in self.vocab]
+            if columns:
+                features[row, columns] = 1.0 / np.sqrt(len(columns))
+                known[row] = True
+        probs = self._softmax(features @ self.weights + self.bias)
+        best = probs.argmax(axis=1)
+        return [
+            (self.labels[index], float(probs[row, index])) if known[row] else (UNKNOWN_LABEL, 0.0)
+            for row, index in enumerate(best)
+        ]
+
+    def classify(self, text: str) -> Optional[Tuple[str, str, float]]:
+        """
+        置信度达到阈值的指令意图
+
+        Returns:
+            (类型, 动作, 置信度)；闲聊、置信度不足或模型不可用时返回None
+        """
+        return self.classify_batch([text])[0]
+
+    def classify_batch(self, texts: List[str]) -> List[Optional[Tuple[str, str, float]]]:
+        """批量版classify"""
+        results = []
+        for label, confidence in self.predict_batch(texts):
+            if label == UNKNOWN_LABEL or confidence < self.min_confidence:
+                results.append(None)
+            else:
+                intent_type, action = label.split("/", 1)
+                results.append((intent_type, action, confidence))
+        return results
+
+    def evaluate(self, samples: List[Tuple[str, str]]) -> Dict:
+        """
+        评估
+
+        Returns:
+            accuracy: 全部样本的准确率
+            coverage: 置信度达到阈值的样本比例
+            covered_accuracy: 达到阈值的样本中的准确率
+            latency_ms: 平均单次预测耗时
+        """
+        correct = covered = covered_correct = 0
+        start = time.perf_counter()
+        for text, label in samples:
+            predicted, confidence = self.predict(text)
+            correct += predicted == label
+            if confidence >= self.min_confidence:
+                covered += 1
+                covered_correct += predicted == label
+        elapsed = time.perf_counter() - start
+        total = len(samples) or 1
+        return {
+            "samples": len(samples),
+            "accuracy": round(correct / total, 3),
+            "coverage": round(covered / total, 3),
+            "covered_accuracy": round(covered_correct / covered, 3) if covered else 0.0,
+            "latency_ms": round(elapsed * 1000 / total, 3)
+        }
+
+    def save(self, path: Optional[str] = None):
+        """保存模型（.npz）"""
+        path = path or self.model_path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            labels=np.array(self.labels),
+            vocab=np.array(sorted(self.vocab, key=self.vocab.get))
+        )
+
+    def _read(self, path: str):
+        """读取模型文件"""
+        with np.load(path, allow_pickle=False) as data:
+            self.bias = data["bias"]
+            self.labels = [str(label) for label in data["labels"]]
+            self.vocab = {str(gram): i for i, gram in enumerate(data["vocab"])}
+            self.weights = data["weights"]
+
+    @staticmethod
+    def _softmax(logits):
+        exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+
+# 全局实例
+intent_classifier = IntentClassifier()
+
+
+def main(argv: Optional[List[str]] = None):
+    """命令行：训练 / 评估意图分类器"""
+    parser = argparse.ArgumentParser(description="本地意图分类器")
+    parser.add_argument("command", choices=["train", "eval"])
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH, help="标注样本（JSONL）")
+    parser.add_argument("--model", default=settings.INTENT_MODEL_PATH, help="模型文件（.npz）")
+    parser.add_argument("--holdout", type=float, default=0.0, help="train时留出评估的样本比例")
+    parser.add_argument("--epochs", type=int, default=300)
+    args = parser.parse_args(argv)
+
+    if np is None:
+        raise SystemExit("需要安装NumPy: pip install numpy")
+
+    samples = load_samples(args.data)
+    classifier = IntentClassifier(model_path=args.model, data_path=args.data)
+
+    if args.command == "train":
+        random.Random(0).shuffle(samples)
+        split = int(len(samples) * (1 - args.holdout))
+        train_set, test_set = samples[:split], samples[split:]
+        classifier.fit(train_set, epochs=args.epochs)
+        classifier.save(args.model)
+        print(f"已训练 {len(train_set)} 条样本，{len(classifier.labels)} 类，模型: {args.model}")
+        print("训练集:", json.dumps(classifier.evaluate(train_set), ensure_ascii=False))
+        if test_set:
+            print("留出集:", json.dumps(classifier.evaluate(test_set), ensure_ascii=False))
+    else:
+        if not os.path.exists(args.model) or not classifier.load():
+            raise SystemExit(f"模型不可用（请先train）: {args.model}")
+        print(json.dumps(classifier.evaluate(samples), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
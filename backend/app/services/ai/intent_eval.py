@@ -0,0 +1,105 @@
+"""
+意图解析离线评估 - 在标注语料上统计准确率、各阶段命中率和吞吐量，用于解析器改动的回归测试
+
+语料为JSONL，每行 {"text": "...", "type": "...", "action": "..."}（与本地分类器样本格式相同），
+应使用分类器训练样本以外的独立语料，否则准确率偏高
+
+命令行：
+    python -m app.services.ai.intent_eval --data 语料 [--llm] [--batch-size 500] [--errors 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+from app.utils.logger import logger
+from app.services.ai.intent_classifier import intent_classifier, load_samples
+from app.services.ai.intent_parser import intent_parser
+
+TRAINING_DATA_WARNING = "评估语料就是分类器的训练样本，准确率偏高，回归测试请使用独立语料"
+
+
+async def evaluate(samples: List[Tuple[str, str]], use_llm: bool = False,
+                   batch_size: int = 500, max_errors: int = 20) -> Dict:
+    """
+    按批解析全部样本并统计（不读写解析缓存）
+
+    Args:
+        samples: [(文本, "类型/动作")]
+        use_llm: 是否允许调用LLM
+        batch_size: 每批的指令数
+        max_errors: 报告中最多列出的错误样本数
+
+    Returns:
+        accuracy: 类型和动作都正确的比例
+        type_accuracy: 类型正确的比例
+        stages: 各来源（rules / classifier / llm / fallback）的条数、占比和准确率
+        throughput: 每秒解析条数
+        errors: 错误样本
+    """
+    stages: Dict[str, Dict[str, int]] = {}
+    errors = []
+    correct = type_correct = 0
+
+    # 模型加载/训练不计入吞吐量
+    intent_classifier.load()
+    start = time.perf_counter()
+    for offset in range(0, len(samples), batch_size):
+        batch = samples[offset:offset + batch_size]
+        results = await intent_parser.parse_batch(
+            [text for text, _ in batch], use_llm=use_llm, use_cache=False
+        )
+        for (text, label), (intent, source) in zip(batch, results):
+            predicted = f"{intent.type}/{intent.action}"
+            hit = predicted == label
+            correct += hit
+            type_correct += intent.type == label.split("/", 1)[0]
+
+            stage = stages.setdefault(source, {"count": 0, "correct": 0})
+            stage["count"] += 1
+            stage["correct"] += hit
+            if not hit and len(errors) < max_errors:
+                errors.append({"text": text, "expected": label, "predicted": predicted, "source": source})
+    elapsed = time.perf_counter() - start
+
+    total = len(samples) or 1
+    return {
+        "samples": len(samples),
+        "accuracy": round(correct / total, 3),
+        "type_accuracy": round(type_correct / total, 3),
+        "stages": {
+            source: {
+                "count": stage["count"],
+                "rate": round(stage["count"] / total, 3),
+                "accuracy": round(stage["correct"] / stage["count"], 3)
+            }
+            for source, stage in sorted(stages.items(), key=lambda item: -item[1]["count"])
+        },
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "throughput": round(len(samples) / elapsed, 1) if elapsed > 0 else 0.0,
+        "errors": errors
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    """命令行：评估意图解析器"""
+    parser = argparse.ArgumentParser(description="意图解析离线评估")
+    parser.add_argument("--data", required=True, help="标注语料（JSONL，不要使用分类器的训练样本）")
+    parser.add_argument("--llm", action="store_true", help="允许调用LLM（默认只评估规则和本地分类器）")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--errors", type=int, default=20, help="最多列出的错误样本数")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(evaluate(
+        load_samples(args.data), use_llm=args.llm,
+        batch_size=args.batch_size, max_errors=args.errors
+    ))
+    if os.path.abspath(args.data) == os.path.abspath(intent_classifier.data_path):
+        logger.warning(f"⚠️ {TRAINING_DATA_WARNING}")
+        report["warning"] = TRAINING_DATA_WARNING
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
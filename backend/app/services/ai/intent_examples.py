@@ -0,0 +1,101 @@
+"""
+意图示例检索 - 为LLM意图解析挑选最相近的标注示例（few-shot）
+
+标注示例与本地分类器共用同一份样本，向量为L2归一化的字符n-gram（NumPy矩阵），
+检索为一次矩阵列求和，不需要外部向量库；
+少量相近示例比零样本的长说明更能让LLM第一次就返回正确、简短的JSON
+"""
+import json
+from typing import Dict, List
+from app.utils.logger import logger
+from app.utils.constants import SystemConfig
+from app.services.ai.intent_classifier import DEFAULT_DATA_PATH, char_ngrams, np
+
+
+class IntentExampleIndex:
+    """标注示例的n-gram向量索引"""
+
+    def __init__(self, data_path: str = DEFAULT_DATA_PATH):
+        """
+        Args:
+            data_path: 标注样本文件（JSONL，entities字段可选）
+        """
+        self.data_path = data_path
+        self.examples: List[Dict] = []
+        self.vocab: Dict[str, int] = {}
+        self.matrix = None  # (示例数, 特征数)
+        self._loaded = False
+
+    def load(self) -> bool:
+        """
+        读取示例并建立索引（只尝试一次）
+
+        Returns:
+            索引是否可用（未安装NumPy或没有样本时不可用）
+        """
+        if self._loaded or np is None:
+            return self.matrix is not None
+        self._loaded = True
+        try:
+            with open(self.data_path, encoding="utf-8") as f:
+                examples = [json.loads(line) for line in f if line.strip()]
+            self.build(examples)
+            logger.info(f"✅ 意图示例索引: {len(self.examples)} 条")
+        except Exception as e:
+            logger.warning(f"⚠️ 意图示例索引加载失败: {e}")
+        return self.matrix is not None
+
+    def build(self, examples: List[Dict]):
+        """
+        建立索引
+
+        Args:
+            examples: [{"text", "type", "action", "entities"}]
+        """
+        grams = [char_ngrams(example["text"]) for example in examples]
+        vocab = {gram: i for i, gram in enumerate(sorted({g for gs in grams for g in gs}))}
+        matrix = np.zeros((len(examples), len(vocab)), dtype=np.float32)
+        for row, example_grams in enumerate(grams):
+            if example_grams:
+                matrix[row, [vocab[g] for g in example_grams]] = 1.0 / np.sqrt(len(example_grams))
+
+        self.examples, self.vocab = examples, vocab
+        self.matrix = matrix
+        self._loaded = True
+
+    def nearest(self, text: str, k: int = SystemConfig.INTENT_FEW_SHOT_K) -> List[Dict]:
+        """
+        与输入最相近的k个示例（余弦相似度从高到低）
+
+        Returns:
+            示例列表（附带score）；索引不可用或没有共同特征时为空
+        """
+        if not self.load() or k <= 0:
+            return []
+        grams = char_ngrams(text)
+        columns = [self.vocab[g] for g in grams if g in self.vocab]
+        if not columns:
+            return []
+
+        scores = self.matrix[:, columns].sum(axis=1) / np.sqrt(len(grams))
+        k = min(k, len(self.examples))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {**self.examples[i], "score": round(float(scores[i]), 3)}
+            for i in top if scores[i] > 0
+        ]
+
+
+def format_example(example: Dict) -> str:
+    """示例的提示词行：指令 => JSON"""
+    answer = {
+        "type": example["type"],
+        "action": example["action"],
+        "entities": example.get("entities") or {}
+    }
+    return f"{example['text']} => {json.dumps(answer, ensure_ascii=False, separators=(',', ':'))}"
+
+
+# 全局实例
+intent_example_index = IntentExampleIndex()
@@ -1,10 +1,24 @@
 """
 意图解析器 - 自然语言理解
+
+LLM阶段的提示词只包含与输入最相近的几个标注示例（few-shot），输出限制为一行JSON
+
+解析顺序：规则 -> 本地分类器 -> LLM，前一阶段置信度足够时不再进入下一阶段；
+parse()的结果按规范化后的文本缓存（含LLM增强结果），
+重复的模糊指令不再每次调用LLM
 """
-from typing import Optional, Dict, Any, List
+import asyncio
+import json
+from typing import Optional, Dict, Any, List, Tuple
 from pydantic import BaseModel
 from app.utils.logger import logger
+from app.utils.keyword_matcher import Hit, KeywordMatcher, longest_matches
+from app.utils.text_normalizer import normalize_text
+from app.utils.ttl_cache import TTLCache
+from app.utils.constants import SystemConfig
 from app.services.ai.llm_client import llm_client
+from app.services.ai.intent_classifier import intent_classifier
+from app.services.ai.intent_examples import format_example, intent_example_index
 
 
 class Intent(BaseModel):
@@ -21,12 +35,55 @@ class IntentParser:
     
     def __init__(self):
         self.intent_patterns = self._load_patterns()
+        self.cache = TTLCache(
+            maxsize=SystemConfig.INTENT_CACHE_SIZE,
+            ttl=SystemConfig.INTENT_CACHE_TTL
+        )  # 规范化文本 -> (Intent, 来源 rules/classifier/llm)
+        self.stats = {"classifier_parses": 0, "llm_parses": 0, "llm_saved": 0}
+        self._compile()
+    
+    def _compile(self):
+        """把所有意图的关键词编译为一个匹配自动机（关键词增减后需重新编译）"""
+        self._type_order = {intent_type: i for i, intent_type in enumerate(self.intent_patterns)}
+        self._type_priority = {
+            intent_type: config.get("priority", 0) for intent_type, config in self.intent_patterns.items()
+        }
+        patterns = []
+        for intent_type, config in self.intent_patterns.items():
+            actions = config["actions"]
+            for keyword in dict.fromkeys([*actions, *config["keywords"]]):
+                patterns.append((keyword, (intent_type, keyword, self._keyword_action(actions, keyword))))
+        self._keyword_order = {payload[:2]: i for i, (_, payload) in enumerate(patterns)}
+        self.matcher = KeywordMatcher(patterns)
+        # 关键词变化后旧的解析结果不再可靠
+        self.cache.clear()
+    
+    @staticmethod
+    def _keyword_action(actions: Dict[str, str], keyword: str) -> Optional[str]:
+        """关键词对应的动作（"搜索文件"取其中最长的动作词"搜索"）"""
+        if keyword in actions:
+            return actions[keyword]
+        contained = [word for word in actions if word in keyword]
+        return actions[max(contained, key=len)] if contained else None
+    
+    def add_patterns(self, intent_type: str, actions: Dict[str, str]):
+        """
+        追加关键词（如应用别名、场景名）
+        
+        Args:
+            intent_type: 意图类型
+            actions: 关键词 -> 动作
+        """
+        config = self.intent_patterns.setdefault(intent_type, {"keywords": [], "actions": {}})
+        config["actions"].update(actions)
+        self._compile()
     
     def _load_patterns(self) -> Dict:
         """加载意图模式"""
         return {
             "app_control": {
-                "keywords": ["打开", "启动", "关闭", "切换", "最小化"],
+                # "浏览器"是应用名，最长匹配时盖过其中的"浏览"，不再算作浏览网页
+                "keywords": ["打开", "启动", "关闭", "切换", "最小化", "浏览器"],
                 "actions": {
                     "打开": "open",
                     "启动": "open",
@@ -49,12 +106,17 @@ class IntentParser:
                 }
             },
             "browser_control": {
-                "keywords": ["搜索", "打开网页", "访问", "浏览"],
+                # 同分时优先：单独的"搜索"指网页搜索，"打开XX网站"指打开网页而不是应用
+                "priority": 1,
+                "keywords": ["搜索", "打开网页", "访问", "浏览", "网页", "网站", "官网"],
                 "actions": {
                     "搜索": "search",
                     "打开网页": "open",
                     "访问": "open",
-                    "浏览": "open"
+                    "浏览": "open",
+                    "网页": "open",
+                    "网站": "open",
+                    "官网": "open"
                 }
             },
             "text_processing": {
@@ -111,15 +173,8 @@ class IntentParser:
             Intent对象
         """
         try:
-            # 首先尝试规则匹配（快速）
-            intent = self._rule_based_parse(text)
-            
-            # 如果规则匹配置信度低，使用LLM增强
-            if intent.confidence < 0.8 and llm_client.is_available():
-                intent = await self._llm_based_parse(text, intent)
-            
-            logger.info(f"🎯 意图解析: {intent.type}/{intent.action} (置信度: {intent.confidence:.2f})")
-            
+            [(intent, source)] = await self.parse_batch([text])
+            logger.info(f"🎯 意图解析({source}): {intent.type}/{intent.action} (置信度: {intent.confidence:.2f})")
             return intent
             
         except Exception as e:
@@ -131,24 +186,157 @@ class IntentParser:
                 confidence=0.0
             )
     
+    async def parse_batch(self, texts: List[str], use_llm: bool = True,
+                          use_cache: bool = True) -> List[Tuple[Intent, str]]:
+        """
+        批量解析意图
+        
+        缓存、规则、本地分类器依次处理全部输入（分类器对剩余输入一次矩阵运算），
+        只有仍未确定的输入调用LLM，并发数受限；规范化后相同的输入只解析一次
+        
+        Args:
+            texts: 用户输入列表
+            use_llm: 是否允许调用LLM
+            use_cache: 是否读写解析缓存（离线评估时关闭，以统计各阶段的真实命中）
+            
+        Returns:
+            与输入顺序一致的 [(Intent, 来源)]，来源为 cache / rules / classifier / llm /
+            fallback（需要LLM但未调用或调用失败，返回规则结果）
+        """
+        keys = [normalize_text(text) for text in texts]
+        first: Dict[str, int] = {}  # 规范化文本 -> 首次出现的位置
+        for index, key in enumerate(keys):
+            first.setdefault(key, index)
+        
+        results: Dict[int, Tuple[Intent, str]] = {}
+        pending: List[Tuple[int, Intent]] = []  # 规则置信度不足的 (位置, 规则结果)
+        for index in first.values():
+            cached = self.cache.get(keys[index]) if use_cache else None
+            if cached is not None:
+                intent, source = cached
+                if source == "llm":
+                    self.stats["llm_saved"] += 1
+                results[index] = (intent, "cache")
+                continue
+            
+            # 首先尝试规则匹配（快速）
+            intent = self._rule_based_parse(texts[index])
+            if intent.confidence >= 0.8:
+                results[index] = (intent, "rules")
+            else:
+                pending.append((index, intent))
+        
+        # 规则置信度低时先用本地分类器（剩余输入一次批量预测）
+        classified = intent_classifier.classify_batch([texts[index] for index, _ in pending])
+        remaining: List[Tuple[int, Intent]] = []
+        for (index, rule_intent), result in zip(pending, classified):
+            if result is None:
+                remaining.append((index, rule_intent))
+            else:
+                self.stats["classifier_parses"] += 1
+                results[index] = (self._classifier_intent(texts[index], result), "classifier")
+        
+        # 仍然置信度低时使用LLM增强
+        if remaining and use_llm and llm_client.is_available():
+            semaphore = asyncio.Semaphore(SystemConfig.INTENT_BATCH_LLM_CONCURRENCY)
+            
+            async def enhance(index: int, rule_intent: Intent):
+                async with semaphore:
+                    self.stats["llm_parses"] += 1
+                    enhanced = await self._llm_based_parse(texts[index], rule_intent)
+                # LLM增强失败时返回的是规则结果，不缓存，下次重试
+                results[index] = (enhanced, "llm" if enhanced is not rule_intent else "fallback")
+            
+            await asyncio.gather(*(enhance(index, rule_intent) for index, rule_intent in remaining))
+        else:
+            for index, rule_intent in remaining:
+                results[index] = (rule_intent, "rules" if use_llm else "fallback")
+        
+        # 只缓存最终结果（不允许调用LLM时的规则结果可能不是最终结果）
+        if use_cache and use_llm:
+            for index, (intent, source) in results.items():
+                if source not in ("cache", "fallback"):
+                    self.cache.set(keys[index], (intent.model_copy(deep=True), source))
+        
+        output = []
+        for text, key in zip(texts, keys):
+            intent, source = results[first[key]]
+            output.append((intent.model_copy(update={"raw_text": text}, deep=True), source))
+        return output
+    
+    def _classifier_intent(self, text: str, result: Tuple[str, str, float]) -> Intent:
+        """本地分类器结果转换为Intent"""
+        intent_type, action, confidence = result
+        # 分类器只给出类型和动作；文本中含有该意图的关键词时仍按关键词提取实体
+        keywords = [
+            keyword for _, _, (hit_type, keyword, _) in self._match(text) if hit_type == intent_type
+        ]
+        entities = self._extract_entities(text, intent_type, max(keywords, key=len)) if keywords else {}
+        return Intent(
+            type=intent_type,
+            action=action,
+            entities=entities,
+            confidence=confidence,
+            raw_text=text
+        )
+    
+    def get_stats(self) -> Dict:
+        """获取解析缓存统计（llm_saved: 命中缓存而省去的LLM调用数）"""
+        return {**self.cache.get_stats(), **self.stats}
+    
+    def parse_rules(self, text: str) -> Intent:
+        """只使用规则解析（不调用LLM，用于快速路由）"""
+        return self._rule_based_parse(text)
+    
+    def candidate_types(self, text: str) -> List[str]:
+        """文本命中关键词的所有意图类型（多于一个说明存在歧义）"""
+        types = {intent_type for _, _, (intent_type, _, action) in self._match(text) if action}
+        return sorted(types, key=self._type_order.get)
+    
+    def keyword_scores(self, text: str) -> Dict[str, int]:
+        """文本命中各意图类型关键词的个数（用于筛选相关工具）"""
+        keywords: Dict[str, set] = {}
+        for _, _, (intent_type, keyword, _) in self.matcher.find_all(text):
+            keywords.setdefault(intent_type, set()).add(keyword)
+        return {intent_type: len(hits) for intent_type, hits in keywords.items()}
+    
+    def _keyword_rank(self, intent_type: str, keyword: str) -> tuple:
+        """关键词优先级：越长越优先，其次按定义顺序"""
+        return -len(keyword), self._keyword_order[(intent_type, keyword)]
+    
+    def _match(self, text: str) -> List[Hit]:
+        """一次扫描找出所有关键词命中，只保留最长匹配"""
+        return longest_matches(self.matcher.find_all(text))
+    
     def _rule_based_parse(self, text: str) -> Intent:
-        """基于规则的意图识别"""
-        text_lower = text.lower()
+        """
+        基于规则的意图识别
         
-        # 遍历所有意图类型
-        for intent_type, config in self.intent_patterns.items():
-            for keyword, action in config["actions"].items():
-                if keyword in text:
-                    # 提取实体
-                    entities = self._extract_entities(text, intent_type, keyword)
-                    
-                    return Intent(
-                        type=intent_type,
-                        action=action,
-                        entities=entities,
-                        confidence=0.85,
-                        raw_text=text
-                    )
+        每个意图类型按命中关键词的总长度计分，得分最高的意图胜出（同分时按模式的priority，再按定义顺序）；
+        动作取该意图最长的命中关键词（同长度时按定义顺序）
+        """
+        scores: Dict[str, int] = {}
+        best: Dict[str, tuple] = {}  # 意图类型 -> (关键词, 动作)
+        for start, end, (intent_type, keyword, action) in self._match(text):
+            if action is None:
+                continue
+            scores[intent_type] = scores.get(intent_type, 0) + end - start
+            current = best.get(intent_type)
+            if current is None or self._keyword_rank(intent_type, keyword) < self._keyword_rank(intent_type, current[0]):
+                best[intent_type] = (keyword, action)
+        
+        if scores:
+            intent_type = max(
+                scores, key=lambda t: (scores[t], self._type_priority[t], -self._type_order[t])
+            )
+            keyword, action = best[intent_type]
+            return Intent(
+                type=intent_type,
+                action=action,
+                entities=self._extract_entities(text, intent_type, keyword),
+                confidence=0.85,
+                raw_text=text
+            )
         
         # 未匹配到
         return Intent(
@@ -199,34 +387,37 @@ class IntentParser:
         
         return entities
     
+    def _build_llm_prompt(self, text: str) -> str:
+        """LLM意图解析提示词：意图类型 + 最相近的标注示例 + 待解析指令"""
+        types = "/".join([*self.intent_patterns, "unknown"])
+        lines = [
+            f"把用户指令解析为一行JSON（type取值：{types}；不是指令时type和action为unknown），只返回JSON。"
+        ]
+        examples = intent_example_index.nearest(text)
+        if examples:
+            lines.append("示例：")
+            lines.extend(format_example(example) for example in examples)
+        lines.append(f"{text} =>")
+        return "\n".join(lines)
+    
+    @staticmethod
+    def _extract_json(response: str) -> Dict[str, Any]:
+        """从回复中取出JSON对象（兼容```json代码块和前后多余文字）"""
+        start, end = response.find("{"), response.rfind("}")
+        if start < 0 or end < start:
+            raise ValueError(f"回复中没有JSON: {response[:50]}")
+        return json.loads(response[start:end + 1])
+    
     async def _llm_based_parse(self, text: str, fallback_intent: Intent) -> Intent:
-        """使用LLM增强意图识别"""
+        """使用LLM增强意图识别（few-shot提示词，输出长度受限）"""
         try:
-            prompt = f"""
-分析以下用户指令，返回JSON格式的意图信息：
-
-用户指令：{text}
-
-请按以下格式返回：
-{{
-    "type": "意图类型（app_control/file_operation/browser_control/text_processing/media_control/scene）",
-    "action": "具体动作（open/close/create/search等）",
-    "entities": {{
-        "key": "value"
-    }},
-    "confidence": 0.95
-}}
-
-只返回JSON，不要其他内容。
-"""
-            
-            messages = [{"role": "user", "content": prompt}]
-            response = await llm_client.chat(messages, temperature=0.3)
+            messages = [{"role": "user", "content": self._build_llm_prompt(text)}]
+            response = await llm_client.chat(
+                messages, temperature=0.3, max_tokens=SystemConfig.INTENT_LLM_MAX_TOKENS
+            )
             
             if response:
-                import json
-                # 尝试解析JSON
-                intent_data = json.loads(response)
+                intent_data = self._extract_json(response)
                 return Intent(
                     type=intent_data.get("type", fallback_intent.type),
                     action=intent_data.get("action", fallback_intent.action),
@@ -0,0 +1,240 @@
+"""
+意图路由器 - 高置信度、参数完整的单步指令直接执行工具，跳过LLM Agent
+
+"打开记事本"这类指令规则解析即可确定工具和参数，
+走Agent需要至少两次LLM往返（选择工具 + 总结结果）；
+只有含糊、缺参数或多步骤的请求才交给Agent
+"""
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from app.utils.logger import logger
+from app.utils.constants import SystemConfig
+from app.tools.base_tool import tool_registry
+from app.services.ai.intent_parser import Intent, intent_parser
+
+
+# 意图类型 -> 工具名
+INTENT_TOOLS = {
+    "app_control": "app_control",
+    "file_operation": "file_operation",
+    "browser_control": "browser_control",
+    "text_processing": "text_processing",
+    "media_control": "media_control",
+    "scene": "scene_manager"
+}
+
+# 意图实体名 -> 工具参数名
+ENTITY_PARAMS = {
+    "media_control": {"volume": "level"},
+    "file_operation": {"file_name": "path"},
+}
+
+# 场景意图动作 -> 场景名
+SCENE_NAMES = {
+    "prepare_work": "prepare_work",
+    "create_mode": "create_mode",
+    "study_mode": "study_mode",
+    "relax_mode": "relax_mode"
+}
+
+# 快速路径只接受"动作词 + 实体"形式的指令，实体由命名分组完整捕获（组名为意图实体名）；
+# 其他说法交给Agent，规则解析剩下的文字（如"新建文件test.txt"中的"文件test.txt"）不能直接当作参数
+POLITE_PREFIX = r"(?:请你|请|帮我|麻烦你|麻烦|给我)*"
+TRAILING_PARTICLES = r"(?:一下|吧|了|啊|呀|哦|谢谢)*"
+NAME = r"[A-Za-z0-9\u4e00-\u9fff][A-Za-z0-9\u4e00-\u9fff .+_-]*?"
+FAST_PATH_PATTERNS = {
+    intent_type: [re.compile(f"{POLITE_PREFIX}{pattern}{TRAILING_PARTICLES}") for pattern in patterns]
+    for intent_type, patterns in {
+        "app_control": [rf"(?:打开|启动|关闭|切换到?|最小化)\s*(?P<app_name>{NAME})"],
+        "file_operation": [
+            r"(?:创建|新建|删除|打开文件)\s*(?:一个)?(?:新)?(?:文件)?\s*"
+            r"(?P<file_name>[^\s\\/:*?\"<>|]+\.[A-Za-z0-9]{1,8})"
+        ],
+        "browser_control": [
+            r"(?:打开网页|访问|浏览)\s*(?P<url>(?:https?://)?[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)+(?:/\S*)?)"
+        ],
+        "media_control": [
+            r"(?:把)?音量(?:调到|调成|调至|设为|设置为|设置到|设到)?\s*(?P<volume>\d{1,3})\s*%?",
+            r"(?:暂停|截图)",
+        ],
+    }.items()
+}
+
+# 需要转换为整数的实体
+INT_ENTITIES = {"volume"}
+
+# 系统查询必须包含明确的问法（"今天天气怎么样"中的"今天"不算）
+SYSTEM_QUERY_MARKERS = ("几点", "时间", "日期", "星期", "几号", "周几")
+
+# 出现这些词说明可能是多步骤请求
+MULTI_STEP_MARKERS = ("然后", "接着", "之后", "并且", "同时", "再", "，", ",", "；", ";", "。")
+
+
+class RouteDecision(BaseModel):
+    """路由决策"""
+    path: str  # fast_path: 直接执行工具；plan_cache: 重放执行计划；agent: LLM Agent；simple: Agent不可用时的简化模式
+    reason: str
+    intent: Optional[Intent] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """响应中返回的路由信息"""
+        data = {"path": self.path, "reason": self.reason}
+        if self.intent is not None:
+            data["intent"] = f"{self.intent.type}/{self.intent.action}"
+            data["confidence"] = self.intent.confidence
+        return data
+
+
+def build_tool_call(intent: Intent) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    将意图转换为工具调用
+
+    Returns:
+        (工具名, 参数)；意图没有对应工具时返回None
+    """
+    tool_name = INTENT_TOOLS.get(intent.type)
+    if not tool_name:
+        return None
+
+    if tool_name == "scene_manager":
+        return tool_name, {"scene_name": SCENE_NAMES.get(intent.action, "prepare_work")}
+
+    aliases = ENTITY_PARAMS.get(intent.type, {})
+    params = {"action": intent.action}
+    for key, value in intent.entities.items():
+        params[aliases.get(key, key)] = value
+    return tool_name, params
+
+
+class IntentRouter:
+    """快速路径路由器"""
+
+    def __init__(self):
+        self.min_confidence = SystemConfig.FAST_PATH_MIN_CONFIDENCE
+        self.max_length = SystemConfig.FAST_PATH_MAX_LENGTH
+        self.prune_top_k = SystemConfig.TOOL_PRUNE_TOP_K
+        self.prune_min_confidence = SystemConfig.TOOL_PRUNE_MIN_CONFIDENCE
+
+    def route(self, text: str, agent_available: bool = True) -> RouteDecision:
+        """
+        选择执行路径（只使用规则解析，不调用LLM）
+
+        Args:
+            text: 用户输入（已解析指代）
+            agent_available: LLM Agent是否可用
+
+        Returns:
+            RouteDecision对象
+        """
+        if not agent_available:
+            return RouteDecision(path="simple", reason="agent_unavailable")
+
+        intent = intent_parser.parse_rules(text)
+        reason, intent = self._check(text, intent)
+        decision = RouteDecision(
+            path="fast_path" if reason == "ok" else "agent",
+            reason=reason,
+            intent=intent
+        )
+        logger.info(f"🧭 路由: {decision.path} ({reason}) - {text}")
+        return decision
+
+    def select_tools(self, text: str) -> Optional[List[str]]:
+        """
+        按关键词筛选与指令相关的工具（Agent只需看到这些工具的定义）
+        
+        Returns:
+            按相关度排序的工具名；置信度低、没有相关工具或相关工具过多时返回None（使用全部工具）
+        """
+        intent = intent_parser.parse_rules(text)
+        if intent.confidence < self.prune_min_confidence:
+            return None
+        
+        scores: Dict[str, int] = {}
+        for intent_type, hits in intent_parser.keyword_scores(text).items():
+            tool_name = INTENT_TOOLS.get(intent_type)
+            if tool_name and tool_registry.get_tool(tool_name) is not None:
+                scores[tool_name] = scores.get(tool_name, 0) + hits
+        
+        if not scores or len(scores) > self.prune_top_k:
+            return None
+        return sorted(scores, key=lambda name: -scores[name])
+    
+    def _check(self, text: str, intent: Intent) -> Tuple[str, Intent]:
+        """
+        检查能否走快速路径
+
+        Returns:
+            (原因, 意图)：原因为ok时可以走快速路径，意图的实体换为按指令形式完整捕获的实体
+        """
+        if intent.confidence < self.min_confidence:
+            return "low_confidence", intent
+
+        stripped = text.strip()
+        if len(stripped) > self.max_length or any(m in stripped for m in MULTI_STEP_MARKERS):
+            return "multi_step", intent
+
+        if len(intent_parser.candidate_types(stripped)) > 1:
+            return "ambiguous", intent
+
+        if intent.type == "system_query":
+            if not any(m in stripped for m in SYSTEM_QUERY_MARKERS):
+                return "ambiguous", intent
+            return "ok", intent
+
+        # 场景名来自关键词本身，其余意图的实体必须完整匹配指令形式
+        if intent.type != "scene":
+            entities = self._extract_entities(stripped, intent.type)
+            if entities is None:
+                return "missing_entities", intent
+            intent = intent.model_copy(update={"entities": entities})
+
+        call = build_tool_call(intent)
+        if call is None:
+            return "no_tool", intent
+        tool_name, params = call
+
+        tool = tool_registry.get_tool(tool_name)
+        if tool is None:
+            return "no_tool", intent
+
+        # 动作和场景名必须是工具支持的取值
+        properties = tool.parameters.get("properties", {})
+        for param in ("action", "scene_name"):
+            allowed = properties.get(param, {}).get("enum")
+            if param in params and allowed and params[param] not in allowed:
+                return "unsupported_action", intent
+
+        valid, _ = tool.validate_params(params)
+        if not valid:
+            return "missing_entities", intent
+
+        # 有参数需求的动作必须带上对应实体（如"音量"缺少数值）
+        if intent.type == "media_control" and intent.action == "volume" and "level" not in params:
+            return "missing_entities", intent
+
+        return "ok", intent
+
+    @staticmethod
+    def _extract_entities(text: str, intent_type: str) -> Optional[Dict[str, Any]]:
+        """
+        按快速路径的指令形式提取实体
+
+        Returns:
+            实体；指令不符合该意图的任何形式时返回None
+        """
+        text = unicodedata.normalize("NFKC", text)
+        for pattern in FAST_PATH_PATTERNS.get(intent_type, []):
+            match = pattern.fullmatch(text)
+            if match:
+                return {
+                    key: int(value) if key in INT_ENTITIES else value.strip()
+                    for key, value in match.groupdict().items()
+                }
+        return None
+
+
+# 全局实例
+intent_router = IntentRouter()
@@ -1,10 +1,15 @@
 """
 大模型客户端 - DeepSeek/通义千问
 """
-from typing import Optional, List, Dict, Any
+import time
+from typing import Optional, List, Dict, Any, AsyncIterator
 from openai import AsyncOpenAI
 from app.config import settings
 from app.utils.logger import logger
+from app.utils.turn_metrics import current_turn
+from app.utils.constants import SystemConfig
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded
 
 
 class LLMClient:
@@ -29,6 +34,21 @@ class LLMClient:
         except Exception as e:
             logger.error(f"LLM客户端初始化失败: {e}")
     
+    async def warm_up(self, timeout: float = 5.0):
+        """
+        预先建立到LLM服务的连接（DNS + TCP + TLS），连接保留在连接池中供后续请求复用
+        
+        预热失败不影响服务，首个请求重新建立连接即可
+        """
+        if not self.client:
+            return
+        try:
+            await self.client.with_options(timeout=timeout, max_retries=0).models.list()
+            logger.info("✅ LLM连接预热完成")
+        except Exception as e:
+            # 接口不支持models列表时连接同样已建立
+            logger.info(f"LLM连接预热: {type(e).__name__}")
+    
     async def chat(self, 
                    messages: List[Dict[str, str]], 
                    temperature: float = 0.7,
@@ -43,28 +63,135 @@ class LLMClient:
             
         Returns:
             AI回复文本
+        
+        Raises:
+            DeadlineExceeded: 请求截止时间已到（其余错误降级处理）
         """
         try:
             if not self.client:
                 # 降级：使用规则引擎
                 return await self._chat_fallback(messages)
             
-            response = await self.client.chat.completions.create(
-                model=settings.DEEPSEEK_MODEL,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens
+            start = time.perf_counter()
+            response = await deadline.wait(
+                self.client.chat.completions.create(
+                    model=settings.DEEPSEEK_MODEL,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                ),
+                "LLM调用", cap=SystemConfig.LLM_TIMEOUT
             )
+            self._record_call(start, response.usage)
             
             reply = response.choices[0].message.content
             logger.info(f"✅ LLM回复成功 (tokens: {response.usage.total_tokens})")
             
             return reply
             
+        except DeadlineExceeded:
+            # 截止时间已到时交给调用方返回部分结果，不做降级回复
+            raise
         except Exception as e:
             logger.error(f"LLM调用失败: {e}")
             return await self._chat_fallback(messages)
     
+    async def chat_with_tools_stream(self,
+                                     messages: List[Dict[str, Any]],
+                                     tools: List[Dict],
+                                     temperature: float = 0.7,
+                                     max_tokens: int = 2000) -> AsyncIterator[Dict]:
+        """
+        带Tool Calling的流式对话（一次回复可包含多个工具调用）
+        
+        Args:
+            messages: 消息列表（可包含assistant的tool_calls和tool结果消息）
+            tools: 工具列表 [{"type": "function", "function": schema}]
+            temperature: 温度（0-1）
+            max_tokens: 最大token数
+            
+        Yields:
+            {"type": "token", "delta": "文本增量"}
+            最后一条: {"type": "message", "content": "完整文本",
+                       "tool_calls": [{"id": "", "name": "", "arguments": "JSON字符串"}],
+                       "usage": {"prompt_tokens": 0, "completion_tokens": 0, ...}}
+        
+        Raises:
+            RuntimeError: 未配置LLM
+            DeadlineExceeded: 请求截止时间已到
+        """
+        if not self.client:
+            raise RuntimeError("LLM未配置")
+        
+        start = time.perf_counter()
+        stream = await deadline.wait(
+            self.client.chat.completions.create(
+                model=settings.DEEPSEEK_MODEL,
+                messages=messages,
+                tools=tools,
+                tool_choice="auto",
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                # 最后一个分片附带token用量（含服务端前缀缓存命中数）
+                extra_body={"stream_options": {"include_usage": True}}
+            ),
+            "LLM调用", cap=SystemConfig.LLM_TIMEOUT
+        )
+        
+        content = ""
+        usage: Dict[str, int] = {}
+        calls: Dict[int, Dict[str, str]] = {}  # 按index拼接分片到达的工具调用
+        async for chunk in deadline.iterate(stream, "LLM调用", cap=SystemConfig.LLM_TIMEOUT):
+            if getattr(chunk, "usage", None):
+                usage = self._usage_dict(chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content += delta.content
+                yield {"type": "token", "delta": delta.content}
+            for tool_call in delta.tool_calls or []:
+                call = calls.setdefault(tool_call.index, {"id": "", "name": "", "arguments": ""})
+                if tool_call.id:
+                    call["id"] = tool_call.id
+                if tool_call.function:
+                    call["name"] += tool_call.function.name or ""
+                    call["arguments"] += tool_call.function.arguments or ""
+        
+        tool_calls = [calls[index] for index in sorted(calls)]
+        if tool_calls:
+            logger.info(f"🔧 Tool Calls: {[call['name'] for call in tool_calls]}")
+        self._record_call(start, usage)
+        if usage:
+            logger.info(
+                f"📊 Tokens: prompt {usage.get('prompt_tokens', 0)} "
+                f"(缓存命中 {usage.get('prompt_cache_hit_tokens', 0)}), "
+                f"completion {usage.get('completion_tokens', 0)}"
+            )
+        yield {"type": "message", "content": content, "tool_calls": tool_calls, "usage": usage}
+    
+    def _record_call(self, start: float, usage: Any):
+        """记录一次LLM调用的耗时和token用量到当前对话轮次"""
+        turn = current_turn()
+        if turn is not None:
+            turn.record_llm((time.perf_counter() - start) * 1000, self._usage_dict(usage))
+    
+    @staticmethod
+    def _usage_dict(usage: Any) -> Dict[str, Any]:
+        """token用量转换为字典（只保留整数计数及其明细，如prompt_tokens_details，兼容SDK未声明的字段）"""
+        if usage is None:
+            return {}
+        if not isinstance(usage, dict):
+            usage = usage.model_dump() if hasattr(usage, "model_dump") else vars(usage)
+        result = {}
+        for key, value in usage.items():
+            if isinstance(value, int):
+                result[key] = value
+            elif isinstance(value, dict) or hasattr(value, "__dict__"):
+                result[key] = LLMClient._usage_dict(value)
+        return result
+    
     async def chat_with_functions(self,
                                   messages: List[Dict[str, str]],
                                   functions: List[Dict],
@@ -79,18 +206,26 @@ class LLMClient:
             
         Returns:
             {"reply": "文本", "function_call": {...}} 或 None
+        
+        Raises:
+            DeadlineExceeded: 请求截止时间已到（其余错误降级处理）
         """
         try:
             if not self.client:
                 return await self._chat_fallback(messages)
             
-            response = await self.client.chat.completions.create(
-                model=settings.DEEPSEEK_MODEL,
-                messages=messages,
-                functions=functions,
-                function_call=function_call,
-                temperature=0.7
+            start = time.perf_counter()
+            response = await deadline.wait(
+                self.client.chat.completions.create(
+                    model=settings.DEEPSEEK_MODEL,
+                    messages=messages,
+                    functions=functions,
+                    function_call=function_call,
+                    temperature=0.7
+                ),
+                "LLM调用", cap=SystemConfig.LLM_TIMEOUT
             )
+            self._record_call(start, response.usage)
             
             choice = response.choices[0]
             
@@ -108,6 +243,9 @@ class LLMClient:
             
             return result
             
+        except DeadlineExceeded:
+            # 截止时间已到时交给调用方返回部分结果，不做降级回复
+            raise
         except Exception as e:
             logger.error(f"LLM Function Calling失败: {e}")
             return None
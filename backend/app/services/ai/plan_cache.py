@@ -0,0 +1,97 @@
+"""
+执行计划缓存 - 记录Agent成功执行的工具序列，重复指令直接重放，不再调用LLM
+
+缓存键为（工具定义版本, 规范化指令）：工具或参数定义变化后旧计划自动失效；
+依赖上下文的指令（"关闭它"、"再来一次"）不缓存
+"""
+from typing import Dict, List, Optional, Tuple
+from app.utils.logger import logger
+from app.utils.constants import SystemConfig
+from app.utils.ttl_cache import TTLCache
+from app.utils.text_normalizer import normalize_text
+from app.tools.base_tool import tool_registry
+
+# 含这些词的指令依赖对话上下文，同样的说法在不同时刻含义不同
+CONTEXT_DEPENDENT_WORDS = ("它", "这个", "那个", "刚才", "上一个", "再", "继续", "还是")
+
+
+class PlanCache:
+    """执行计划缓存（LRU + TTL）"""
+
+    def __init__(self):
+        self.cache = TTLCache(maxsize=SystemConfig.PLAN_CACHE_SIZE, ttl=SystemConfig.PLAN_CACHE_TTL)
+        self.stats = {"recorded": 0, "rejected": 0, "invalidated": 0}
+
+    @staticmethod
+    def _key(text: str) -> Optional[Tuple[str, str]]:
+        """缓存键；不可缓存的指令返回None"""
+        normalized = normalize_text(text)
+        if not normalized or any(word in normalized for word in CONTEXT_DEPENDENT_WORDS):
+            return None
+        return tool_registry.version(), normalized
+
+    def lookup(self, text: str) -> Optional[Dict]:
+        """
+        查找指令的执行计划
+
+        Returns:
+            {"steps": [{"tool": "", "tool_input": {}}], "output": "原回复"}；未命中返回None
+        """
+        key = self._key(text)
+        if key is None:
+            return None
+        plan = self.cache.get(key)
+        if plan is not None:
+            logger.info(f"⚡ 命中执行计划缓存: {key[1]} ({len(plan['steps'])} 步)")
+        return plan
+
+    def record(self, text: str, steps: List[Dict], output: str) -> bool:
+        """
+        记录Agent的执行计划（只记录全部步骤成功的计划）
+
+        Returns:
+            是否已记录
+        """
+        key = self._key(text)
+        if key is None or not steps:
+            return False
+
+        if not all(self._succeeded(step) for step in steps):
+            self.stats["rejected"] += 1
+            return False
+
+        self.cache.set(key, {
+            "steps": [{"tool": step["tool"], "tool_input": dict(step["tool_input"])} for step in steps],
+            "output": output
+        })
+        self.stats["recorded"] += 1
+        logger.info(f"📝 记录执行计划: {key[1]} ({len(steps)} 步)")
+        return True
+
+    def invalidate(self, text: str):
+        """移除指令的执行计划（重放失败时调用）"""
+        key = self._key(text)
+        if key is not None and self.cache.pop(key) is not None:
+            self.stats["invalidated"] += 1
+
+    @staticmethod
+    def _succeeded(step: Dict) -> bool:
+        """步骤是否成功且可重放"""
+        return (
+            isinstance(step.get("tool_input"), dict)
+            and str(step.get("result") or "").startswith("成功")
+            and tool_registry.get_tool(step.get("tool", "")) is not None
+        )
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计"""
+        return {
+            **self.cache.get_stats(),
+            **self.stats,
+            "ttl": self.cache.ttl,
+            "tool_version": tool_registry.version()
+        }
+
+
+# 全局实例
+plan_cache = PlanCache()
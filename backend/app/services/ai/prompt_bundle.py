@@ -0,0 +1,82 @@
+"""
+提示词包 - 由工具注册表生成的系统提示词和工具定义，按注册表版本缓存
+
+每次请求发送给LLM的前缀（系统提示词 + 工具定义）只取决于注册的工具，
+生成一次后逐字节不变，服务端的前缀缓存（Prompt Caching）可以命中；
+提示词中不放时间、会话等每次变化的内容
+"""
+from typing import Dict, FrozenSet, List, Optional
+from app.config import settings
+from app.utils.logger import logger
+from app.tools.base_tool import tool_registry
+
+PROMPT_HEADER = """你是VoicePC智能助手，帮助用户通过语音控制Windows电脑。
+
+你可以使用以下工具来完成用户的请求："""
+
+PROMPT_FOOTER = """请根据用户的指令，选择合适的工具来完成任务。
+如果任务需要多个步骤，请逐步执行；互不依赖的操作可以在一次回复中同时调用多个工具。
+执行完成后，用简洁友好的语言总结结果。"""
+
+# 关闭LLM总结时：一轮工具执行完即结束，回复由模板生成
+TEMPLATE_PROMPT_FOOTER = """请根据用户的指令，选择合适的工具来完成任务。
+请在一次回复中同时调用完成任务所需的全部工具；工具的执行结果会直接回复给用户，不需要再总结。"""
+
+
+class PromptBundle:
+    """某一版本工具定义对应的提示词和schema（生成后只读）"""
+
+    def __init__(self, version: str, schemas: List[Dict], summarize: bool = True):
+        """
+        Args:
+            version: 工具注册表版本
+            schemas: 按工具名排序的工具schema
+            summarize: 工具执行后是否由LLM总结结果（决定提示词结尾）
+        """
+        self.version = version
+        self.summarize = summarize
+        self.schemas: Dict[str, Dict] = {schema["name"]: schema for schema in schemas}
+        self.tools: List[Dict] = [{"type": "function", "function": schema} for schema in schemas]
+        self.tool_listing: List[Dict] = [
+            {"name": schema["name"], "description": schema["description"], "schema": schema}
+            for schema in schemas
+        ]
+
+        lines = [f"- {schema['name']}: {schema['description']}" for schema in schemas]
+        footer = PROMPT_FOOTER if summarize else TEMPLATE_PROMPT_FOOTER
+        self.system_prompt = "\n".join([PROMPT_HEADER, *lines, "", footer])
+        self._subsets: Dict[FrozenSet[str], List[Dict]] = {}
+
+    def select_tools(self, names: Optional[List[str]] = None) -> List[Dict]:
+        """
+        工具定义子集（保持按工具名排序，相同子集返回同一列表）
+
+        Args:
+            names: 工具名，为空时返回全部工具
+        """
+        if not names:
+            return self.tools
+        key = frozenset(names)
+        if key not in self._subsets:
+            self._subsets[key] = [tool for tool in self.tools if tool["function"]["name"] in key]
+        return self._subsets[key]
+
+
+class PromptBundleCache:
+    """按工具注册表版本缓存提示词包"""
+
+    def __init__(self):
+        self._bundle: Optional[PromptBundle] = None
+
+    def get(self) -> PromptBundle:
+        """获取当前工具定义对应的提示词包（工具变化时重新生成）"""
+        version = tool_registry.version()
+        summarize = settings.AGENT_LLM_SUMMARY
+        if self._bundle is None or self._bundle.version != version or self._bundle.summarize != summarize:
+            self._bundle = PromptBundle(version, tool_registry.get_schemas(), summarize)
+            logger.info(f"📦 生成提示词包: 版本 {version}，{len(self._bundle.tools)} 个工具")
+        return self._bundle
+
+
+# 全局实例
+prompt_bundle_cache = PromptBundleCache()
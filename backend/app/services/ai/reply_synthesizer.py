@@ -0,0 +1,155 @@
+"""
+回复合成器 - 用模板把工具执行结果组合成最终回复，省去让LLM总结结果的一次往返
+
+工具返回的ToolResult.message本身就是面向用户的句子（"已将音量设置为 30%"），
+模板只负责补充失败说明和多步骤的拼接；可通过配置REPLY_TEMPLATES_PATH指定的JSON文件覆盖：
+    {"success": {"media_control/volume": "好的，音量已调到{level}"},
+     "failure": {"*": "抱歉，{label}没有成功：{error}"},
+     "labels": {"media_control": "音量调节"}}
+"""
+import json
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.utils.logger import logger
+from app.services.ai.intent_parser import Intent
+
+# 工具名 -> 失败时的操作名
+TOOL_LABELS = {
+    "app_control": "应用操作",
+    "file_operation": "文件操作",
+    "browser_control": "浏览器操作",
+    "text_processing": "文本处理",
+    "media_control": "多媒体控制",
+    "scene_manager": "场景执行"
+}
+
+# 模板键依次查找 "工具名/动作"、"工具名"、"*"
+# 可用字段：message、error、label、tool、action 以及工具参数
+SUCCESS_TEMPLATES = {
+    "*": "{message}"
+}
+
+FAILURE_TEMPLATES = {
+    "*": "{label}失败：{error}"
+}
+
+STEP_SEPARATOR = "；"
+
+
+class _Fields(dict):
+    """模板缺少字段时留空，不抛KeyError"""
+
+    def __missing__(self, key: str) -> str:
+        return ""
+
+
+class ReplySynthesizer:
+    """基于模板的回复合成器"""
+
+    def __init__(self,
+                 success_templates: Optional[Dict[str, str]] = None,
+                 failure_templates: Optional[Dict[str, str]] = None,
+                 labels: Optional[Dict[str, str]] = None,
+                 templates_path: Optional[str] = None):
+        """
+        Args:
+            success_templates: 成功模板（覆盖默认模板中的同名键）
+            failure_templates: 失败模板（覆盖默认模板中的同名键）
+            labels: 失败时的操作名（覆盖TOOL_LABELS中的同名键）
+            templates_path: 模板覆盖文件（为空时使用配置REPLY_TEMPLATES_PATH），优先级低于参数
+        """
+        overrides = self._load(settings.REPLY_TEMPLATES_PATH if templates_path is None else templates_path)
+        self.success_templates = {**SUCCESS_TEMPLATES, **overrides.get("success", {}), **(success_templates or {})}
+        self.failure_templates = {**FAILURE_TEMPLATES, **overrides.get("failure", {}), **(failure_templates or {})}
+        self.labels = {**TOOL_LABELS, **overrides.get("labels", {}), **(labels or {})}
+
+    @staticmethod
+    def _load(path: str) -> Dict[str, Dict[str, str]]:
+        """读取模板覆盖文件（未配置或格式错误时不覆盖，错误的模板逐条跳过）"""
+        if not path:
+            return {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ 回复模板加载失败: {e}")
+            return {}
+
+        overrides = {}
+        for section in ("success", "failure", "labels"):
+            entries = data.get(section) or {}
+            overrides[section] = {}
+            for key, template in entries.items():
+                try:
+                    str(template).format_map(_Fields())
+                except (ValueError, IndexError) as e:
+                    logger.warning(f"⚠️ 回复模板格式错误，已跳过 {section}.{key}: {e}")
+                    continue
+                overrides[section][key] = str(template)
+        logger.info(f"✅ 回复模板已加载: {path}")
+        return overrides
+
+    def render(self, tool: str, tool_input: Optional[Dict[str, Any]], success: bool,
+               message: str, error: Optional[str] = None, intent: Optional[Intent] = None) -> str:
+        """
+        生成单个工具调用的回复
+
+        Args:
+            tool: 工具名
+            tool_input: 工具参数
+            success: 是否成功
+            message: ToolResult.message
+            error: ToolResult.error
+            intent: 用户意图（参数中没有动作时使用意图的动作）
+        """
+        tool_input = tool_input or {}
+        action = tool_input.get("action") or (intent.action if intent else "")
+        templates = self.success_templates if success else self.failure_templates
+        template = templates.get(f"{tool}/{action}") or templates.get(tool) or templates["*"]
+
+        fields = _Fields(tool_input)
+        fields.update(
+            message=message,
+            error=error or message,
+            label=self.labels.get(tool, tool),
+            tool=tool,
+            action=action
+        )
+        return template.format_map(fields).strip()
+
+    def compose(self, steps: List[Dict], intent: Optional[Intent] = None) -> str:
+        """
+        由Agent的执行步骤生成最终回复
+
+        Args:
+            steps: [{"tool": "", "tool_input": {}, "result": "成功: ... / 失败: ..."}]
+            intent: 用户意图
+        """
+        parts = []
+        for step in steps:
+            result = str(step.get("result") or "")
+            status, _, message = result.partition(":")
+            if status not in ("成功", "失败"):
+                status, message = "失败", result
+            success = status == "成功"
+            message = message.strip()
+            parts.append(self.render(step["tool"], step.get("tool_input"), success, message, intent=intent))
+        return STEP_SEPARATOR.join(part for part in parts if part)
+
+    def partial(self, steps: List[Dict], intent: Optional[Intent] = None) -> str:
+        """
+        截止时间已到时的回复：说明已完成的步骤数和结果
+
+        例如 "执行超时，已完成2/3步：已成功打开 微信；已将音量设置为 30%"
+        """
+        done = [step for step in steps if str(step.get("result") or "").startswith("成功")]
+        if not steps:
+            return "执行超时，请稍后重试"
+        summary = f"执行超时，已完成{len(done)}/{len(steps)}步"
+        if done:
+            summary += "：" + self.compose(done, intent)
+        return summary
+
+
+# 全局实例
+reply_synthesizer = ReplySynthesizer()
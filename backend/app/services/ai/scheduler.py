@@ -0,0 +1,148 @@
+"""
+执行调度器 - 限制同时执行的Agent任务数，排队任务按优先级获得执行槽
+
+突发请求时不会同时向LLM发出几十个请求触发限流：
+超出并发上限的任务排队，语音交互优先于后台批量任务；
+执行中 + 排队的任务总数超过上限时直接拒绝
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, List, Tuple
+from app.utils.logger import logger
+from app.utils.constants import SystemConfig
+from app.utils.turn_metrics import current_turn
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded
+
+# 优先级（数值越小越先执行）
+PRIORITY_VOICE = 0  # WebSocket语音/实时对话
+PRIORITY_CHAT = 1  # HTTP对话（/chat/send、/chat/stream）
+PRIORITY_BATCH = 2  # /api/task批量任务
+
+PRIORITY_NAMES = {
+    PRIORITY_VOICE: "voice",
+    PRIORITY_CHAT: "chat",
+    PRIORITY_BATCH: "batch"
+}
+
+
+class SchedulerBusyError(RuntimeError):
+    """执行中和排队的任务已达上限"""
+
+
+class AgentScheduler:
+    """带优先级队列的并发限制器"""
+
+    def __init__(self, max_concurrency: int, max_pending: int):
+        """
+        Args:
+            max_concurrency: 同时执行的任务数
+            max_pending: 执行中 + 排队的任务上限
+        """
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.running = 0
+        self.queued = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []  # (优先级, 序号, Future)
+        self._sequence = itertools.count()
+        self.wait_times: Dict[str, Deque[float]] = {
+            name: deque(maxlen=1000) for name in PRIORITY_NAMES.values()
+        }  # 最近的排队等待时间（毫秒）
+        self.stats = {"admitted": 0, "delayed": 0, "rejected": 0, "expired": 0}  # delayed: 需要排队的任务数；expired: 排队到截止时间的任务数
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_CHAT) -> AsyncIterator[None]:
+        """
+        占用一个执行槽（async with）
+
+        Raises:
+            SchedulerBusyError: 执行中和排队的任务已达上限
+            DeadlineExceeded: 排队期间请求截止时间已到
+        """
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: int = PRIORITY_CHAT):
+        """获取执行槽，没有空闲槽时按优先级排队（最多排到请求截止时间）"""
+        if self.running + self.queued >= self.max_pending:
+            self.stats["rejected"] += 1
+            logger.warning(f"⚠️ 执行队列已满，拒绝任务（执行中 {self.running}，排队 {self.queued}）")
+            raise SchedulerBusyError("服务繁忙，请稍后再试")
+
+        start = time.perf_counter()
+        if self.running < self.max_concurrency and not self.queued:
+            self.running += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+            self.queued += 1
+            self.stats["delayed"] += 1
+            try:
+                # release()移交执行槽时running不变；超时时wait_for取消future，release()会跳过它
+                await asyncio.wait_for(future, deadline.timeout())
+            except asyncio.TimeoutError:
+                self.queued -= 1
+                self.stats["expired"] += 1
+                logger.warning(f"⏰ 任务排队超时（{PRIORITY_NAMES.get(priority, priority)}）")
+                raise DeadlineExceeded("排队")
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # 执行槽已移交但调用方已取消，转交给下一个任务
+                    self.release()
+                else:
+                    self.queued -= 1
+                raise
+
+        self.stats["admitted"] += 1
+        waited = (time.perf_counter() - start) * 1000
+        self.wait_times[PRIORITY_NAMES.get(priority, "chat")].append(waited)
+        turn = current_turn()
+        if turn is not None:
+            turn.queue_ms += waited
+        if waited >= 1:
+            logger.info(f"⏳ 任务排队 {waited:.0f}ms（{PRIORITY_NAMES.get(priority, priority)}）")
+
+    def release(self):
+        """释放执行槽：有排队任务时直接移交给优先级最高的任务"""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.queued -= 1
+                future.set_result(None)
+                return
+        self.running -= 1
+
+    def get_stats(self) -> Dict:
+        """获取调度统计（等待时间为排队到开始执行的耗时）"""
+        wait = {}
+        for name, samples in self.wait_times.items():
+            ordered = sorted(samples)
+            if ordered:
+                wait[name] = {
+                    "count": len(ordered),
+                    "p50_ms": round(ordered[len(ordered) // 2], 2),
+                    "p95_ms": round(ordered[int(len(ordered) * 0.95)], 2),
+                    "max_ms": round(ordered[-1], 2)
+                }
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_pending": self.max_pending,
+            **self.stats,
+            "wait": wait
+        }
+
+
+# 全局实例
+agent_scheduler = AgentScheduler(
+    max_concurrency=SystemConfig.AGENT_MAX_CONCURRENCY,
+    max_pending=SystemConfig.MAX_CONCURRENT_REQUESTS
+)
@@ -0,0 +1,174 @@
+"""
+Tool Calling Agent - 基于原生工具调用的Agent循环
+
+一次LLM回复可以请求多个工具（如"打开微信并把音量调到30"），
+同一回复中的工具调用互不依赖，使用asyncio.gather并发执行，结果按调用顺序返回给LLM，
+相比每轮只能调用一个函数的Functions Agent减少整轮LLM往返；
+关闭LLM总结时，一轮请求的工具全部执行完即停止，用模板生成回复（省去总结结果的一次LLM往返）
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
+from app.utils.logger import logger
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded
+from app.tools.base_tool import tool_registry
+from app.services.ai.llm_client import llm_client
+from app.services.ai.prompt_bundle import prompt_bundle_cache
+from app.services.ai.reply_synthesizer import reply_synthesizer
+
+
+class ToolCallingAgent:
+    """原生Tool Calling Agent"""
+
+    def __init__(self, system_prompt: Optional[str] = None, max_iterations: int = 5,
+                 summarize: bool = True):
+        """
+        Args:
+            system_prompt: 系统提示词（为空时使用由工具注册表生成的提示词）
+            max_iterations: 最多LLM轮数
+            summarize: 工具执行后是否由LLM总结结果（否则用模板生成回复）
+        """
+        self.system_prompt = system_prompt
+        self.max_iterations = max_iterations
+        self.summarize = summarize
+
+    async def astream(self, user_input: str,
+                      chat_history: Optional[List[Dict]] = None,
+                      tool_names: Optional[List[str]] = None) -> AsyncIterator[Dict]:
+        """
+        流式执行，事件格式与AgentService.execute_stream相同
+
+        Args:
+            user_input: 用户输入
+            chat_history: 对话历史
+            tool_names: 发送给LLM的工具（为空时发送全部工具）
+
+        Yields:
+            token / tool_start / tool_end / final 事件
+            （final的complete表示正常结束：LLM不再请求工具，或关闭总结时一轮工具已执行完；
+            未达到最大轮数或截止时间）
+        """
+        # 系统提示词和工具定义放在最前面，每次请求逐字节相同，便于服务端前缀缓存
+        bundle = prompt_bundle_cache.get()
+        messages: List[Dict[str, Any]] = [{"role": "system", "content": self.system_prompt or bundle.system_prompt}]
+        messages.extend(chat_history or [])
+        messages.append({"role": "user", "content": user_input})
+
+        tools = bundle.select_tools(tool_names)
+        steps: List[Dict] = []
+        output = ""
+
+        timed_out = complete = False
+        for _ in range(self.max_iterations):
+            # 截止时间已到时不再开始新一轮，返回已完成的部分结果
+            if deadline.expired():
+                timed_out = True
+                break
+            reply: Dict = {}
+            try:
+                async for event in llm_client.chat_with_tools_stream(messages, tools):
+                    if event["type"] == "token":
+                        yield event
+                    else:
+                        reply = event
+            except DeadlineExceeded:
+                timed_out = True
+                break
+
+            output = reply.get("content", "")
+            calls = reply.get("tool_calls", [])
+            if not calls:
+                complete = True
+                break
+
+            messages.append({
+                "role": "assistant",
+                "content": output or None,
+                "tool_calls": [
+                    {
+                        "id": call["id"],
+                        "type": "function",
+                        "function": {"name": call["name"], "arguments": call["arguments"]}
+                    }
+                    for call in calls
+                ]
+            })
+
+            first_index = len(steps)
+            arguments = [self._parse_arguments(call["arguments"]) for call in calls]
+            for offset, (call, tool_input) in enumerate(zip(calls, arguments)):
+                steps.append({"tool": call["name"], "tool_input": tool_input, "result": None})
+                yield {
+                    "type": "tool_start",
+                    "step_index": first_index + offset,
+                    "tool": call["name"],
+                    "tool_input": tool_input
+                }
+
+            # 同一回复中的工具调用并发执行，gather保证结果顺序与调用顺序一致
+            results = await asyncio.gather(*[
+                run_tool(call["name"], tool_input)
+                for call, tool_input in zip(calls, arguments)
+            ])
+
+            for offset, (call, result) in enumerate(zip(calls, results)):
+                steps[first_index + offset]["result"] = result
+                yield {
+                    "type": "tool_end",
+                    "step_index": first_index + offset,
+                    "tool": call["name"],
+                    "result": result
+                }
+                messages.append({"role": "tool", "tool_call_id": call["id"], "content": result})
+
+            if not self.summarize:
+                # 本轮请求的工具已全部执行完，不再让LLM总结
+                output = reply_synthesizer.compose(steps)
+                complete = True
+                break
+        else:
+            logger.warning(f"⚠️ Agent达到最大轮数({self.max_iterations})，停止执行")
+            output = output or "步骤较多，已执行部分操作"
+
+        if timed_out:
+            logger.warning(f"⏰ Agent执行超时，已执行 {len(steps)} 步")
+            output = reply_synthesizer.partial(steps)
+        else:
+            logger.info(f"✅ Agent执行完成: {len(steps)} 步")
+
+        yield {
+            "type": "final",
+            "output": output,
+            "intermediate_steps": steps,
+            "success": not timed_out,
+            "complete": complete
+        }
+
+    @staticmethod
+    def _parse_arguments(arguments: str) -> Optional[Dict]:
+        """解析工具参数JSON，格式错误时返回None"""
+        try:
+            parsed = json.loads(arguments or "{}")
+            return parsed if isinstance(parsed, dict) else None
+        except json.JSONDecodeError:
+            return None
+
+
+async def run_tool(name: str, tool_input: Optional[Dict]) -> str:
+    """
+    执行单个工具
+
+    Returns:
+        步骤结果文本（"成功: ..." / "失败: ..."），同时作为返回给LLM的工具结果
+    """
+    tool = tool_registry.get_tool(name)
+    if tool is None:
+        return f"失败: 未知工具 {name}"
+    if tool_input is None:
+        return "失败: 参数格式错误"
+
+    result = await tool.safe_execute(**tool_input)
+    if result.success:
+        return f"成功: {result.message}"
+    return f"失败: {result.error or result.message}"
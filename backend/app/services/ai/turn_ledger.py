@@ -0,0 +1,104 @@
+"""
+对话统计台账 - 持久化每轮对话的token与耗时，按小时、模型、工具、路由汇总
+
+用于定位消耗token和时间最多的指令，验证快速路径、缓存等优化的效果
+"""
+import json
+from typing import Dict, List
+import aiosqlite
+from app.database.sqlite_db import db
+from app.utils.turn_metrics import TurnMetrics
+
+# 汇总维度 -> 分组表达式
+GROUP_COLUMNS = {
+    "hour": "strftime('%Y-%m-%d %H:00', created_at)",
+    "model": "model",
+    "route": "route"
+}
+
+INSERT_SQL = """INSERT INTO turn_metrics (
+        turn_id, session_id, route, model, llm_calls, llm_call_ms,
+        prompt_tokens, completion_tokens, cached_tokens,
+        llm_ms, tool_ms, queue_ms, total_ms, tools
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+class TurnLedger:
+    """对话统计的写入与查询"""
+
+    @staticmethod
+    async def save(conn: aiosqlite.Connection, metrics: TurnMetrics):
+        """在调用方的事务中写入一轮统计（与对话消息一起提交）"""
+        data = metrics.to_dict()
+        await conn.execute(INSERT_SQL, (
+            data["turn_id"], data["session_id"], data["route"], data["model"],
+            data["llm_calls"], json.dumps(data["llm_call_ms"]),
+            data["prompt_tokens"], data["completion_tokens"], data["cached_tokens"],
+            data["llm_ms"], data["tool_ms"], data["queue_ms"], data["total_ms"],
+            json.dumps(data["tools"], ensure_ascii=False)
+        ))
+
+    async def recent(self, session_id: str = None, limit: int = 50) -> List[Dict]:
+        """最近的对话统计（可按会话过滤）"""
+        where, params = ("WHERE session_id = ?", (session_id,)) if session_id else ("", ())
+        rows = await db.fetchall(
+            f"SELECT * FROM turn_metrics {where} ORDER BY rowid DESC LIMIT ?",
+            params + (limit,)
+        )
+        turns = []
+        for row in rows:
+            turn = dict(row)
+            turn["llm_call_ms"] = json.loads(turn["llm_call_ms"] or "[]")
+            turn["tools"] = json.loads(turn["tools"] or "{}")
+            turns.append(turn)
+        return turns
+
+    async def aggregate(self, group_by: str, hours: int = 24) -> List[Dict]:
+        """
+        汇总最近若干小时的统计
+
+        Args:
+            group_by: hour / model / route / tool
+            hours: 统计的时间范围（小时）
+
+        Returns:
+            每组的轮数、LLM调用数、token数和平均耗时；tool维度为工具的调用轮数和耗时
+        """
+        since = f"-{int(hours)} hours"
+        if group_by == "tool":
+            rows = await db.fetchall(
+                """SELECT tool.key AS tool, COUNT(*) AS turns,
+                          ROUND(SUM(tool.value), 1) AS total_ms,
+                          ROUND(AVG(tool.value), 1) AS avg_ms,
+                          ROUND(MAX(tool.value), 1) AS max_ms
+                   FROM turn_metrics, json_each(turn_metrics.tools) AS tool
+                   WHERE created_at >= datetime('now', ?)
+                   GROUP BY tool.key ORDER BY total_ms DESC""",
+                (since,)
+            )
+            return [dict(row) for row in rows]
+
+        column = GROUP_COLUMNS.get(group_by)
+        if column is None:
+            raise ValueError(f"不支持的汇总维度: {group_by}")
+
+        rows = await db.fetchall(
+            f"""SELECT {column} AS {group_by}, COUNT(*) AS turns,
+                       SUM(llm_calls) AS llm_calls,
+                       SUM(prompt_tokens) AS prompt_tokens,
+                       SUM(completion_tokens) AS completion_tokens,
+                       SUM(cached_tokens) AS cached_tokens,
+                       ROUND(AVG(llm_ms), 1) AS avg_llm_ms,
+                       ROUND(AVG(tool_ms), 1) AS avg_tool_ms,
+                       ROUND(AVG(queue_ms), 1) AS avg_queue_ms,
+                       ROUND(AVG(total_ms), 1) AS avg_total_ms
+                FROM turn_metrics
+                WHERE created_at >= datetime('now', ?)
+                GROUP BY {column} ORDER BY {column}""",
+            (since,)
+        )
+        return [dict(row) for row in rows]
+
+
+# 全局实例
+turn_ledger = TurnLedger()
@@ -0,0 +1,3 @@
+"""
+实时通信服务模块
+"""
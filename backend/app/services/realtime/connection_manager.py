@@ -0,0 +1,364 @@
+"""
+WebSocket连接管理器 - 连接注册表、服务端心跳、空闲回收、连接数上限、断线续传、多设备扇出
+"""
+import asyncio
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Optional
+from fastapi import WebSocket
+from app.utils.logger import logger
+from app.utils.constants import SystemConfig
+from app.services.realtime.envelope import WireFormat, FLUSH_IMMEDIATELY, negotiate
+from app.services.realtime.session_hub import SessionHub
+
+
+class Connection:
+    """单个WebSocket连接的状态"""
+
+    def __init__(self, websocket: WebSocket, session_id: str, max_pending_turns: int):
+        self.id = uuid.uuid4().hex
+        self.websocket: Optional[WebSocket] = websocket  # 断线后为None，重连时替换为新socket
+        self.session_id = session_id
+        self.connected_at = time.monotonic()
+        self.last_active = self.connected_at  # 最近一次收到客户端消息的时间
+        self.message_queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending_turns)  # 待执行对话（有界）
+        self.running_turn: Optional[asyncio.Task] = None  # 正在执行的对话
+        self.worker: Optional[asyncio.Task] = None  # 对话执行器
+        self.audio_queue: Optional[asyncio.Queue] = None  # 流式音频块（None表示结束）
+        self.audio_task: Optional[asyncio.Task] = None  # 流式识别任务
+        self.audio_dropped = 0  # 本次缓冲溢出中已丢弃的音频块数
+        self.replay_buffer: deque = deque(maxlen=SystemConfig.WS_REPLAY_BUFFER_SIZE)  # 断线期间未送达的消息
+        self.wire = WireFormat()  # 消息编码方式（握手时协商）
+        self.outbox: List[Dict] = []  # 批量窗口内待发送的消息
+        self.flush_task: Optional[asyncio.Task] = None
+        self.expire_handle: Optional[asyncio.TimerHandle] = None  # 断线宽限期计时
+        self.subscribed_session: Optional[str] = None  # 当前订阅的会话（接收该会话的对话事件）
+
+    def has_pending_work(self) -> bool:
+        """是否有执行中或排队中的对话"""
+        running = self.running_turn is not None and not self.running_turn.done()
+        return running or not self.message_queue.empty()
+
+    def touch(self):
+        """标记连接活跃"""
+        self.last_active = time.monotonic()
+
+    def idle_seconds(self) -> float:
+        """空闲时长（秒）"""
+        return time.monotonic() - self.last_active
+
+
+class ConnectionManager:
+    """WebSocket连接管理器 - 性能优化版"""
+
+    def __init__(self):
+        self.connections: Dict[str, Connection] = {}  # 连接注册表，按连接ID索引
+        self.heartbeat_interval = SystemConfig.WS_HEARTBEAT_INTERVAL  # 心跳间隔（秒）
+        self.idle_timeout = SystemConfig.WS_TIMEOUT  # 空闲超时（秒）
+        self.max_connections = SystemConfig.WS_MAX_CONNECTIONS
+        self.max_pending_turns = SystemConfig.WS_MAX_PENDING_TURNS
+        self.send_timeout = 10  # 单次发送超时（秒），超时视为死连接
+        self.batch_window = SystemConfig.WS_BATCH_WINDOW_MS / 1000  # 批量打包窗口（秒）
+        self.max_batch_size = SystemConfig.WS_MAX_BATCH_SIZE
+        self.resume_grace = SystemConfig.WS_RESUME_GRACE  # 断线宽限期（秒）
+        self.detached: Dict[str, Connection] = {}  # 断线但仍在执行的连接，按会话ID索引
+        self.hub = SessionHub(self.send_message)  # 同一会话的多个连接共享对话事件
+        self.stats = {
+            "rejected": 0, "reaped_idle": 0, "reaped_dead": 0,
+            "resumed": 0, "replayed": 0, "expired": 0
+        }
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    async def connect(self, websocket: WebSocket,
+                      session_id: Optional[str] = None) -> Optional[Connection]:
+        """
+        接入新连接
+        
+        Args:
+            websocket: WebSocket对象
+            session_id: 客户端要恢复的会话ID（可选）
+
+        Returns:
+            Connection对象（会话在宽限期内断线时返回原连接，继续其未完成的对话）；
+            超过连接数上限时拒绝握手并返回None
+        """
+        if len(self.connections) >= self.max_connections:
+            self.stats["rejected"] += 1
+            logger.warning(f"⚠️ WebSocket连接数已达上限({self.max_connections})，拒绝新连接")
+            await websocket.close(code=1013)  # Try Again Later
+            return None
+
+        wire, subprotocol = negotiate(websocket)
+        await websocket.accept(subprotocol=subprotocol)
+        conn = Connection(websocket, session_id or str(uuid.uuid4()), self.max_pending_turns)
+        conn.wire = wire
+        self.connections[conn.id] = conn
+        if session_id:
+            conn = self.resume(conn, session_id)
+        else:
+            self.hub.subscribe(conn)
+        logger.info(f"✅ WebSocket已连接，当前连接数: {len(self.connections)}")
+        return conn
+
+    def resume(self, conn: Connection, session_id: str) -> Connection:
+        """
+        将连接绑定到指定会话
+        
+        若该会话的上一个连接仍在宽限期内，由新socket接管原连接
+        （包括其执行器、排队的对话和未送达的消息），并返回原连接；
+        新的对话事件暂停发送，直到replay补发完暂存的消息，保证先后顺序
+
+        Returns:
+            后续应使用的Connection对象
+        """
+        detached = self.detached.get(session_id)
+        if detached is None or conn.has_pending_work():
+            conn.session_id = session_id
+            self.hub.subscribe(conn)
+            return conn
+
+        # 新连接尚未执行任何对话，直接丢弃，由原连接接管socket
+        del self.detached[session_id]
+        self.connections.pop(conn.id, None)
+        self._dispose(conn)
+
+        if detached.expire_handle:
+            detached.expire_handle.cancel()
+            detached.expire_handle = None
+        self.hub.hold(detached)
+        detached.websocket = conn.websocket
+        detached.wire = conn.wire
+        detached.touch()
+        self.connections[detached.id] = detached
+        self.stats["resumed"] += 1
+        logger.info(f"🔁 会话已恢复: {session_id}，待补发消息 {len(detached.replay_buffer)} 条")
+        return detached
+
+    async def replay(self, conn: Connection):
+        """补发断线期间未送达的消息，之后恢复发送新的对话事件"""
+        try:
+            while conn.replay_buffer and conn.websocket is not None:
+                message = conn.replay_buffer.popleft()
+                await self.send_message(message, conn)
+                self.stats["replayed"] += 1
+        finally:
+            self.hub.release(conn)
+
+    def disconnect(self, conn_id: str, websocket: Optional[WebSocket] = None):
+        """
+        注销连接（可重复调用）
+        
+        仍有对话在执行时进入宽限期：保持会话订阅，继续执行并暂存结果，
+        客户端在宽限期内带会话ID重连即可收到；否则立即取消后台任务
+
+        Args:
+            conn_id: 连接ID
+            websocket: 断开的socket（连接已被新socket接管时不注销）
+        """
+        conn = self.connections.get(conn_id)
+        if not conn or (websocket is not None and conn.websocket is not websocket):
+            return
+        del self.connections[conn_id]
+
+        conn.websocket = None
+        if conn.has_pending_work():
+            previous = self.detached.pop(conn.session_id, None)
+            if previous is not None:
+                self._expire(previous)
+            self.detached[conn.session_id] = conn
+            conn.expire_handle = asyncio.get_running_loop().call_later(
+                self.resume_grace, self._expire, conn
+            )
+            logger.info(f"⏳ WebSocket已断开，会话 {conn.session_id} 进入 {self.resume_grace}s 宽限期")
+        else:
+            self._dispose(conn)
+
+        logger.info(f"👋 WebSocket已断开，当前连接数: {len(self.connections)}")
+
+    def _expire(self, conn: Connection):
+        """宽限期结束仍未重连：取消未完成的对话并丢弃暂存消息"""
+        if self.detached.get(conn.session_id) is conn:
+            del self.detached[conn.session_id]
+        self.stats["expired"] += 1
+        logger.info(f"⌛ 会话宽限期结束: {conn.session_id}，丢弃 {len(conn.replay_buffer)} 条消息")
+        self._dispose(conn)
+
+    def _dispose(self, conn: Connection):
+        """退订会话并取消连接的所有后台任务"""
+        self.hub.unsubscribe(conn)
+        if conn.expire_handle:
+            conn.expire_handle.cancel()
+            conn.expire_handle = None
+        for task in (conn.running_turn, conn.worker, conn.audio_task, conn.flush_task):
+            if task and not task.done():
+                task.cancel()
+        conn.replay_buffer.clear()
+        conn.outbox.clear()
+
+    def publish(self, session_id: str, message: dict) -> int:
+        """
+        向会话的所有连接发布对话事件（多设备扇出）
+
+        每个连接独立排队发送，发布方不等待任何socket
+
+        Returns:
+            接收该事件的连接数
+        """
+        return self.hub.publish(session_id, message)
+
+    async def send_message(self, message: dict, conn: Connection):
+        """
+        发送消息
+        
+        v1协议下消息先进入批量窗口，与随后的事件合并为一帧发送；
+        socket已断开或发送失败时暂存，重连后补发
+        """
+        if conn.websocket is None:
+            conn.replay_buffer.append(message)
+            return
+
+        if not conn.wire.batching:
+            await self._send_frame(conn, [message])
+            return
+
+        conn.outbox.append(message)
+        if message["type"] in FLUSH_IMMEDIATELY or len(conn.outbox) >= self.max_batch_size:
+            await self.flush(conn)
+        elif conn.flush_task is None:
+            conn.flush_task = asyncio.create_task(self._flush_later(conn))
+
+    async def flush(self, conn: Connection):
+        """立即发送批量窗口内的消息"""
+        if conn.flush_task is not None and conn.flush_task is not asyncio.current_task():
+            conn.flush_task.cancel()
+        conn.flush_task = None
+
+        messages, conn.outbox = conn.outbox, []
+        if messages:
+            await self._send_frame(conn, messages)
+
+    async def _flush_later(self, conn: Connection):
+        """批量窗口结束后发送"""
+        await asyncio.sleep(self.batch_window)
+        await self.flush(conn)
+
+    async def _send_frame(self, conn: Connection, messages: List[Dict]):
+        """编码并发送一帧"""
+        websocket = conn.websocket
+        if websocket is None:
+            conn.replay_buffer.extend(messages)
+            return
+        try:
+            frame = conn.wire.encode(messages)
+            if isinstance(frame, bytes):
+                await websocket.send_bytes(frame)
+            else:
+                await websocket.send_text(frame)
+        except Exception as e:
+            logger.warning(f"⚠️ 消息发送失败，暂存待补发: {type(e).__name__}")
+            conn.replay_buffer.extend(messages)
+
+    def enqueue_turn(self, conn: Connection, user_message: str,
+                     idempotency_key: Optional[str] = None) -> bool:
+        """
+        将对话加入连接的待执行队列
+
+        Returns:
+            队列已满时返回False
+        """
+        try:
+            conn.message_queue.put_nowait((user_message, idempotency_key))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def cancel_turn(self, conn: Connection) -> Dict[str, int]:
+        """
+        取消正在执行的对话，并丢弃排队中的对话
+
+        Returns:
+            {"cancelled": 取消的执行中对话数, "dropped": 丢弃的排队对话数}
+        """
+        cancelled = 0
+        if conn.running_turn and not conn.running_turn.done():
+            conn.running_turn.cancel()
+            cancelled = 1
+
+        dropped = 0
+        while not conn.message_queue.empty():
+            conn.message_queue.get_nowait()
+            dropped += 1
+
+        return {"cancelled": cancelled, "dropped": dropped}
+
+    def start_heartbeat(self):
+        """启动后台心跳任务"""
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+            logger.info(f"💓 WebSocket心跳已启动，间隔 {self.heartbeat_interval}s")
+
+    async def stop_heartbeat(self):
+        """停止后台心跳任务"""
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+
+    async def _heartbeat_loop(self):
+        """定期向所有连接发送心跳，回收空闲或已失效的连接"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.check_connections()
+            except Exception as e:
+                logger.error(f"心跳检查失败: {e}")
+
+    async def check_connections(self):
+        """并发检查所有连接，慢连接不会拖慢其他连接"""
+        connections = list(self.connections.values())
+        if connections:
+            await asyncio.gather(*[self._check(conn) for conn in connections])
+
+    async def _check(self, conn: Connection):
+        """检查单个连接"""
+        if conn.idle_seconds() > self.idle_timeout:
+            self.stats["reaped_idle"] += 1
+            logger.info(f"🧹 回收空闲连接: {conn.id} (空闲 {conn.idle_seconds():.0f}s)")
+            await self._reap(conn, code=1001)
+            return
+
+        try:
+            frame = conn.wire.encode([{"type": "heartbeat", "timestamp": int(time.time() * 1000)}])
+            send = conn.websocket.send_bytes if isinstance(frame, bytes) else conn.websocket.send_text
+            await asyncio.wait_for(send(frame), timeout=self.send_timeout)
+        except Exception as e:
+            self.stats["reaped_dead"] += 1
+            logger.info(f"🧹 回收失效连接: {conn.id} ({type(e).__name__})")
+            await self._reap(conn, code=1011)
+
+    async def _reap(self, conn: Connection, code: int):
+        """回收连接：先注销，再尽力关闭底层socket"""
+        websocket = conn.websocket
+        self.disconnect(conn.id, websocket)
+        try:
+            await asyncio.wait_for(websocket.close(code=code), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+    def get_stats(self) -> Dict:
+        """获取连接统计"""
+        return {
+            "connections": len(self.connections),
+            "max_connections": self.max_connections,
+            "detached_sessions": len(self.detached),
+            **self.stats,
+            "fanout": self.hub.get_stats()
+        }
+
+
+# 全局实例
+connection_manager = ConnectionManager()
@@ -0,0 +1,100 @@
+"""
+WebSocket消息信封 - 协议版本协商、批量打包、MessagePack编码
+
+协议版本：
+- legacy: 每条消息一个JSON文本帧（默认，兼容旧客户端）
+- v1: 多条事件合并为一帧 {"v": 1, "e": [{"t": 类型, "d": 数据, "ts": 时间戳}]}，
+  chat_response 不再重复携带已通过 step_update 推送的步骤结果
+
+客户端在握手时通过子协议（voicepc.v1.json / voicepc.v1.msgpack）
+或查询参数（?proto=v1&codec=msgpack）选择协议；客户端发往服务端的指令始终为JSON文本帧
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple, Union
+from fastapi import WebSocket
+from app.utils.logger import logger
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖，未安装时只支持JSON
+    msgpack = None
+
+
+PROTOCOL_VERSION = 1
+
+SUBPROTOCOLS = {
+    "voicepc.v1.msgpack": "msgpack",
+    "voicepc.v1.json": "json",
+}
+
+# 这些消息需要立即送达，不等待批量窗口
+FLUSH_IMMEDIATELY = {"chat_response", "pong", "cancelled", "error", "session", "audio_end"}
+
+
+class WireFormat:
+    """连接的消息编码方式"""
+
+    def __init__(self, version: str = "legacy", codec: str = "json"):
+        self.version = version
+        self.codec = codec
+
+    @property
+    def batching(self) -> bool:
+        """是否启用批量打包"""
+        return self.version == "v1"
+
+    def encode(self, messages: List[Dict]) -> Union[str, bytes]:
+        """
+        将消息编码为一帧
+
+        Returns:
+            文本帧（str）或二进制帧（bytes）
+        """
+        if not self.batching:
+            return json.dumps(messages[0], ensure_ascii=False)
+
+        frame = {"v": PROTOCOL_VERSION, "e": [self._compact(m) for m in messages]}
+        if self.codec == "msgpack":
+            return msgpack.packb(frame, use_bin_type=True)
+        return json.dumps(frame, ensure_ascii=False, separators=(",", ":"))
+
+    @staticmethod
+    def _compact(message: Dict) -> Dict[str, Any]:
+        """转换为紧凑事件格式"""
+        event: Dict[str, Any] = {"t": message["type"]}
+        data = message.get("data")
+
+        # 步骤结果已通过step_update推送，最终回复只保留步骤数
+        if message["type"] == "chat_response" and data and "steps" in data:
+            data = {k: v for k, v in data.items() if k != "steps"}
+            data["step_count"] = len(message["data"]["steps"])
+
+        if data is not None:
+            event["d"] = data
+        if "timestamp" in message:
+            event["ts"] = message["timestamp"]
+        return event
+
+
+def negotiate(websocket: WebSocket) -> Tuple[WireFormat, Optional[str]]:
+    """
+    根据握手信息选择编码方式
+
+    Returns:
+        (WireFormat, 需要在accept时回应的子协议)
+    """
+    for subprotocol in websocket.scope.get("subprotocols", []):
+        codec = SUBPROTOCOLS.get(subprotocol)
+        if codec == "msgpack" and msgpack is None:
+            continue
+        if codec:
+            return WireFormat("v1", codec), subprotocol
+
+    if websocket.query_params.get("proto") == "v1":
+        codec = websocket.query_params.get("codec", "json")
+        if codec == "msgpack" and msgpack is None:
+            logger.warning("⚠️ 未安装msgpack，使用JSON编码")
+            codec = "json"
+        return WireFormat("v1", codec if codec in ("json", "msgpack") else "json"), None
+
+    return WireFormat(), None
@@ -0,0 +1,157 @@
+"""
+会话订阅中心 - 同一会话的多个设备（桌面端、手机遥控端）共享对话事件
+
+每个订阅者拥有独立的有界发送队列和发送任务：
+发布只做入队，不等待任何socket，慢订阅者不会拖慢其他订阅者；
+队列满时优先丢弃可丢失的事件（token增量，最终回复包含完整文本），否则淘汰最旧事件
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+from app.utils.logger import logger
+from app.utils.constants import SystemConfig
+
+# 队列满时可直接丢弃的事件
+LOSSY_EVENTS = {"token", "heartbeat"}
+
+SendFunc = Callable[[dict, Any], Awaitable[None]]
+
+
+class Subscriber:
+    """单个订阅者（连接）的发送队列"""
+
+    def __init__(self, conn: Any, max_queue: int):
+        self.conn = conn
+        self.queue: Deque[Tuple[float, dict]] = deque()  # (入队时间, 消息)
+        self.max_queue = max_queue
+        self.wakeup = asyncio.Event()
+        self.sender: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.held = False  # 暂停发送（事件继续入队）
+
+
+class SessionHub:
+    """按会话ID索引的发布/订阅中心"""
+
+    def __init__(self, send: SendFunc):
+        """
+        Args:
+            send: 向单个连接发送消息的协程函数 send(message, conn)
+        """
+        self._send = send
+        self.sessions: Dict[str, Dict[str, Subscriber]] = {}  # 会话ID -> {连接ID: 订阅者}
+        self.max_queue = SystemConfig.WS_SUBSCRIBER_QUEUE_SIZE
+        self.latencies: Deque[float] = deque(maxlen=1000)  # 最近的扇出延迟（毫秒）
+        self.stats = {"published": 0, "delivered": 0, "dropped": 0}
+
+    def subscribe(self, conn: Any):
+        """订阅连接所在会话（连接切换会话时自动退订旧会话）"""
+        self.unsubscribe(conn)
+        subscriber = Subscriber(conn, self.max_queue)
+        subscriber.sender = asyncio.create_task(self._sender_loop(subscriber))
+        self.sessions.setdefault(conn.session_id, {})[conn.id] = subscriber
+        conn.subscribed_session = conn.session_id
+
+    def unsubscribe(self, conn: Any):
+        """退订并停止发送任务，未发送的事件随之丢弃"""
+        session_id = conn.subscribed_session
+        if session_id is None:
+            return
+        conn.subscribed_session = None
+
+        subscribers = self.sessions.get(session_id, {})
+        subscriber = subscribers.pop(conn.id, None)
+        if not subscribers:
+            self.sessions.pop(session_id, None)
+        if subscriber and subscriber.sender and not subscriber.sender.done():
+            subscriber.sender.cancel()
+
+    def hold(self, conn: Any):
+        """暂停向连接发送事件（事件继续入队，如重连后先补发暂存消息）"""
+        subscriber = self._subscriber(conn)
+        if subscriber:
+            subscriber.held = True
+
+    def release(self, conn: Any):
+        """恢复向连接发送事件"""
+        subscriber = self._subscriber(conn)
+        if subscriber and subscriber.held:
+            subscriber.held = False
+            subscriber.wakeup.set()
+
+    def _subscriber(self, conn: Any) -> Optional[Subscriber]:
+        """连接的订阅者"""
+        return self.sessions.get(conn.subscribed_session, {}).get(conn.id)
+
+    def publish(self, session_id: str, message: dict) -> int:
+        """
+        向会话的所有订阅者发布消息（只入队，立即返回）
+
+        Returns:
+            接收该消息的订阅者数
+        """
+        subscribers = self.sessions.get(session_id)
+        if not subscribers:
+            return 0
+
+        self.stats["published"] += 1
+        now = time.perf_counter()
+        for subscriber in subscribers.values():
+            if len(subscriber.queue) >= subscriber.max_queue:
+                self._drop(subscriber, message)
+                if message["type"] in LOSSY_EVENTS:
+                    continue
+            subscriber.queue.append((now, message))
+            subscriber.wakeup.set()
+        return len(subscribers)
+
+    def _drop(self, subscriber: Subscriber, message: dict):
+        """队列已满：丢弃新的可丢失事件，否则淘汰最旧事件"""
+        if message["type"] not in LOSSY_EVENTS:
+            subscriber.queue.popleft()
+        subscriber.dropped += 1
+        self.stats["dropped"] += 1
+        if subscriber.dropped == 1 or subscriber.dropped % 100 == 0:
+            logger.warning(f"⚠️ 订阅者发送过慢，已丢弃 {subscriber.dropped} 条事件: {subscriber.conn.id}")
+
+    async def _sender_loop(self, subscriber: Subscriber):
+        """按顺序把队列中的事件发送给订阅者"""
+        while True:
+            if not subscriber.queue or subscriber.held:
+                subscriber.wakeup.clear()
+                await subscriber.wakeup.wait()
+                continue
+
+            published_at, message = subscriber.queue.popleft()
+            try:
+                await self._send(message, subscriber.conn)
+            except Exception as e:
+                logger.warning(f"⚠️ 事件发送失败: {type(e).__name__}")
+                continue
+            self.stats["delivered"] += 1
+            self.latencies.append((time.perf_counter() - published_at) * 1000)
+
+    def subscriber_count(self, session_id: str) -> int:
+        """会话的订阅者数"""
+        return len(self.sessions.get(session_id, {}))
+
+    def get_stats(self) -> Dict:
+        """获取扇出统计（延迟为发布到写入socket的耗时）"""
+        latencies = sorted(self.latencies)
+        if latencies:
+            latency = {
+                "p50_ms": round(latencies[len(latencies) // 2], 2),
+                "p95_ms": round(latencies[int(len(latencies) * 0.95)], 2),
+                "max_ms": round(latencies[-1], 2),
+            }
+        else:
+            latency = {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+
+        return {
+            "sessions": len(self.sessions),
+            "subscribers": sum(len(s) for s in self.sessions.values()),
+            "queued": sum(len(sub.queue) for s in self.sessions.values() for sub in s.values()),
+            **self.stats,
+            "latency": latency
+        }
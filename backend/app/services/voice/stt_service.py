@@ -2,16 +2,23 @@
 语音识别服务 (STT) - 支持多种后端
 """
 import asyncio
-from typing import Optional
+import math
+from array import array
+from typing import Optional, AsyncIterator
 from app.config import settings
 from app.utils.logger import logger
+from app.utils.constants import SystemConfig
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded
+from app.services.voice.audio_processor import audio_processor
 
 
 class STTResult:
     """语音识别结果"""
-    def __init__(self, text: str, confidence: float = 0.0):
+    def __init__(self, text: str, confidence: float = 0.0, is_final: bool = True):
         self.text = text
         self.confidence = confidence
+        self.is_final = is_final  # 流式识别中False表示中间结果
         self.success = len(text) > 0
 
 
@@ -21,6 +28,12 @@ class STTService:
     def __init__(self):
         self.provider = "mock"  # 默认使用模拟模式，实际需要配置API
         self.language = "zh-CN"
+        
+        # 流式识别参数（16bit单声道PCM）
+        self.vad_threshold = 500  # 语音能量阈值（RMS）
+        self.endpoint_silence = 0.6  # 说话后静音超过该时长（秒）判定为一句话结束
+        self.partial_interval = 0.8  # 每新增多少秒语音输出一次中间结果
+        self.max_utterance_bytes = SystemConfig.MAX_BUFFER_SIZE  # 单句最大缓冲，超出强制断句
     
     async def recognize(self, audio_data: bytes, audio_format: str = "wav") -> Optional[STTResult]:
         """
@@ -36,7 +49,9 @@ class STTService:
         try:
             # 检查是否配置了阿里云
             if settings.ALI_APPKEY:
-                result = await self._recognize_aliyun(audio_data, audio_format)
+                result = await deadline.wait(
+                    self._recognize_aliyun(audio_data, audio_format), "STT", cap=SystemConfig.STT_TIMEOUT
+                )
                 if result:
                     return result
             
@@ -44,6 +59,10 @@ class STTService:
             logger.warning("使用模拟STT（开发模式）")
             return await self._recognize_mock(audio_data)
             
+        except DeadlineExceeded:
+            logger.warning("⏰ STT识别超时")
+            return STTResult("", 0.0)
+        
         except Exception as e:
             logger.error(f"STT识别异常: {e}")
             return STTResult("", 0.0)
@@ -79,10 +98,115 @@ class STTService:
         
         return STTResult(text=text, confidence=0.95)
     
-    async def recognize_stream(self, audio_stream):
-        """流式识别（实时）"""
-        # TODO: 实现流式识别
-        pass
+    async def recognize_stream(self, audio_stream: AsyncIterator[bytes],
+                               sample_rate: int = SystemConfig.AUDIO_SAMPLE_RATE
+                               ) -> AsyncIterator[STTResult]:
+        """
+        流式识别（实时）
+        
+        边接收PCM音频块边做端点检测：说话过程中定期输出中间结果，
+        检测到句尾静音（或音频流结束）时立即输出最终结果，无需等待整段上传
+        
+        中间结果在后台任务中识别，不阻塞音频接收；同一时间最多一个中间识别，
+        上一个未完成时跳过，下次总是识别最新的音频，识别量不随句子长度成倍增长
+        
+        Args:
+            audio_stream: 16bit单声道PCM音频块的异步迭代器
+            sample_rate: 采样率
+            
+        Yields:
+            STTResult对象（is_final区分中间结果和最终结果）
+        """
+        bytes_per_second = sample_rate * 2
+        utterance = bytearray()  # 当前句子的音频
+        in_speech = False
+        silence = 0.0  # 说话后累计静音时长（秒）
+        since_partial = 0.0  # 上次中间识别后新增的语音时长（秒）
+        last_partial = ""
+        
+        chunks = audio_stream.__aiter__()
+        next_chunk: Optional[asyncio.Future] = None
+        partial: Optional[asyncio.Task] = None  # 进行中的中间识别
+        try:
+            while True:
+                if next_chunk is None:
+                    next_chunk = asyncio.ensure_future(chunks.__anext__())
+                waiting = {next_chunk} if partial is None else {next_chunk, partial}
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                
+                if partial in done:
+                    result = partial.result()
+                    partial = None
+                    if result.success and result.text != last_partial:
+                        last_partial = result.text
+                        yield result
+                
+                if next_chunk not in done:
+                    continue
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    break
+                next_chunk = None
+                if not chunk:
+                    continue
+                
+                duration = len(chunk) / bytes_per_second
+                is_voice = self._chunk_rms(chunk) >= self.vad_threshold
+                
+                if not in_speech:
+                    if not is_voice:
+                        continue  # 丢弃句首静音
+                    in_speech = True
+                
+                utterance.extend(chunk)
+                silence = 0.0 if is_voice else silence + duration
+                since_partial += duration
+                
+                if silence >= self.endpoint_silence or len(utterance) >= self.max_utterance_bytes:
+                    # 句尾：最终结果取代未完成的中间识别，准备识别下一句
+                    if partial is not None:
+                        partial.cancel()
+                        partial = None
+                    result = await self._recognize_pcm(utterance, sample_rate, is_final=True)
+                    if result.success:
+                        yield result
+                    utterance = bytearray()
+                    in_speech = False
+                    silence = since_partial = 0.0
+                    last_partial = ""
+                
+                elif since_partial >= self.partial_interval and is_voice and partial is None:
+                    since_partial = 0.0
+                    partial = asyncio.create_task(
+                        self._recognize_pcm(bytes(utterance), sample_rate, is_final=False)
+                    )
+        finally:
+            for task in (next_chunk, partial):
+                if task is not None and not task.done():
+                    task.cancel()
+        
+        # 音频流结束：识别尚未断句的剩余音频
+        if in_speech and utterance:
+            result = await self._recognize_pcm(utterance, sample_rate, is_final=True)
+            if result.success:
+                yield result
+    
+    async def _recognize_pcm(self, pcm: bytes, sample_rate: int, is_final: bool) -> STTResult:
+        """识别一段PCM音频"""
+        wav = audio_processor.pcm_to_wav(bytes(pcm), sample_rate=sample_rate)
+        result = await self.recognize(wav, "wav") or STTResult("", 0.0)
+        result.is_final = is_final
+        return result
+    
+    @staticmethod
+    def _chunk_rms(chunk: bytes) -> float:
+        """计算16bit PCM音频块的能量（RMS）"""
+        samples = array("h")
+        samples.frombytes(chunk[:len(chunk) - len(chunk) % 2])
+        if not samples:
+            return 0.0
+        return math.sqrt(sum(s * s for s in samples) / len(samples))
 
 
 # 全局实例
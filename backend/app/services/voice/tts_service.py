@@ -5,6 +5,9 @@ import asyncio
 from typing import Optional
 from app.config import settings
 from app.utils.logger import logger
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded
+from app.utils.constants import SystemConfig
 from app.services.voice.audio_processor import audio_processor
 
 
@@ -29,8 +32,14 @@ class TTSService:
             {"audio": "base64编码的音频", "format": "mp3"}
         """
         try:
-            # 优先尝试Edge-TTS（免费）
-            result = await self._synthesize_edge(text, voice)
+            # 优先尝试Edge-TTS（免费），超时按合成失败处理（客户端只显示文本）
+            try:
+                result = await deadline.wait(
+                    self._synthesize_edge(text, voice), "TTS", cap=SystemConfig.TTS_TIMEOUT
+                )
+            except DeadlineExceeded:
+                logger.warning("⏰ TTS合成超时")
+                result = None
             if result:
                 return result
             
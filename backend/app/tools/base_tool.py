@@ -1,10 +1,17 @@
 """
 工具插件基类
 """
+import hashlib
+import json
+import time
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional
 from pydantic import BaseModel
 from app.utils.logger import logger
+from app.utils.turn_metrics import current_turn
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded
+from app.utils.constants import SystemConfig
 
 
 class ToolResult(BaseModel):
@@ -70,8 +77,18 @@ class BaseTool(ABC):
     
     async def safe_execute(self, **kwargs) -> ToolResult:
         """
-        安全执行（带错误处理）
+        安全执行（带错误处理，耗时计入当前对话轮次）
         """
+        start = time.perf_counter()
+        try:
+            return await self._safe_execute(**kwargs)
+        finally:
+            turn = current_turn()
+            if turn is not None:
+                turn.record_tool(self.name, (time.perf_counter() - start) * 1000)
+    
+    async def _safe_execute(self, **kwargs) -> ToolResult:
+        """参数校验 + 执行 + 异常转换"""
         try:
             # 验证参数
             valid, error = self.validate_params(kwargs)
@@ -84,7 +101,9 @@ class BaseTool(ABC):
             
             # 执行工具
             logger.info(f"🔧 执行工具: {self.name} with params: {kwargs}")
-            result = await self.execute(**kwargs)
+            result = await deadline.wait(
+                self.execute(**kwargs), f"工具{self.name}", cap=SystemConfig.TOOL_TIMEOUT
+            )
             
             if result.success:
                 logger.info(f"✅ 工具执行成功: {self.name} - {result.message}")
@@ -93,6 +112,14 @@ class BaseTool(ABC):
             
             return result
             
+        except DeadlineExceeded as e:
+            logger.warning(f"⏰ 工具执行超时: {self.name}")
+            return ToolResult(
+                success=False,
+                message="工具执行超时",
+                error=str(e)
+            )
+        
         except Exception as e:
             logger.error(f"❌ 工具执行异常: {self.name} - {e}")
             return ToolResult(
@@ -107,10 +134,14 @@ class ToolRegistry:
     
     def __init__(self):
         self.tools: Dict[str, BaseTool] = {}
+        self._compiled_for: Optional[tuple] = None  # 生成缓存时的工具集合（None表示需要重新生成）
+        self._schemas: list = []
+        self._version = ""
     
     def register(self, tool: BaseTool):
         """注册工具"""
         self.tools[tool.name] = tool
+        self.invalidate()
         logger.info(f"📝 注册工具: {tool.name}")
     
     def get_tool(self, name: str) -> Optional[BaseTool]:
@@ -121,9 +152,38 @@ class ToolRegistry:
         """获取所有工具"""
         return self.tools
     
+    def invalidate(self):
+        """丢弃缓存的schema和版本（注册时自动调用；原地修改工具描述或参数后需手动调用）"""
+        self._compiled_for = None
+    
+    def _compile(self):
+        """
+        生成schema列表和版本（按工具名排序，输出稳定），缓存到工具集合变化为止
+        
+        每次调用只比较工具对象，不重新生成schema；直接替换tools字典时同样会重新生成
+        """
+        fingerprint = tuple((name, id(tool)) for name, tool in self.tools.items())
+        if fingerprint == self._compiled_for:
+            return
+        
+        self._schemas = [self.tools[name].get_schema() for name in sorted(self.tools)]
+        payload = json.dumps(self._schemas, sort_keys=True, ensure_ascii=False)
+        self._version = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+        self._compiled_for = fingerprint
+    
     def get_schemas(self) -> list:
-        """获取所有工具的schema（用于LLM）"""
-        return [tool.get_schema() for tool in self.tools.values()]
+        """获取所有工具的schema（用于LLM，按工具名排序；返回共享列表，调用方不要修改）"""
+        self._compile()
+        return self._schemas
+    
+    def version(self) -> str:
+        """
+        工具定义版本：所有工具schema的哈希
+        
+        注册或替换工具（或invalidate后）时改变，依赖工具定义的缓存以此作为版本键
+        """
+        self._compile()
+        return self._version
 
 
 # 全局工具注册表
@@ -60,20 +60,57 @@ class SystemConfig:
     WS_HEARTBEAT_INTERVAL = 30  # 秒
     WS_TIMEOUT = 300  # 5分钟
     WS_MAX_CONNECTIONS = 100
+    WS_MAX_PENDING_TURNS = 5  # 每个连接最多排队的对话数
+    WS_RESUME_GRACE = 60  # 断线后保留会话执行结果的宽限期（秒）
+    WS_REPLAY_BUFFER_SIZE = 200  # 断线期间最多暂存的消息数
+    WS_BATCH_WINDOW_MS = 20  # v1协议批量打包窗口（毫秒）
+    WS_MAX_BATCH_SIZE = 50  # 单帧最多合并的事件数
+    WS_SUBSCRIBER_QUEUE_SIZE = 256  # 多设备扇出时每个订阅者最多排队的事件数
+    
+    # SSE配置
+    SSE_KEEPALIVE_INTERVAL = 15  # 无事件时发送保活注释的间隔（秒），防止代理断开空闲连接
     
     # LLM配置
     LLM_MAX_TOKENS = 2000
     LLM_TEMPERATURE = 0.7
     LLM_TIMEOUT = 30  # 秒
     
+    # 快速路径路由
+    FAST_PATH_MIN_CONFIDENCE = 0.8  # 规则解析置信度不低于该值才跳过Agent
+    FAST_PATH_MAX_LENGTH = 20  # 超过该长度的指令交给Agent
+    
+    # 执行计划缓存
+    PLAN_CACHE_SIZE = 500  # 最多缓存的指令数
+    PLAN_CACHE_TTL = 7 * 24 * 3600  # 计划有效期（秒）
+    
+    # 意图解析缓存（含LLM增强结果）
+    INTENT_CACHE_SIZE = 1000  # 最多缓存的指令数
+    INTENT_CACHE_TTL = 3600  # 解析结果有效期（秒）
+    INTENT_CLASSIFIER_MIN_CONFIDENCE = 0.6  # 本地分类器置信度不低于该值时不再调用LLM
+    INTENT_FEW_SHOT_K = 4  # LLM意图解析提示词中的相近示例数
+    INTENT_LLM_MAX_TOKENS = 120  # LLM意图解析的最大输出token数（只需一行JSON）
+    INTENT_BATCH_MAX_SIZE = 1000  # 批量解析接口单次最多的指令数
+    INTENT_BATCH_LLM_CONCURRENCY = 4  # 批量解析时同时进行的LLM调用数
+    
+    # 工具裁剪（只向LLM发送相关工具的定义）
+    TOOL_PRUNE_TOP_K = 3  # 最多发送的工具数，相关工具更多时发送全部
+    TOOL_PRUNE_MIN_CONFIDENCE = 0.8  # 规则解析置信度低于该值时发送全部工具
+    
     # 上下文配置
     CONTEXT_MAX_HISTORY = 10  # 保留最近10轮对话
     CONTEXT_MAX_AGE = 3600  # 1小时后过期
     
     # 性能配置
-    MAX_CONCURRENT_REQUESTS = 50
-    REQUEST_TIMEOUT = 60  # 秒
+    MAX_CONCURRENT_REQUESTS = 50  # 执行中 + 排队的Agent任务上限，超出时拒绝
+    AGENT_MAX_CONCURRENCY = 4  # 同时执行的Agent任务数（避免突发请求触发LLM限流），其余按优先级排队
+    REQUEST_TIMEOUT = 60  # 一次请求（一轮对话、一次识别/合成）的截止时间（秒）
+    TOOL_TIMEOUT = 20  # 单个工具执行的超时上限（秒）
+    DB_MIN_TIMEOUT = 2  # 截止时间已到时数据库操作仍保留的时间（秒），保证对话落库
+    STT_TIMEOUT = 15  # 单次语音识别的超时上限（秒）
+    TTS_TIMEOUT = 15  # 单次语音合成的超时上限（秒）
     CACHE_TTL = 3600  # 1小时
+    IDEMPOTENCY_TTL = 300  # 带幂等键的对话结果保留时长（秒）
+    IDEMPOTENCY_MAX_KEYS = 1000  # 最多保留的幂等结果数
 
 
 # ==================== 工具类型定义 ====================
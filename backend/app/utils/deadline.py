@@ -0,0 +1,122 @@
+"""
+请求截止时间 - 一次请求的剩余时间通过上下文变量传递给各个阶段
+
+STT、LLM、Agent、工具、数据库、TTS在等待前都按剩余时间设置超时，
+任何一个阶段卡住都不会让整轮对话无限等待；
+asyncio.gather / create_task创建的子任务复制上下文，共享同一截止时间
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)  # time.monotonic()时刻
+
+
+class DeadlineExceeded(TimeoutError):
+    """请求截止时间已到"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"{stage}超时")
+        self.stage = stage
+
+
+def start_deadline(seconds: float) -> float:
+    """
+    为当前请求设置截止时间（已有更早的截止时间时保留更早的）
+
+    Returns:
+        截止时刻（time.monotonic()）
+    """
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None and current < deadline:
+        deadline = current
+    _deadline.set(deadline)
+    return deadline
+
+
+def remaining() -> Optional[float]:
+    """剩余秒数（未设置截止时间时为None）"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def expired() -> bool:
+    """截止时间是否已到"""
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check(stage: str):
+    """截止时间已到时抛出DeadlineExceeded"""
+    if expired():
+        raise DeadlineExceeded(stage)
+
+
+def timeout(cap: Optional[float] = None, floor: float = 0.0) -> Optional[float]:
+    """
+    当前阶段可用的超时秒数
+
+    Args:
+        cap: 阶段自身的超时上限
+        floor: 最少保留的时间（如对话落库，截止后仍需完成）
+
+    Returns:
+        min(剩余时间, cap)，不低于floor；两者都没有时为None（不限时）
+    """
+    limits = [value for value in (remaining(), cap) if value is not None]
+    if not limits:
+        return None
+    return max(min(limits), floor)
+
+
+async def wait(awaitable: Awaitable[T], stage: str,
+               cap: Optional[float] = None, floor: float = 0.0) -> T:
+    """
+    在截止时间内等待
+
+    Raises:
+        DeadlineExceeded: 超时（等待的协程被取消）
+    """
+    limit = timeout(cap, floor)
+    if limit is not None and limit <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded(stage)
+    try:
+        return await asyncio.wait_for(awaitable, limit)
+    except DeadlineExceeded:
+        raise
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(stage)
+
+
+async def iterate(iterator: AsyncIterator[T], stage: str,
+                  cap: Optional[float] = None) -> AsyncIterator[T]:
+    """
+    逐项等待异步迭代器，整个迭代在截止时间内完成（cap为本阶段总时长上限）
+
+    Raises:
+        DeadlineExceeded: 超时（正在等待的下一项被取消）
+    """
+    limit = timeout(cap)
+    end = None if limit is None else time.monotonic() + limit
+    iterator = iterator.__aiter__()
+    while True:
+        left = None if end is None else end - time.monotonic()
+        if left is not None and left <= 0:
+            raise DeadlineExceeded(stage)
+        try:
+            item = await asyncio.wait_for(iterator.__anext__(), left)
+        except StopAsyncIteration:
+            return
+        except DeadlineExceeded:
+            raise
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(stage)
+        yield item
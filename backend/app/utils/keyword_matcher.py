@@ -0,0 +1,106 @@
+"""
+多关键词匹配（Aho–Corasick自动机）
+
+所有关键词编译为一个自动机，一次扫描文本即可找出全部命中，
+耗时只与文本长度和命中数有关，不随关键词数量（应用别名、场景名等）增长
+"""
+from collections import deque
+from typing import Any, Dict, Iterable, List, Tuple
+
+Hit = Tuple[int, int, Any]  # (起始位置, 结束位置, 关键词附带的数据)
+
+
+class KeywordMatcher:
+    """Aho–Corasick多关键词匹配器"""
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]] = ()):
+        """
+        Args:
+            patterns: (关键词, 附带数据)，同一关键词可以出现多次（如属于多个意图）
+        """
+        self._goto: List[Dict[str, int]] = [{}]  # 节点 -> {字符: 子节点}
+        self._fail: List[int] = [0]
+        self._own: List[List[Tuple[int, Any]]] = [[]]  # 节点自身结束的关键词 (长度, 数据)
+        self._output: List[List[Tuple[int, Any]]] = [[]]  # 含失败链上的全部关键词
+        self._built = True
+        self.size = 0
+        for keyword, payload in patterns:
+            self.add(keyword, payload)
+        self.build()
+
+    def add(self, keyword: str, payload: Any = None):
+        """添加关键词（下次匹配前自动重建失败链）"""
+        if not keyword:
+            return
+        node = 0
+        for char in keyword:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append([])
+                self._output.append([])
+                self._goto[node][char] = child
+            node = child
+        self._own[node].append((len(keyword), payload))
+        self.size += 1
+        self._built = False
+
+    def build(self):
+        """按广度优先计算失败链，合并每个节点可输出的关键词"""
+        self._output[0] = list(self._own[0])
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            self._output[node] = self._own[node] + self._output[self._fail[node]]
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                queue.append(child)
+        self._built = True
+
+    def find_all(self, text: str) -> List[Hit]:
+        """一次扫描找出全部命中（按结束位置排序，可能互相重叠）"""
+        if not self._built:
+            self.build()
+
+        hits: List[Hit] = []
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, payload in self._output[node]:
+                hits.append((index + 1 - length, index + 1, payload))
+        return hits
+
+
+def longest_matches(hits: List[Hit]) -> List[Hit]:
+    """
+    去掉被更长命中完全覆盖的命中（"搜索文件"命中时不再计"搜索"）
+
+    位置完全相同的命中（同一关键词属于多个意图）全部保留
+    """
+    result: List[Hit] = []
+    max_end = -1
+    last_span = None
+    last_kept = False
+    for hit in sorted(hits, key=lambda h: (h[0], -h[1])):
+        span = hit[:2]
+        if span == last_span:
+            if last_kept:
+                result.append(hit)
+            continue
+        last_span = span
+        last_kept = hit[1] > max_end
+        if last_kept:
+            result.append(hit)
+        max_end = max(max_end, hit[1])
+    return result
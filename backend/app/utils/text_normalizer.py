@@ -0,0 +1,41 @@
+"""
+文本规范化 - 把说法略有差异的同一指令归一（用于缓存键）
+"""
+import re
+import unicodedata
+
+# 句首的礼貌用语、句尾的语气词，不影响指令含义
+POLITE_PREFIXES = ("麻烦你", "麻烦", "请你", "请", "帮我", "给我", "帮忙")
+TRAILING_PARTICLES = ("谢谢", "一下", "吧", "啊", "呀", "哦", "呢", "嘛", "了")
+
+EDGE_PUNCTUATION = ",.!?;:~。、！？；：…～"
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    规范化用户指令
+
+    - 全角转半角、英文转小写（NFKC）
+    - 去掉所有空白和首尾标点
+    - 去掉句首礼貌用语和句尾语气词
+
+    例如 "请帮我 打开微信吧！" -> "打开微信"
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = WHITESPACE.sub("", text).strip(EDGE_PUNCTUATION)
+
+    changed = True
+    while changed and text:
+        changed = False
+        for prefix in POLITE_PREFIXES:
+            if text.startswith(prefix) and len(text) > len(prefix):
+                text = text[len(prefix):]
+                changed = True
+        for particle in TRAILING_PARTICLES:
+            if text.endswith(particle) and len(text) > len(particle):
+                text = text[:-len(particle)]
+                changed = True
+        text = text.strip(EDGE_PUNCTUATION)
+
+    return text
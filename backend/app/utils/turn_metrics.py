@@ -0,0 +1,81 @@
+"""
+单轮对话的耗时与token统计
+
+每轮对话开始时创建TurnMetrics并放入上下文变量，
+LLM客户端、工具基类、调度器在执行时向当前轮次记录数据，无需层层传参；
+asyncio.gather创建的子任务复制上下文，记录到同一个对象
+"""
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+_current_turn: ContextVar[Optional["TurnMetrics"]] = ContextVar("current_turn", default=None)
+
+
+class TurnMetrics:
+    """一轮对话的统计"""
+
+    def __init__(self, session_id: str, model: str = ""):
+        self.turn_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.model = model
+        self.route = ""
+        self.llm_calls: List[float] = []  # 每次LLM调用的耗时（毫秒）
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0  # 服务端前缀缓存命中的prompt token
+        self.tools: Dict[str, float] = {}  # 工具名 -> 累计耗时（毫秒）
+        self.queue_ms = 0.0
+        self.total_ms = 0.0
+        self._started = time.perf_counter()
+
+    def record_llm(self, latency_ms: float, usage: Optional[Dict[str, Any]] = None):
+        """记录一次LLM调用"""
+        usage = usage or {}
+        self.llm_calls.append(round(latency_ms, 1))
+        self.prompt_tokens += int(usage.get("prompt_tokens") or 0)
+        self.completion_tokens += int(usage.get("completion_tokens") or 0)
+        # DeepSeek返回prompt_cache_hit_tokens，通义千问等OpenAI兼容接口返回prompt_tokens_details.cached_tokens
+        details = usage.get("prompt_tokens_details") or {}
+        self.cached_tokens += int(usage.get("prompt_cache_hit_tokens") or details.get("cached_tokens") or 0)
+
+    def record_tool(self, name: str, latency_ms: float):
+        """记录一次工具执行"""
+        self.tools[name] = round(self.tools.get(name, 0.0) + latency_ms, 1)
+
+    def finish(self) -> "TurnMetrics":
+        """结束计时"""
+        self.total_ms = round((time.perf_counter() - self._started) * 1000, 1)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """统计摘要"""
+        return {
+            "turn_id": self.turn_id,
+            "session_id": self.session_id,
+            "route": self.route,
+            "model": self.model,
+            "llm_calls": len(self.llm_calls),
+            "llm_call_ms": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "llm_ms": round(sum(self.llm_calls), 1),
+            "tool_ms": round(sum(self.tools.values()), 1),
+            "tools": self.tools,
+            "queue_ms": round(self.queue_ms, 1),
+            "total_ms": self.total_ms
+        }
+
+
+def begin_turn(session_id: str, model: str = "") -> TurnMetrics:
+    """开始统计一轮对话（当前任务及其子任务的记录都归入该轮次）"""
+    metrics = TurnMetrics(session_id, model)
+    _current_turn.set(metrics)
+    return metrics
+
+
+def current_turn() -> Optional[TurnMetrics]:
+    """当前轮次（不在对话中时为None，记录被忽略）"""
+    return _current_turn.get()
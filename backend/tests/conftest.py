@@ -2,9 +2,17 @@
 Pytest配置文件
 定义全局fixtures和配置
 """
+import asyncio
+import json
 import pytest
 import sys
 from pathlib import Path
+from app.database import sqlite_db
+from app.database.sqlite_db import Database
+from app.tools.base_tool import BaseTool, ToolResult
+from app.services.ai import context_manager as context_manager_module
+from app.services.ai import turn_ledger as turn_ledger_module
+from app.services.ai.context_manager import ContextManager
 
 # 添加项目根目录到Python路径
 project_root = Path(__file__).parent.parent
@@ -48,6 +56,96 @@ def sample_messages():
     ]
 
 
+class SleepTool(BaseTool):
+    """等待后返回的测试工具（等待时间可按调用参数指定）"""
+
+    def __init__(self, name: str = "sleeper", delay: float = 0):
+        super().__init__()
+        self.name = name
+        self.delay = delay
+        self.description = "测试工具"
+        self.parameters = {"type": "object", "properties": {"delay": {"type": "number"}}}
+
+    async def execute(self, delay: float = None, **kwargs) -> ToolResult:
+        await asyncio.sleep(self.delay if delay is None else delay)
+        return ToolResult(success=True, message=f"{self.name}完成")
+
+
+class FakeWebSocket:
+    """模拟WebSocket：记录发送的消息（文本帧按JSON解码），客户端消息经inbox送入"""
+
+    def __init__(self, fail_send: bool = False, subprotocols=None, query_params=None):
+        self.scope = {"subprotocols": subprotocols or []}
+        self.query_params = query_params or {}
+        self.headers = {}
+        self.subprotocol = None
+        self.accepted = False
+        self.closed_code = None
+        self.sent = []
+        self.fail_send = fail_send
+        self.inbox: asyncio.Queue = asyncio.Queue()
+
+    def push(self, message: dict):
+        """客户端发送一条JSON消息"""
+        self.inbox.put_nowait({"type": "websocket.receive", "text": json.dumps(message)})
+
+    def push_bytes(self, data: bytes):
+        """客户端发送一个二进制音频帧"""
+        self.inbox.put_nowait({"type": "websocket.receive", "bytes": data})
+
+    def hang_up(self):
+        """客户端断开连接"""
+        self.inbox.put_nowait({"type": "websocket.disconnect", "code": 1000})
+
+    async def receive(self):
+        return await self.inbox.get()
+
+    async def accept(self, subprotocol=None):
+        self.accepted = True
+        self.subprotocol = subprotocol
+
+    async def close(self, code: int = 1000):
+        self.closed_code = code
+
+    async def send_text(self, text: str):
+        if self.fail_send:
+            raise ConnectionResetError("broken pipe")
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data: bytes):
+        if self.fail_send:
+            raise ConnectionResetError("broken pipe")
+        self.sent.append(data)
+
+    def types(self):
+        return [message["type"] for message in self.sent]
+
+
+@pytest.fixture
+def db_context_mgr(tmp_path, monkeypatch):
+    """使用临时数据库的上下文管理器"""
+    test_db = Database()
+    test_db.db_path = str(tmp_path / "test.db")
+    monkeypatch.setattr(sqlite_db, "db", test_db)
+    monkeypatch.setattr(context_manager_module, "db", test_db)
+    monkeypatch.setattr(turn_ledger_module, "db", test_db)
+    return ContextManager()
+
+
+@pytest.fixture
+def run_db():
+    """运行协程的函数：先初始化数据库，结束后关闭连接（避免线程残留）"""
+    def run(coro):
+        async def wrapper():
+            try:
+                await sqlite_db.init_database()
+                return await coro
+            finally:
+                await sqlite_db.db.close()
+        return asyncio.run(wrapper())
+    return run
+
+
 @pytest.fixture(autouse=True)
 def reset_environment():
     """每个测试前重置环境"""
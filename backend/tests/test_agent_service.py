@@ -0,0 +1,92 @@
+"""
+Agent服务构建与预热测试
+"""
+import asyncio
+from app.config import settings
+from app.services.ai import agent_service as agent_module
+from app.services.ai.agent_service import AgentService
+
+
+class TestAgentWarmUp:
+    """Agent预热测试类"""
+
+    def test_lazy_build_and_warm_up(self, monkeypatch):
+        """测试创建服务时不构建Agent，预热后就绪并预先建立LLM连接"""
+        monkeypatch.setattr(settings, "DEEPSEEK_API_KEY", "sk-test")
+        monkeypatch.setattr(settings, "AGENT_MODE", "tool_calling")
+        warmed = []
+
+        async def fake_warm_up():
+            warmed.append(True)
+
+        monkeypatch.setattr(agent_module.llm_client, "warm_up", fake_warm_up)
+
+        service = AgentService()
+        assert service.status == "idle"
+        assert service.mode() == "simple"
+
+        asyncio.run(service.warm_up())
+
+        assert service.status == "ready"
+        assert service.mode() == "tool_calling"
+        assert warmed == [True]
+        assert {"build_ms", "warm_up_ms"} <= set(service.timings)
+
+    def test_request_waits_for_build(self, monkeypatch):
+        """测试预热前到达的请求先等待构建完成"""
+        monkeypatch.setattr(settings, "DEEPSEEK_API_KEY", "")
+        service = AgentService()
+
+        result = asyncio.run(service.execute("几点了"))
+
+        assert result["output"].startswith("现在是")
+        assert service.timings["build_ms"] >= 0
+
+
+class FakeToolAgent:
+    """按固定顺序产出事件的Agent"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def astream(self, user_input, chat_history=None, tool_names=None):
+        self.calls.append(user_input)
+        yield {"type": "token", "delta": "好的"}
+        yield {"type": "tool_start", "step_index": 0, "tool": "text_processing", "tool_input": {"text": "诗"}}
+        yield {"type": "tool_end", "step_index": 0, "tool": "text_processing", "result": "失败: 测试"}
+        yield {"type": "final", "output": "写好了", "success": True, "complete": True,
+               "intermediate_steps": [{"tool": "text_processing", "tool_input": {"text": "诗"}, "result": "失败: 测试"}]}
+
+
+class TestExecuteStream:
+    """流式执行事件测试类"""
+
+    def test_agent_event_sequence(self):
+        """测试Agent事件按顺序转发，final附带路由信息"""
+        service = AgentService()
+        service._initialized = True
+        service.tool_agent = FakeToolAgent()
+
+        async def run():
+            return [event async for event in service.execute_stream("帮我写一首诗")]
+
+        events = asyncio.run(run())
+
+        assert [e["type"] for e in events] == ["token", "tool_start", "tool_end", "final"]
+        assert events[-1]["route"]["path"] == "agent"
+        assert events[-1]["output"] == "写好了"
+        assert service.tool_agent.calls == ["帮我写一首诗"]
+
+    def test_simple_mode_does_not_chat(self):
+        """测试简化模式下无法识别的输入直接返回提示，不调用LLM闲聊"""
+        service = AgentService()
+        service._initialized = True
+
+        async def run():
+            return [event async for event in service.execute_stream("给我讲个笑话")]
+
+        events = asyncio.run(run())
+
+        assert [e["type"] for e in events] == ["final"]
+        assert events[-1]["route"]["path"] == "simple"
+        assert events[-1]["success"] is False
@@ -0,0 +1,35 @@
+"""
+SSE流式对话测试
+"""
+import asyncio
+import pytest
+from app.api import chat
+
+
+class TestSSEEvents:
+    """SSE事件流测试类"""
+
+    @pytest.fixture
+    def slow_turn(self, monkeypatch):
+        """模拟一轮对话：思考后停顿，再返回最终回复"""
+        async def fake_turn(session_id, user_message):
+            yield {"type": "thinking", "data": {"status": "processing"}}
+            await asyncio.sleep(0.05)
+            yield {"type": "chat_response", "data": {"text": "好的"}, "timestamp": 1}
+
+        monkeypatch.setattr(chat, "_stream_chat_turn", fake_turn)
+        monkeypatch.setattr(chat.SystemConfig, "SSE_KEEPALIVE_INTERVAL", 0.01)
+
+    def collect(self):
+        async def run():
+            return [chunk async for chunk in chat._sse_events("s1", "打开微信")]
+        return asyncio.run(run())
+
+    def test_events_and_keepalive(self, slow_turn):
+        """测试按顺序产出事件，等待期间发送保活注释"""
+        chunks = self.collect()
+        events = [c.split("\n")[1] for c in chunks if c.startswith("id:")]
+
+        assert events == ["event: session", "event: thinking", "event: chat_response"]
+        assert ": keep-alive\n\n" in chunks
+        assert '"timestamp": 1' in chunks[-1]
@@ -0,0 +1,209 @@
+"""
+WebSocket对话测试
+"""
+import asyncio
+import pytest
+from app.api import chat
+from app.services.realtime.connection_manager import ConnectionManager, Connection
+from tests.conftest import FakeWebSocket
+
+
+class TestChatTurn:
+    """对话事件转发测试类"""
+
+    @pytest.fixture
+    def manager(self, monkeypatch):
+        """使用独立的连接管理器"""
+        mgr = ConnectionManager()
+        monkeypatch.setattr(chat, "connection_manager", mgr)
+        return mgr
+
+    def test_stream_chat_turn_maps_agent_events(self, monkeypatch):
+        """测试Agent事件转换为客户端消息，最终回复后落库"""
+        committed = []
+
+        async def fake_execute_stream(user_input, chat_history=None, priority=None):
+            yield {"type": "token", "delta": "好"}
+            yield {"type": "tool_start", "step_index": 0, "tool": "app_launcher", "tool_input": {"app_name": "微信"}}
+            yield {"type": "tool_end", "step_index": 0, "tool": "app_launcher", "result": "成功: 已打开"}
+            yield {"type": "final", "output": "已打开微信", "success": True,
+                   "intermediate_steps": [{"tool": "app_launcher", "tool_input": {"app_name": "微信"}}],
+                   "route": {"path": "agent"}}
+
+        async def fake_get_context(session_id):
+            return {"history": [], "context": {}}
+
+        async def fake_commit_turn(session_id, user_message, reply, context_data=None, metrics=None):
+            committed.append((user_message, reply, context_data))
+            return True
+
+        monkeypatch.setattr(chat.agent_service, "execute_stream", fake_execute_stream)
+        monkeypatch.setattr(chat.context_manager, "get_context", fake_get_context)
+        monkeypatch.setattr(chat.context_manager, "commit_turn", fake_commit_turn)
+
+        async def run():
+            return [reply async for reply in chat._stream_chat_turn("s1", "打开微信")]
+
+        replies = asyncio.run(run())
+
+        assert [r["type"] for r in replies] == ["thinking", "token", "step_update", "step_update", "chat_response"]
+        assert [r["data"]["status"] for r in replies[2:4]] == ["running", "completed"]
+        assert replies[-1]["data"]["text"] == "已打开微信"
+        assert committed == [("打开微信", "已打开微信", {"last_entity": "微信"})]
+
+    def test_run_chat_turn_publishes_to_session(self, manager, monkeypatch):
+        """测试对话事件按顺序推送给同一会话的所有设备"""
+        async def fake_turn(session_id, user_message, priority=None):
+            yield {"type": "thinking", "data": {"status": "processing"}}
+            yield {"type": "token", "data": {"delta": "好"}}
+            yield {"type": "chat_response", "data": {"text": "好的"}}
+
+        monkeypatch.setattr(chat, "_stream_chat_turn", fake_turn)
+
+        async def run():
+            desktop, phone = FakeWebSocket(), FakeWebSocket()
+            conn = await manager.connect(desktop)
+            await manager.connect(phone, conn.session_id)
+            await chat._run_chat_turn(conn, "打开微信")
+            await asyncio.sleep(0.01)
+            return desktop, phone
+
+        desktop, phone = asyncio.run(run())
+
+        assert desktop.types() == ["thinking", "token", "chat_response"]
+        assert phone.types() == ["thinking", "token", "chat_response"]
+
+
+class TestWebSocketEndpoint:
+    """WebSocket接收循环测试类"""
+
+    @pytest.fixture
+    def manager(self, monkeypatch):
+        """独立的连接管理器；对话在released设置前一直执行"""
+        mgr = ConnectionManager()
+        mgr.started = []
+        mgr.cancelled = []
+        mgr.released = None
+        monkeypatch.setattr(chat, "connection_manager", mgr)
+
+        async def fake_get_session(session_id):
+            return None
+
+        async def fake_turn(session_id, user_message, priority=None):
+            mgr.started.append(user_message)
+            try:
+                await mgr.released.wait()
+            except asyncio.CancelledError:
+                mgr.cancelled.append(user_message)
+                raise
+            yield {"type": "chat_response", "data": {"text": user_message}}
+
+        monkeypatch.setattr(chat.context_manager, "get_session", fake_get_session)
+        monkeypatch.setattr(chat, "_stream_chat_turn", fake_turn)
+        return mgr
+
+    @staticmethod
+    async def open(manager, ws):
+        """运行接收循环直到第一轮对话开始执行"""
+        manager.released = asyncio.Event()
+        endpoint = asyncio.create_task(chat.websocket_endpoint(ws))
+        ws.push({"type": "chat", "data": {"text": "第一条"}})
+        for _ in range(100):
+            if manager.started:
+                break
+            await asyncio.sleep(0.01)
+        return endpoint
+
+    @staticmethod
+    async def close(manager, ws, endpoint):
+        manager.released.set()
+        await asyncio.sleep(0.01)
+        ws.hang_up()
+        await endpoint
+
+    def test_ping_during_turn(self, manager):
+        """测试对话执行期间仍响应心跳"""
+        async def run():
+            ws = FakeWebSocket()
+            endpoint = await self.open(manager, ws)
+            ws.push({"type": "ping"})
+            await asyncio.sleep(0.02)
+            answered = "pong" in ws.types() and "chat_response" not in ws.types()
+            await self.close(manager, ws, endpoint)
+            return answered, ws
+
+        answered, ws = asyncio.run(run())
+
+        assert answered
+        assert ws.types()[-1] == "chat_response"
+
+    def test_cancel_running_and_queued(self, manager):
+        """测试取消执行中的对话并丢弃排队的对话"""
+        async def run():
+            ws = FakeWebSocket()
+            endpoint = await self.open(manager, ws)
+            ws.push({"type": "chat", "data": {"text": "第二条"}})
+            ws.push({"type": "chat", "data": {"text": "第三条"}})
+            ws.push({"type": "cancel"})
+            await asyncio.sleep(0.02)
+            await self.close(manager, ws, endpoint)
+            return ws
+
+        ws = asyncio.run(run())
+
+        cancelled = [m for m in ws.sent if m["type"] == "cancelled"]
+        assert cancelled[0]["data"] == {"cancelled": 1, "dropped": 2}
+        assert manager.started == ["第一条"]
+        assert manager.cancelled == ["第一条"]
+        assert "chat_response" not in ws.types()
+
+    def test_queue_full(self, manager):
+        """测试排队对话超过上限时通知客户端"""
+        manager.max_pending_turns = 2
+
+        async def run():
+            ws = FakeWebSocket()
+            endpoint = await self.open(manager, ws)
+            for text in ("第二条", "第三条", "第四条"):
+                ws.push({"type": "chat", "data": {"text": text}})
+            await asyncio.sleep(0.02)
+            await self.close(manager, ws, endpoint)
+            return ws
+
+        ws = asyncio.run(run())
+
+        errors = [m["data"]["code"] for m in ws.sent if m["type"] == "error"]
+        assert errors == ["queue_full"]
+        assert manager.started == ["第一条", "第二条", "第三条"]
+
+    def test_audio_overflow_reported_once(self, manager, monkeypatch):
+        """测试音频缓冲溢出时丢弃音频块，每次溢出只通知客户端一次"""
+        monkeypatch.setattr(chat, "AUDIO_QUEUE_SIZE", 2)
+
+        async def run():
+            ws = FakeWebSocket()
+            endpoint = asyncio.create_task(chat.websocket_endpoint(ws))
+            for _ in range(5):
+                ws.push_bytes(b"\x00\x00" * 160)
+            ws.hang_up()
+            await endpoint
+            return ws
+
+        ws = asyncio.run(run())
+
+        errors = [m["data"]["code"] for m in ws.sent if m["type"] == "error"]
+        assert errors == ["audio_overflow"]
+
+    def test_end_marker_kept_when_audio_buffer_full(self):
+        """测试缓冲已满时结束标记仍能写入（让出最早的音频块）"""
+        async def run():
+            conn = Connection(FakeWebSocket(), "s1", max_pending_turns=1)
+            queue = conn.audio_queue = asyncio.Queue(maxsize=2)
+            accepted = [chat._feed_audio(conn, chunk) for chunk in (b"a", b"b", b"c")]
+            chat._end_audio_stream(conn)
+            return accepted, [queue.get_nowait() for _ in range(queue.qsize())]
+
+        accepted, queued = asyncio.run(run())
+
+        assert accepted == [True, True, False]
+        assert queued == [b"b", None]
@@ -0,0 +1,218 @@
+"""
+WebSocket连接管理器测试
+"""
+import asyncio
+import pytest
+from app.services.realtime.connection_manager import ConnectionManager
+from tests.conftest import FakeWebSocket
+
+
+class TestConnectionManager:
+    """连接管理器测试类"""
+
+    @pytest.fixture
+    def manager(self):
+        """创建连接管理器实例"""
+        mgr = ConnectionManager()
+        mgr.max_connections = 2
+        return mgr
+
+    def test_connect_registers_by_id(self, manager):
+        """测试连接按ID注册"""
+        ws = FakeWebSocket()
+        conn = asyncio.run(manager.connect(ws))
+
+        assert ws.accepted
+        assert manager.connections[conn.id] is conn
+
+    def test_disconnect_is_idempotent(self, manager):
+        """测试重复断开不报错"""
+        conn = asyncio.run(manager.connect(FakeWebSocket()))
+
+        manager.disconnect(conn.id)
+        manager.disconnect(conn.id)
+
+        assert conn.id not in manager.connections
+
+    def test_reject_over_capacity(self, manager):
+        """测试超过连接数上限时拒绝"""
+        asyncio.run(manager.connect(FakeWebSocket()))
+        asyncio.run(manager.connect(FakeWebSocket()))
+
+        ws = FakeWebSocket()
+        conn = asyncio.run(manager.connect(ws))
+
+        assert conn is None
+        assert not ws.accepted
+        assert ws.closed_code == 1013
+        assert manager.get_stats()["rejected"] == 1
+
+    def test_reap_idle_connection(self, manager):
+        """测试回收空闲连接"""
+        ws = FakeWebSocket()
+        conn = asyncio.run(manager.connect(ws))
+        conn.last_active -= manager.idle_timeout + 1
+
+        asyncio.run(manager.check_connections())
+
+        assert conn.id not in manager.connections
+        assert ws.closed_code == 1001
+        assert manager.get_stats()["reaped_idle"] == 1
+
+    def test_reap_dead_connection(self, manager):
+        """测试回收发送失败的连接，正常连接收到心跳"""
+        alive = FakeWebSocket()
+        dead = FakeWebSocket(fail_send=True)
+        alive_conn = asyncio.run(manager.connect(alive))
+        dead_conn = asyncio.run(manager.connect(dead))
+
+        asyncio.run(manager.check_connections())
+
+        assert alive_conn.id in manager.connections
+        assert dead_conn.id not in manager.connections
+        assert alive.sent[0]["type"] == "heartbeat"
+
+    def test_enqueue_turn_bounded(self, manager):
+        """测试对话队列有界"""
+        conn = asyncio.run(manager.connect(FakeWebSocket()))
+
+        results = [
+            manager.enqueue_turn(conn, f"指令{i}")
+            for i in range(manager.max_pending_turns + 1)
+        ]
+
+        assert all(results[:-1])
+        assert results[-1] is False
+        assert manager.cancel_turn(conn) == {
+            "cancelled": 0,
+            "dropped": manager.max_pending_turns
+        }
+
+    def test_resume_within_grace(self, manager):
+        """测试断线宽限期内重连，接管未完成的对话并补发消息"""
+        async def run():
+            conn = await manager.connect(FakeWebSocket(), "s1")
+            conn.running_turn = asyncio.create_task(asyncio.sleep(10))
+            manager.disconnect(conn.id)
+            await manager.send_message({"type": "chat_response"}, conn)
+
+            ws = FakeWebSocket()
+            resumed = await manager.connect(ws, "s1")
+            await manager.replay(resumed)
+            resumed.running_turn.cancel()
+            return conn, resumed, ws
+
+        conn, resumed, ws = asyncio.run(run())
+
+        assert resumed is conn
+        assert resumed.websocket is ws
+        assert ws.sent[0]["type"] == "chat_response"
+        assert "s1" not in manager.detached
+
+    def test_replay_before_live_events(self, manager):
+        """测试重连后先补发暂存的消息，再发送新的对话事件"""
+        async def run():
+            conn = await manager.connect(FakeWebSocket(), "s1")
+            conn.running_turn = asyncio.create_task(asyncio.sleep(10))
+            manager.disconnect(conn.id)
+            manager.publish("s1", {"type": "step_update", "data": {"step_index": 0}})
+            await asyncio.sleep(0)
+
+            ws = FakeWebSocket()
+            resumed = await manager.connect(ws, "s1")
+            manager.publish("s1", {"type": "chat_response", "data": {"text": "好的"}})
+            await asyncio.sleep(0.01)
+            before_replay = ws.types()
+            await manager.replay(resumed)
+            await asyncio.sleep(0.01)
+            resumed.running_turn.cancel()
+            return before_replay, ws.types()
+
+        before_replay, types = asyncio.run(run())
+
+        assert before_replay == []
+        assert types == ["step_update", "chat_response"]
+
+    def test_stale_socket_does_not_disconnect_resumed(self, manager):
+        """测试已被回收的旧socket退出时不注销由新socket接管的连接"""
+        async def run():
+            old = FakeWebSocket()
+            conn = await manager.connect(old, "s1")
+            conn.running_turn = asyncio.create_task(asyncio.sleep(10))
+            manager.disconnect(conn.id, old)
+
+            ws = FakeWebSocket()
+            resumed = await manager.connect(ws, "s1")
+            manager.disconnect(resumed.id, old)
+            alive = resumed.id in manager.connections and not resumed.running_turn.done()
+            resumed.running_turn.cancel()
+            return resumed, ws, alive
+
+        resumed, ws, alive = asyncio.run(run())
+
+        assert alive
+        assert resumed.websocket is ws
+
+    def test_disconnect_without_work_is_not_resumable(self, manager):
+        """测试没有未完成对话的连接断开后不保留"""
+        async def run():
+            conn = await manager.connect(FakeWebSocket(), "s2")
+            manager.disconnect(conn.id)
+            return conn, await manager.connect(FakeWebSocket(), "s2")
+
+        conn, new_conn = asyncio.run(run())
+
+        assert new_conn is not conn
+        assert new_conn.session_id == "s2"
+
+    def test_v1_batches_events(self, manager):
+        """测试v1协议合并事件为一帧，最终回复不重复携带步骤结果"""
+        ws = FakeWebSocket(subprotocols=["voicepc.v1.json"])
+
+        async def run():
+            conn = await manager.connect(ws)
+            await manager.send_message({"type": "token", "data": {"delta": "好"}}, conn)
+            await manager.send_message({
+                "type": "chat_response",
+                "data": {"text": "好", "steps": [{"tool": "app_control", "result": "ok"}]}
+            }, conn)
+
+        asyncio.run(run())
+
+        assert ws.subprotocol == "voicepc.v1.json"
+        assert len(ws.sent) == 1
+        frame = ws.sent[0]
+        assert frame["v"] == 1
+        assert [e["t"] for e in frame["e"]] == ["token", "chat_response"]
+        assert frame["e"][1]["d"] == {"text": "好", "step_count": 1}
+
+    def test_publish_fans_out_to_session(self, manager):
+        """测试对话事件推送给同一会话的所有连接，慢连接不阻塞快连接且队列有界"""
+        fast = FakeWebSocket()
+        slow = FakeWebSocket()
+        other = FakeWebSocket()
+        manager.max_connections = 3
+        manager.hub.max_queue = 2
+        release = asyncio.Event()
+
+        async def stuck_send(text):
+            await release.wait()
+
+        slow.send_text = stuck_send
+
+        async def run():
+            await manager.connect(fast, "s3")
+            await manager.connect(slow, "s3")
+            await manager.connect(other, "s4")
+            for i in range(4):
+                manager.publish("s3", {"type": "step_update", "data": {"step_index": i}})
+                await asyncio.sleep(0)
+            return manager.get_stats()["fanout"]
+
+        fanout = asyncio.run(run())
+
+        assert len(fast.sent) == 4
+        assert other.sent == []
+        assert fanout["subscribers"] == 3
+        assert fanout["delivered"] == 4
+        assert fanout["dropped"] == 1
@@ -3,6 +3,7 @@
 """
 import pytest
 from datetime import datetime
+from app.database import sqlite_db
 from app.services.ai.context_manager import ContextManager
 
 
@@ -175,3 +176,38 @@ class TestContextManagerEdgeCases:
             # 或者拒绝
             assert True
 
+
+class TestTurnCommit:
+    """单事务保存对话测试"""
+    
+    def test_commit_turn_creates_session(self, db_context_mgr, run_db):
+        """测试新会话的一轮对话一次写入，上下文一次读出"""
+        async def flow():
+            await db_context_mgr.commit_turn("s1", "打开微信", "好的", {"last_entity": "微信"})
+            await db_context_mgr.commit_turn("s1", "关闭它", "已关闭")
+            return await db_context_mgr.get_context("s1")
+        
+        context = run_db(flow())
+        
+        assert [m["content"] for m in context["history"]] == ["打开微信", "好的", "关闭它", "已关闭"]
+        assert context["context"] == {"last_entity": "微信"}
+    
+    def test_get_context_unknown_session(self, db_context_mgr, run_db):
+        """测试不存在的会话返回空上下文"""
+        context = run_db(db_context_mgr.get_context("missing"))
+        
+        assert context["history"] == []
+        assert context["context"] == {}
+    
+    def test_transaction_rolls_back(self, db_context_mgr, run_db):
+        """测试事务出错时整体回滚"""
+        async def flow():
+            with pytest.raises(RuntimeError):
+                async with sqlite_db.db.transaction() as conn:
+                    await conn.execute(
+                        "INSERT INTO sessions (id, status, context) VALUES ('s2', 'active', '{}')"
+                    )
+                    raise RuntimeError("boom")
+            return await db_context_mgr.get_session("s2")
+        
+        assert run_db(flow()) is None
@@ -0,0 +1,119 @@
+"""
+请求截止时间测试
+"""
+import asyncio
+import json
+import pytest
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded, start_deadline
+from app.tools.base_tool import tool_registry
+from app.services.ai.llm_client import llm_client
+from app.services.ai.scheduler import AgentScheduler
+from app.services.ai.tool_agent import ToolCallingAgent
+from tests.conftest import SleepTool
+
+
+class TestDeadline:
+    """截止时间测试类"""
+
+    def test_wait_without_deadline(self):
+        """测试未设置截止时间时不限时"""
+        async def run():
+            assert deadline.remaining() is None
+            return await deadline.wait(asyncio.sleep(0.01, "ok"), "测试")
+
+        assert asyncio.run(run()) == "ok"
+
+    def test_wait_exceeded(self):
+        """测试超过截止时间时抛出带阶段名的异常"""
+        async def run():
+            start_deadline(0.05)
+            with pytest.raises(DeadlineExceeded) as error:
+                await deadline.wait(asyncio.sleep(1), "LLM调用")
+            assert error.value.stage == "LLM调用"
+            assert deadline.expired()
+            # floor保证截止后仍有时间完成（如对话落库）
+            assert await deadline.wait(asyncio.sleep(0.01, "saved"), "数据库", floor=1) == "saved"
+
+        asyncio.run(run())
+
+    def test_keeps_earlier_deadline(self):
+        """测试嵌套设置时保留更早的截止时间"""
+        async def run():
+            start_deadline(1)
+            start_deadline(60)
+            return deadline.remaining()
+
+        assert asyncio.run(run()) <= 1
+
+    def test_tool_timeout(self):
+        """测试工具超时返回失败结果"""
+        async def run():
+            start_deadline(0.05)
+            return await SleepTool("slow").safe_execute(delay=1)
+
+        result = asyncio.run(run())
+        assert not result.success
+        assert result.message == "工具执行超时"
+
+    def test_agent_partial_result(self, monkeypatch):
+        """测试截止时间已到时Agent返回已完成的部分结果"""
+        rounds = []
+
+        async def fake_stream(messages, tools):
+            rounds.append(messages)
+            yield {"type": "message", "content": "", "tool_calls": [
+                {"id": "c1", "name": "fast", "arguments": json.dumps({"delay": 0})},
+                {"id": "c2", "name": "slow", "arguments": json.dumps({"delay": 1})},
+            ]}
+
+        monkeypatch.setattr(llm_client, "chat_with_tools_stream", fake_stream)
+        monkeypatch.setattr(tool_registry, "tools", {"fast": SleepTool("fast"), "slow": SleepTool("slow")})
+
+        async def run():
+            start_deadline(0.1)
+            return [event async for event in ToolCallingAgent("system").astream("先快后慢")]
+
+        events = asyncio.run(run())
+        final = events[-1]
+        assert len(rounds) == 1
+        assert final["success"] is False
+        assert final["complete"] is False
+        assert final["output"].startswith("执行超时，已完成1/2步")
+        assert "fast完成" in final["output"]
+
+    def test_llm_client_propagates_deadline(self, monkeypatch):
+        """测试LLM调用超过截止时间时抛出DeadlineExceeded，而不是返回降级回复"""
+        class SlowCompletions:
+            async def create(self, **kwargs):
+                await asyncio.sleep(1)
+
+        class SlowClient:
+            chat = type("Chat", (), {"completions": SlowCompletions()})()
+
+        monkeypatch.setattr(llm_client, "client", SlowClient())
+        messages = [{"role": "user", "content": "打开微信"}]
+
+        async def run(call):
+            start_deadline(0.05)
+            with pytest.raises(DeadlineExceeded):
+                await call()
+
+        asyncio.run(run(lambda: llm_client.chat(messages)))
+        asyncio.run(run(lambda: llm_client.chat_with_functions(messages, [])))
+
+    def test_scheduler_queue_timeout(self):
+        """测试排队到截止时间的任务放弃排队"""
+        scheduler = AgentScheduler(max_concurrency=1, max_pending=10)
+
+        async def run():
+            await scheduler.acquire()
+            start_deadline(0.05)
+            with pytest.raises(DeadlineExceeded):
+                await scheduler.acquire()
+            scheduler.release()
+
+        asyncio.run(run())
+        stats = scheduler.get_stats()
+        assert stats["running"] == 0 and stats["queued"] == 0
+        assert stats["expired"] == 1
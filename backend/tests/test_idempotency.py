@@ -0,0 +1,68 @@
+"""
+幂等与重复指令合并测试
+"""
+import asyncio
+import pytest
+from app.services.ai.idempotency import IdempotencyStore
+
+
+class TestIdempotencyStore:
+    """幂等存储测试类"""
+
+    @pytest.fixture
+    def store(self):
+        """创建幂等存储实例"""
+        return IdempotencyStore()
+
+    def test_inflight_duplicates_share_execution(self, store):
+        """测试执行中的重复请求共享同一次执行"""
+        calls = []
+
+        async def execute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "已打开微信"
+
+        async def run():
+            key = store.make_key("http", "s1", "打开微信")
+            return await asyncio.gather(store.run(key, execute), store.run(key, execute))
+
+        results = asyncio.run(run())
+
+        assert len(calls) == 1
+        assert results == [("已打开微信", "executed"), ("已打开微信", "coalesced")]
+
+    def test_completed_key_is_replayed(self, store):
+        """测试带幂等键的请求完成后直接重放结果"""
+        calls = []
+
+        async def execute():
+            calls.append(1)
+            return len(calls)
+
+        async def run():
+            key = store.make_key("http", None, "打开微信", "req-1")
+            first = await store.run(key, execute)
+            second = await store.run(key, execute)
+            return first, second
+
+        first, second = asyncio.run(run())
+
+        assert first == (1, "executed")
+        assert second == (1, "replayed")
+
+    def test_completed_command_without_key_runs_again(self, store):
+        """测试不带幂等键的相同指令完成后可再次执行（如"下一首"）"""
+        calls = []
+
+        async def execute():
+            calls.append(1)
+            return len(calls)
+
+        async def run():
+            key = store.make_key("ws", "s1", "下一首")
+            await store.run(key, execute)
+            return await store.run(key, execute)
+
+        assert asyncio.run(run()) == (2, "executed")
+        assert store.make_key("ws", None, "下一首") is None
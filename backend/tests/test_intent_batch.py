@@ -0,0 +1,100 @@
+"""
+批量意图解析与离线评估测试
+"""
+import asyncio
+import json
+import pytest
+from fastapi import HTTPException
+from app.api.intent import ParseBatchRequest, parse_batch
+from app.services.ai.intent_classifier import DEFAULT_DATA_PATH
+from app.services.ai.intent_eval import TRAINING_DATA_WARNING, evaluate, main
+from app.services.ai.intent_parser import IntentParser
+from app.services.ai.llm_client import llm_client
+from app.utils.constants import SystemConfig
+
+
+class TestParseBatch:
+    """批量解析测试类"""
+
+    def test_stages_and_order(self):
+        """测试结果与输入顺序一致，并标明来源"""
+        parser = IntentParser()
+        texts = ["打开微信", "来点音乐", "打开微信！"]
+        results = asyncio.run(parser.parse_batch(texts, use_llm=False, use_cache=False))
+
+        assert [intent.raw_text for intent, _ in results] == texts
+        assert [source for _, source in results] == ["rules", "classifier", "rules"]
+        assert (results[1][0].type, results[1][0].action) == ("media_control", "play")
+
+    def test_llm_bounded_and_deduplicated(self, monkeypatch):
+        """测试只有剩余输入调用LLM，并发数受限，相同指令只调用一次"""
+        parser = IntentParser()
+        running, peak, calls = 0, 0, []
+
+        async def fake_llm_parse(text, fallback_intent):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            calls.append(text)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return fallback_intent.model_copy(update={"type": "unknown", "confidence": 0.9})
+
+        monkeypatch.setattr(llm_client, "is_available", lambda: True)
+        monkeypatch.setattr(parser, "_llm_based_parse", fake_llm_parse)
+        monkeypatch.setattr(SystemConfig, "INTENT_BATCH_LLM_CONCURRENCY", 2)
+
+        texts = ["打开微信"] + [f"闲聊话题{i}号" for i in range(6)] + ["闲聊话题0号。"]
+        results = asyncio.run(parser.parse_batch(texts))
+
+        assert len(calls) == 6
+        assert peak == 2
+        assert [source for _, source in results].count("llm") == 7
+        # 再次解析直接命中缓存
+        assert {source for _, source in asyncio.run(parser.parse_batch(texts))} == {"cache"}
+
+    def test_endpoint(self):
+        """测试批量解析接口"""
+        response = asyncio.run(parse_batch(ParseBatchRequest(texts=["打开微信", "来点音乐"], use_llm=False)))
+        assert [item["source"] for item in response["results"]] == ["rules", "classifier"]
+        assert response["stats"]["count"] == 2
+
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(parse_batch(ParseBatchRequest(texts=["x"] * (SystemConfig.INTENT_BATCH_MAX_SIZE + 1))))
+        assert error.value.status_code == 400
+
+
+class TestIntentEval:
+    """离线评估测试类"""
+
+    def test_evaluate(self):
+        """测试准确率、各阶段命中率和吞吐量"""
+        samples = [("打开微信", "app_control/open"), ("来点音乐", "media_control/play"),
+                   ("打开微信", "app_control/close")]
+        report = asyncio.run(evaluate(samples))
+
+        assert report["samples"] == 3
+        assert report["accuracy"] == pytest.approx(2 / 3, abs=0.001)
+        assert report["stages"]["rules"]["count"] == 2
+        assert report["stages"]["classifier"]["rate"] == pytest.approx(1 / 3, abs=0.001)
+        assert report["errors"][0]["expected"] == "app_control/close"
+        assert report["throughput"] > 0
+
+    def test_cli(self, tmp_path, capsys):
+        """测试命令行输出JSON报告"""
+        corpus = tmp_path / "corpus.jsonl"
+        corpus.write_text(json.dumps({"text": "播放音乐", "type": "media_control", "action": "play"}, ensure_ascii=False) + "\n",
+                          encoding="utf-8")
+        main(["--data", str(corpus)])
+        report = json.loads(capsys.readouterr().out)
+        assert report["accuracy"] == 1.0
+        assert "warning" not in report
+
+    def test_cli_warns_on_training_data(self, capsys):
+        """测试语料为分类器训练样本时报告中附带警告，未指定语料时报错"""
+        main(["--data", DEFAULT_DATA_PATH, "--errors", "0"])
+        report = json.loads(capsys.readouterr().out)
+        assert report["warning"] == TRAINING_DATA_WARNING
+
+        with pytest.raises(SystemExit):
+            main([])
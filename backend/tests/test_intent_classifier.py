@@ -0,0 +1,64 @@
+"""
+本地意图分类器测试
+"""
+import asyncio
+import pytest
+from app.services.ai.intent_classifier import (
+    IntentClassifier, DEFAULT_DATA_PATH, load_samples, main
+)
+from app.services.ai.intent_parser import IntentParser
+from app.services.ai.llm_client import llm_client
+
+
+class TestIntentClassifier:
+    """意图分类器测试类"""
+
+    @pytest.fixture
+    def classifier(self):
+        """用随代码提供的样本训练"""
+        classifier = IntentClassifier(model_path="/nonexistent/model.npz")
+        classifier.fit(load_samples(DEFAULT_DATA_PATH))
+        return classifier
+
+    def test_classify_paraphrase(self, classifier):
+        """测试规则无法识别的说法"""
+        assert classifier.classify("把微信弄出来")[:2] == ("app_control", "open")
+        assert classifier.classify("声音大一点")[:2] == ("media_control", "volume")
+
+    def test_chitchat_not_classified(self, classifier):
+        """测试闲聊不作为指令"""
+        assert classifier.classify("给我讲个笑话") is None
+        assert classifier.predict("")[1] == 0.0
+
+    def test_save_and_load(self, classifier, tmp_path):
+        """测试模型保存后加载结果一致"""
+        path = str(tmp_path / "model.npz")
+        classifier.save(path)
+        loaded = IntentClassifier(model_path=path)
+        assert loaded.load()
+        assert loaded.predict("来点音乐") == pytest.approx(classifier.predict("来点音乐"))
+
+    def test_cli_train_and_eval(self, tmp_path, capsys):
+        """测试命令行训练与评估"""
+        path = str(tmp_path / "model.npz")
+        main(["train", "--model", path, "--holdout", "0.2"])
+        main(["eval", "--model", path])
+        output = capsys.readouterr().out
+        assert "留出集" in output and "covered_accuracy" in output
+
+    def test_parse_uses_classifier_before_llm(self, monkeypatch):
+        """测试规则未命中时由分类器识别，不调用LLM"""
+        parser = IntentParser()
+        calls = []
+
+        async def fake_llm_parse(text, fallback_intent):
+            calls.append(text)
+            return fallback_intent
+
+        monkeypatch.setattr(llm_client, "is_available", lambda: True)
+        monkeypatch.setattr(parser, "_llm_based_parse", fake_llm_parse)
+
+        intent = asyncio.run(parser.parse("来点音乐"))
+        assert (intent.type, intent.action) == ("media_control", "play")
+        assert calls == []
+        assert parser.get_stats()["classifier_parses"] == 1
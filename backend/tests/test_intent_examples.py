@@ -0,0 +1,48 @@
+"""
+意图示例检索测试
+"""
+import asyncio
+from app.services.ai.intent_examples import IntentExampleIndex, format_example
+from app.services.ai.intent_parser import IntentParser
+from app.services.ai.llm_client import llm_client
+
+
+class TestIntentExamples:
+    """意图示例检索测试类"""
+
+    def test_nearest(self):
+        """测试按n-gram余弦相似度取最相近的示例"""
+        index = IntentExampleIndex()
+        index.build([
+            {"text": "把微信弄出来", "type": "app_control", "action": "open", "entities": {"app_name": "微信"}},
+            {"text": "把微信关掉", "type": "app_control", "action": "close", "entities": {"app_name": "微信"}},
+            {"text": "来点音乐", "type": "media_control", "action": "play"},
+        ])
+        nearest = index.nearest("把钉钉弄出来", k=2)
+        assert [example["action"] for example in nearest] == ["open", "close"]
+        assert nearest[0]["score"] > nearest[1]["score"]
+        assert index.nearest("xyz", k=2) == []
+
+    def test_format_example(self):
+        """测试示例行为紧凑的单行JSON"""
+        line = format_example({"text": "来点音乐", "type": "media_control", "action": "play"})
+        assert line == '来点音乐 => {"type":"media_control","action":"play","entities":{}}'
+
+    def test_few_shot_llm_parse(self, monkeypatch):
+        """测试LLM解析使用few-shot提示词、限制输出长度，并兼容代码块包裹的JSON"""
+        requests = []
+
+        async def fake_chat(messages, temperature=0.7, max_tokens=2000):
+            requests.append((messages[0]["content"], max_tokens))
+            return '```json\n{"type": "app_control", "action": "open", "entities": {"app_name": "钉钉"}}\n```'
+
+        monkeypatch.setattr(llm_client, "chat", fake_chat)
+        parser = IntentParser()
+        fallback = parser.parse_rules("帮我把钉钉弄出来")
+        intent = asyncio.run(parser._llm_based_parse("帮我把钉钉弄出来", fallback))
+
+        prompt, max_tokens = requests[0]
+        assert (intent.type, intent.action) == ("app_control", "open")
+        assert intent.entities == {"app_name": "钉钉"}
+        assert max_tokens <= 200
+        assert "弄出来 =>" in prompt and prompt.endswith("帮我把钉钉弄出来 =>")
@@ -1,8 +1,11 @@
 """
 意图解析器测试
 """
+import asyncio
 import pytest
 from app.services.ai.intent_parser import IntentParser, Intent
+from app.services.ai.llm_client import llm_client
+from app.services.ai.intent_classifier import intent_classifier
 
 
 class TestIntentParser:
@@ -142,3 +145,48 @@ class TestIntentParser:
         assert result.type == "app_control"
         assert result.action == "open"
 
+
+class TestIntentCache:
+    """意图解析缓存测试类"""
+
+    @pytest.fixture(autouse=True)
+    def no_classifier(self, monkeypatch):
+        """关闭本地分类器，使低置信度输入进入LLM阶段"""
+        monkeypatch.setattr(intent_classifier, "classify_batch", lambda texts: [None] * len(texts))
+
+    def test_llm_result_cached(self, monkeypatch):
+        """测试规范化后相同的模糊指令只调用一次LLM"""
+        parser = IntentParser()
+        calls = []
+
+        async def fake_llm_parse(text, fallback_intent):
+            calls.append(text)
+            return Intent(type="app_control", action="open", entities={"app_name": "微信"},
+                          confidence=0.9, raw_text=text)
+
+        monkeypatch.setattr(llm_client, "is_available", lambda: True)
+        monkeypatch.setattr(parser, "_llm_based_parse", fake_llm_parse)
+
+        first = asyncio.run(parser.parse("帮我弄一下微信"))
+        second = asyncio.run(parser.parse("请帮我 弄一下微信！"))
+        assert len(calls) == 1
+        assert second.type == first.type == "app_control"
+        assert second.raw_text == "请帮我 弄一下微信！"
+        stats = parser.get_stats()
+        assert stats["hits"] == 1 and stats["llm_saved"] == 1
+
+    def test_llm_failure_not_cached(self, monkeypatch):
+        """测试LLM增强失败的结果不缓存"""
+        parser = IntentParser()
+        calls = []
+
+        async def failing_llm_parse(text, fallback_intent):
+            calls.append(text)
+            return fallback_intent
+
+        monkeypatch.setattr(llm_client, "is_available", lambda: True)
+        monkeypatch.setattr(parser, "_llm_based_parse", failing_llm_parse)
+
+        asyncio.run(parser.parse("随便聊聊"))
+        asyncio.run(parser.parse("随便聊聊"))
+        assert len(calls) == 2
@@ -0,0 +1,83 @@
+"""
+快速路径路由测试
+"""
+import asyncio
+import pytest
+from app.tools import app_control, media_control, scene_manager, file_operation  # 注册工具
+from app.services.ai.intent_router import IntentRouter
+from app.services.ai.agent_service import agent_service
+
+
+class TestIntentRouter:
+    """路由器测试类"""
+
+    @pytest.fixture
+    def router(self):
+        """创建路由器实例"""
+        return IntentRouter()
+
+    @pytest.mark.parametrize("text", ["打开记事本", "音量调到50", "几点了", "学习模式"])
+    def test_simple_commands_take_fast_path(self, router, text):
+        """测试参数完整的单步指令走快速路径"""
+        assert router.route(text).path == "fast_path"
+
+    @pytest.mark.parametrize("text, reason", [
+        ("打开微信然后搜索天气", "multi_step"),
+        ("搜索Python教程", "ambiguous"),
+        ("今天天气怎么样", "ambiguous"),
+        ("调节音量", "missing_entities"),
+        ("打开", "missing_entities"),
+        ("帮我想想周末去哪玩", "low_confidence"),
+    ])
+    def test_unclear_requests_go_to_agent(self, router, text, reason):
+        """测试含糊、缺参数或多步骤的请求交给Agent"""
+        decision = router.route(text)
+
+        assert decision.path == "agent"
+        assert decision.reason == reason
+
+    @pytest.mark.parametrize("text, entities", [
+        ("新建文件test.txt", {"file_name": "test.txt"}),
+        ("把音量调到50", {"volume": 50}),
+        ("请打开微信吧", {"app_name": "微信"}),
+    ])
+    def test_fast_path_uses_captured_entities(self, router, text, entities):
+        """测试快速路径只使用指令形式完整捕获的实体，不带规则解析残留的文字"""
+        decision = router.route(text)
+
+        assert decision.path == "fast_path"
+        assert decision.intent.entities == entities
+
+    @pytest.mark.parametrize("text", ["新建 my notes.txt", "音量调到五十"])
+    def test_unmatched_form_goes_to_agent(self, router, text):
+        """测试实体无法完整捕获的指令交给Agent"""
+        decision = router.route(text)
+
+        assert decision.path == "agent"
+        assert decision.reason == "missing_entities"
+
+    def test_select_relevant_tools(self, router):
+        """测试只选出与指令相关的工具"""
+        assert router.select_tools("把音量调大然后暂停播放") == ["media_control"]
+        assert set(router.select_tools("打开微信然后截图")) == {"app_control", "media_control"}
+
+    def test_select_all_tools_when_unclear(self, router):
+        """测试置信度低时使用全部工具"""
+        assert router.select_tools("帮我想想周末去哪玩") is None
+
+    def test_agent_unavailable(self, router):
+        """测试Agent不可用时使用简化模式"""
+        assert router.route("打开记事本", agent_available=False).path == "simple"
+
+    def test_fast_path_skips_agent(self, monkeypatch):
+        """测试快速路径不调用Agent，并在结果中返回路由信息"""
+        class ExplodingExecutor:
+            def astream_events(self, *args, **kwargs):
+                raise AssertionError("不应调用Agent")
+
+        monkeypatch.setattr(agent_service, "agent_executor", ExplodingExecutor())
+        result = asyncio.run(agent_service.execute("几点了"))
+
+        assert result["success"]
+        assert result["output"].startswith("现在是")
+        assert result["route"]["path"] == "fast_path"
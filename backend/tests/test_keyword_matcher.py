@@ -0,0 +1,64 @@
+"""
+多关键词匹配测试
+"""
+from app.utils.keyword_matcher import KeywordMatcher, longest_matches
+from app.services.ai.intent_parser import IntentParser
+
+
+class TestKeywordMatcher:
+    """Aho–Corasick匹配器测试类"""
+
+    def test_find_all_overlapping(self):
+        """测试一次扫描找出全部（含重叠的）命中"""
+        matcher = KeywordMatcher([("he", 1), ("she", 2), ("his", 3), ("hers", 4)])
+        hits = sorted(matcher.find_all("ushers"))
+        assert hits == [(1, 4, 2), (2, 4, 1), (2, 6, 4)]
+
+    def test_add_after_build(self):
+        """测试构建后追加关键词"""
+        matcher = KeywordMatcher([("微信", "wechat")])
+        matcher.add("企业微信", "wecom")
+        assert {payload for _, _, payload in matcher.find_all("打开企业微信")} == {"wechat", "wecom"}
+
+    def test_longest_matches(self):
+        """测试被更长命中覆盖的命中被去掉，相同位置的命中都保留"""
+        hits = [(0, 2, "browser"), (0, 2, "file"), (0, 4, "file_long"), (5, 7, "other")]
+        assert longest_matches(hits) == [(0, 4, "file_long"), (5, 7, "other")]
+        assert longest_matches(hits[:2]) == hits[:2]
+
+    def test_many_patterns(self):
+        """测试大量关键词（如应用别名）"""
+        matcher = KeywordMatcher((f"应用{i}号", i) for i in range(5000))
+        assert [payload for _, _, payload in matcher.find_all("打开应用4321号")] == [4321]
+
+
+class TestIntentScoring:
+    """意图打分测试类"""
+
+    def test_longer_keyword_wins(self):
+        """测试"搜索文件"识别为文件操作，而不取决于意图定义顺序"""
+        parser = IntentParser()
+        intent = parser.parse_rules("搜索文件报告")
+        assert (intent.type, intent.action) == ("file_operation", "search")
+        assert intent.entities["file_name"] == "报告"
+        assert parser.candidate_types("搜索文件报告") == ["file_operation"]
+
+        intent = parser.parse_rules("打开文件笔记.txt")
+        assert (intent.type, intent.action) == ("file_operation", "open")
+
+    def test_tie_prefers_browser(self):
+        """测试同分时网页搜索和网站优先于文件搜索和打开应用"""
+        parser = IntentParser()
+        intent = parser.parse_rules("搜索Python教程")
+        assert (intent.type, intent.action) == ("browser_control", "search")
+        assert intent.entities["query"] == "Python教程"
+
+        intent = parser.parse_rules("打开微博网站")
+        assert (intent.type, intent.action) == ("browser_control", "open")
+
+    def test_add_patterns(self):
+        """测试追加关键词后立即生效"""
+        parser = IntentParser()
+        parser.add_patterns("app_control", {"唤起": "open"})
+        intent = parser.parse_rules("唤起微信")
+        assert (intent.type, intent.action) == ("app_control", "open")
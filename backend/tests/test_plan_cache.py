@@ -0,0 +1,123 @@
+"""
+执行计划缓存测试
+"""
+import asyncio
+import pytest
+from app.tools.base_tool import BaseTool, ToolResult, tool_registry
+from app.services.ai.agent_service import agent_service
+from app.services.ai.plan_cache import PlanCache
+from app.utils.text_normalizer import normalize_text
+
+
+class CountingTool(BaseTool):
+    """记录调用次数的测试工具"""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "counter"
+        self.description = "测试工具"
+        self.parameters = {"type": "object", "properties": {"target": {"type": "string"}}}
+        self.calls = []
+
+    async def execute(self, **kwargs) -> ToolResult:
+        self.calls.append(kwargs)
+        return ToolResult(success=True, message="完成")
+
+
+class TestPlanCache:
+    """执行计划缓存测试类"""
+
+    @pytest.fixture
+    def tool(self, monkeypatch):
+        tool = CountingTool()
+        monkeypatch.setattr(tool_registry, "tools", {"counter": tool})
+        return tool
+
+    @staticmethod
+    def steps(result="成功: 完成"):
+        return [{"tool": "counter", "tool_input": {"target": "微信"}, "result": result}]
+
+    def test_normalize_text(self):
+        """测试礼貌用语、语气词、空白和全角字符被归一"""
+        assert normalize_text("请帮我 打开微信吧！") == "打开微信"
+        assert normalize_text("打开ＷeChat") == "打开wechat"
+        assert normalize_text("打开微信") == normalize_text("麻烦打开微信。")
+
+    def test_lookup_after_record(self, tool):
+        """测试说法不同的同一指令命中缓存"""
+        cache = PlanCache()
+        assert cache.record("帮我打开微信然后静音", self.steps(), "好的")
+
+        plan = cache.lookup("请打开微信然后静音吧")
+        assert plan["steps"] == [{"tool": "counter", "tool_input": {"target": "微信"}}]
+        assert plan["output"] == "好的"
+
+    def test_skip_failed_and_contextual(self, tool):
+        """测试失败的计划和依赖上下文的指令不缓存"""
+        cache = PlanCache()
+        assert not cache.record("打开微信然后静音", self.steps("失败: 未找到"), "失败")
+        assert not cache.record("把它关掉", self.steps(), "好的")
+        assert cache.lookup("打开微信然后静音") is None
+
+    def test_tool_change_invalidates(self, tool):
+        """测试工具定义变化后旧计划失效"""
+        cache = PlanCache()
+        cache.record("打开微信然后静音", self.steps(), "好的")
+
+        changed = CountingTool()
+        changed.parameters = {"type": "object", "properties": {"app": {"type": "string"}}}
+        tool_registry.register(changed)
+        assert cache.lookup("打开微信然后静音") is None
+
+    def test_execute_stream_replays_plan(self, tool, monkeypatch):
+        """测试Agent执行成功后，重复指令不再调用Agent"""
+        cache = PlanCache()
+        monkeypatch.setattr("app.services.ai.agent_service.plan_cache", cache)
+        monkeypatch.setattr(agent_service, "agent_available", lambda: True)
+        agent_calls = []
+
+        async def fake_agent(user_input, chat_history=None):
+            agent_calls.append(user_input)
+            result = await tool.safe_execute(target="微信")
+            yield {"type": "final", "output": "已完成",
+                   "intermediate_steps": self.steps(f"成功: {result.message}"), "success": True,
+                   "complete": True}
+
+        monkeypatch.setattr(agent_service, "_stream_agent", fake_agent)
+
+        async def run(text):
+            return [event async for event in agent_service.execute_stream(text)]
+
+        first = asyncio.run(run("打开微信然后静音"))
+        second = asyncio.run(run("请打开微信然后静音"))
+
+        assert first[-1]["route"]["path"] == "agent"
+        assert second[-1]["route"]["path"] == "plan_cache"
+        assert second[-1]["output"] == "已完成"
+        assert [e["type"] for e in second] == ["tool_start", "tool_end", "final"]
+        assert len(agent_calls) == 1
+        assert len(tool.calls) == 2
+
+    def test_truncated_run_not_recorded(self, tool, monkeypatch):
+        """测试达到最大轮数等未自然结束的执行不写入计划缓存"""
+        cache = PlanCache()
+        monkeypatch.setattr("app.services.ai.agent_service.plan_cache", cache)
+        monkeypatch.setattr(agent_service, "agent_available", lambda: True)
+        agent_calls = []
+
+        async def fake_agent(user_input, chat_history=None):
+            agent_calls.append(user_input)
+            yield {"type": "final", "output": "步骤较多，已执行部分操作",
+                   "intermediate_steps": self.steps(), "success": True, "complete": False}
+
+        monkeypatch.setattr(agent_service, "_stream_agent", fake_agent)
+
+        async def run(text):
+            return [event async for event in agent_service.execute_stream(text)]
+
+        asyncio.run(run("打开微信然后静音"))
+        second = asyncio.run(run("打开微信然后静音"))
+
+        assert second[-1]["route"]["path"] == "agent"
+        assert len(agent_calls) == 2
+        assert cache.lookup("打开微信然后静音") is None
@@ -0,0 +1,83 @@
+"""
+提示词包测试
+"""
+import pytest
+from app.config import settings
+from app.tools.base_tool import BaseTool, ToolResult, tool_registry
+from app.services.ai.prompt_bundle import PromptBundleCache
+
+
+class NamedTool(BaseTool):
+    """只有名称和描述的测试工具"""
+
+    def __init__(self, name: str, description: str):
+        super().__init__()
+        self.name = name
+        self.description = description
+        self.parameters = {"type": "object", "properties": {}}
+
+    async def execute(self, **kwargs) -> ToolResult:
+        return ToolResult(success=True, message="完成")
+
+
+class TestPromptBundle:
+    """提示词包测试类"""
+
+    @pytest.fixture(autouse=True)
+    def tools(self, monkeypatch):
+        monkeypatch.setattr(tool_registry, "tools", {
+            "media": NamedTool("media", "多媒体控制"),
+            "app": NamedTool("app", "应用控制"),
+        })
+
+    def test_prompt_lists_registered_tools(self):
+        """测试系统提示词由注册表生成，工具按名称排序"""
+        bundle = PromptBundleCache().get()
+        assert "- app: 应用控制\n- media: 多媒体控制" in bundle.system_prompt
+        assert [tool["function"]["name"] for tool in bundle.tools] == ["app", "media"]
+        assert bundle.schemas["media"]["description"] == "多媒体控制"
+
+    def test_bundle_reused_until_tools_change(self):
+        """测试工具不变时复用同一提示词包，注册新工具后重新生成"""
+        cache = PromptBundleCache()
+        first = cache.get()
+        assert cache.get() is first
+
+        tool_registry.register(NamedTool("browser", "浏览器控制"))
+        second = cache.get()
+        assert second.version != first.version
+        assert "- browser: 浏览器控制" in second.system_prompt
+        # 前缀与工具注册顺序无关
+        assert second.system_prompt.startswith(first.system_prompt.split("- app")[0])
+
+    def test_in_place_change_regenerates(self):
+        """测试schema只生成一次，原地修改工具描述并invalidate后重新生成提示词包"""
+        cache = PromptBundleCache()
+        first = cache.get()
+        assert tool_registry.get_schemas() is tool_registry.get_schemas()
+
+        tool_registry.get_tool("media").description = "音乐和视频控制"
+        assert cache.get() is first
+        tool_registry.invalidate()
+        second = cache.get()
+        assert second.version != first.version
+        assert "- media: 音乐和视频控制" in second.system_prompt
+
+    def test_footer_follows_summary_setting(self, monkeypatch):
+        """测试关闭LLM总结时，提示词不再要求总结，而是一次调用全部工具"""
+        cache = PromptBundleCache()
+        monkeypatch.setattr(settings, "AGENT_LLM_SUMMARY", True)
+        assert "总结结果" in cache.get().system_prompt
+
+        monkeypatch.setattr(settings, "AGENT_LLM_SUMMARY", False)
+        prompt = cache.get().system_prompt
+        assert "总结结果" not in prompt
+        assert "同时调用完成任务所需的全部工具" in prompt
+
+    def test_select_tools_subset(self):
+        """测试工具子集保持排序，相同子集复用同一列表"""
+        bundle = PromptBundleCache().get()
+        subset = bundle.select_tools(["media", "app"])
+        assert [tool["function"]["name"] for tool in subset] == ["app", "media"]
+        assert bundle.select_tools(["app", "media"]) is subset
+        assert bundle.select_tools(None) is bundle.tools
@@ -0,0 +1,44 @@
+"""
+回复合成器测试
+"""
+import json
+from app.services.ai.reply_synthesizer import ReplySynthesizer
+
+
+class TestReplySynthesizer:
+    """回复合成器测试类"""
+
+    def test_compose_steps(self):
+        """测试成功步骤使用工具消息，失败步骤说明原因"""
+        steps = [
+            {"tool": "app_control", "tool_input": {"action": "open"}, "result": "成功: 已成功打开 微信"},
+            {"tool": "media_control", "tool_input": {"action": "volume"}, "result": "失败: 音量级别必须在0-100之间"},
+        ]
+        reply = ReplySynthesizer().compose(steps)
+        assert reply == "已成功打开 微信；多媒体控制失败：音量级别必须在0-100之间"
+
+    def test_custom_templates(self):
+        """测试按 工具/动作 配置模板，可引用工具参数"""
+        synthesizer = ReplySynthesizer(success_templates={"media_control/volume": "好的，音量已调到{level}"})
+        reply = synthesizer.render("media_control", {"action": "volume", "level": 30}, True, "已将音量设置为 30%")
+        assert reply == "好的，音量已调到30"
+        assert synthesizer.render("app_control", {"action": "open"}, True, "已成功打开 微信") == "已成功打开 微信"
+
+    def test_templates_from_file(self, tmp_path):
+        """测试从配置文件覆盖模板和操作名，格式错误的模板被跳过"""
+        path = tmp_path / "reply_templates.json"
+        path.write_text(json.dumps({
+            "success": {"media_control/volume": "好的，音量已调到{level}", "app_control": "{message"},
+            "failure": {"*": "抱歉，{label}没有成功：{error}"},
+            "labels": {"media_control": "音量调节"}
+        }, ensure_ascii=False), encoding="utf-8")
+        synthesizer = ReplySynthesizer(templates_path=str(path))
+
+        assert synthesizer.render("media_control", {"action": "volume", "level": 30}, True, "已设置") == "好的，音量已调到30"
+        assert synthesizer.render("media_control", {}, False, "超出范围") == "抱歉，音量调节没有成功：超出范围"
+        assert synthesizer.render("app_control", {"action": "open"}, True, "已成功打开 微信") == "已成功打开 微信"
+
+    def test_missing_template_file(self, tmp_path):
+        """测试模板文件不存在时使用内置模板"""
+        synthesizer = ReplySynthesizer(templates_path=str(tmp_path / "missing.json"))
+        assert synthesizer.render("media_control", {}, False, "超出范围") == "多媒体控制失败：超出范围"
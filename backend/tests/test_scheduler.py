@@ -0,0 +1,74 @@
+"""
+执行调度器测试
+"""
+import asyncio
+import pytest
+from app.services.ai.scheduler import (
+    AgentScheduler, SchedulerBusyError, PRIORITY_VOICE, PRIORITY_CHAT, PRIORITY_BATCH
+)
+
+
+class TestAgentScheduler:
+    """执行调度器测试类"""
+
+    def test_priority_order(self):
+        """测试并发已满时，语音任务先于先到的批量任务执行"""
+        scheduler = AgentScheduler(max_concurrency=1, max_pending=10)
+        order = []
+
+        async def job(name, priority):
+            async with scheduler.slot(priority):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            first = asyncio.create_task(job("first", PRIORITY_CHAT))
+            await asyncio.sleep(0)
+            batch = asyncio.create_task(job("batch", PRIORITY_BATCH))
+            await asyncio.sleep(0)
+            voice = asyncio.create_task(job("voice", PRIORITY_VOICE))
+            await asyncio.gather(first, batch, voice)
+
+        asyncio.run(run())
+
+        assert order == ["first", "voice", "batch"]
+        stats = scheduler.get_stats()
+        assert stats["running"] == 0 and stats["queued"] == 0
+        assert stats["wait"]["batch"]["max_ms"] >= stats["wait"]["voice"]["max_ms"]
+
+    def test_reject_when_full(self):
+        """测试执行中和排队的任务达到上限时拒绝"""
+        scheduler = AgentScheduler(max_concurrency=1, max_pending=2)
+
+        async def run():
+            release = asyncio.Event()
+
+            async def hold():
+                async with scheduler.slot():
+                    await release.wait()
+
+            tasks = [asyncio.create_task(hold()) for _ in range(2)]
+            await asyncio.sleep(0)
+            with pytest.raises(SchedulerBusyError):
+                await scheduler.acquire()
+            release.set()
+            await asyncio.gather(*tasks)
+
+        asyncio.run(run())
+        assert scheduler.get_stats()["rejected"] == 1
+
+    def test_cancelled_waiter_frees_queue(self):
+        """测试排队中被取消的任务不占用执行槽"""
+        scheduler = AgentScheduler(max_concurrency=1, max_pending=10)
+
+        async def run():
+            await scheduler.acquire()
+            waiter = asyncio.create_task(scheduler.acquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            scheduler.release()
+
+        asyncio.run(run())
+        stats = scheduler.get_stats()
+        assert stats["running"] == 0 and stats["queued"] == 0
@@ -0,0 +1,89 @@
+"""
+语音识别服务测试
+"""
+import asyncio
+import math
+import struct
+import pytest
+from app.services.voice.stt_service import STTService, STTResult
+
+
+def make_pcm(seconds: float, amplitude: int, sample_rate: int = 16000) -> bytes:
+    """生成16bit PCM测试音频（amplitude为0时为静音）"""
+    count = int(sample_rate * seconds)
+    return b"".join(
+        struct.pack("<h", int(amplitude * math.sin(i / 5))) for i in range(count)
+    )
+
+
+async def chunked(audio: bytes, size: int = 3200):
+    """按块产出音频（3200字节 = 100ms）"""
+    for i in range(0, len(audio), size):
+        yield audio[i:i + size]
+
+
+class TestSTTStream:
+    """流式识别测试类"""
+
+    @pytest.fixture
+    def service(self):
+        """创建识别服务，识别结果为收到的音频长度"""
+        svc = STTService()
+
+        async def fake_recognize(audio_data, audio_format="wav"):
+            return STTResult(text=f"len{len(audio_data)}", confidence=0.9)
+
+        svc.recognize = fake_recognize
+        return svc
+
+    def collect(self, service, audio: bytes):
+        async def run():
+            return [r async for r in service.recognize_stream(chunked(audio))]
+        return asyncio.run(run())
+
+    def test_silence_yields_nothing(self, service):
+        """测试纯静音不产出结果"""
+        assert self.collect(service, make_pcm(1.0, 0)) == []
+
+    def test_endpoint_splits_utterances(self, service):
+        """测试句尾静音触发最终结果，两句话产出两个最终结果"""
+        audio = make_pcm(0.5, 8000) + make_pcm(0.8, 0) + make_pcm(0.5, 8000)
+        finals = [r for r in self.collect(service, audio) if r.is_final]
+
+        assert len(finals) == 2
+
+    def test_partial_results_before_final(self, service):
+        """测试长句在最终结果前产出中间结果"""
+        results = self.collect(service, make_pcm(2.0, 8000))
+
+        assert any(not r.is_final for r in results)
+        assert results[-1].is_final
+
+    def test_partial_does_not_block_intake(self):
+        """测试中间识别在后台执行，识别期间继续接收音频"""
+        svc = STTService()
+        received = []
+        overlaps = []
+
+        async def slow_recognize(audio_data, audio_format="wav"):
+            before = len(received)
+            await asyncio.sleep(0.05)
+            overlaps.append(len(received) - before)
+            return STTResult(text=f"len{len(audio_data)}", confidence=0.9)
+
+        async def realtime(audio: bytes, size: int = 3200):
+            for i in range(0, len(audio), size):
+                await asyncio.sleep(0.01)
+                received.append(i)
+                yield audio[i:i + size]
+
+        svc.recognize = slow_recognize
+
+        async def run():
+            return [r async for r in svc.recognize_stream(realtime(make_pcm(2.0, 8000)))]
+
+        results = asyncio.run(run())
+
+        assert any(not r.is_final for r in results)
+        assert results[-1].is_final
+        assert max(overlaps) > 0
@@ -0,0 +1,71 @@
+"""
+Tool Calling Agent测试
+"""
+import asyncio
+import json
+import time
+import pytest
+from app.tools.base_tool import tool_registry
+from app.services.ai.llm_client import llm_client
+from app.services.ai.tool_agent import ToolCallingAgent
+from tests.conftest import SleepTool
+
+
+class TestToolCallingAgent:
+    """Tool Calling Agent测试类"""
+
+    @pytest.fixture
+    def llm_requests(self, monkeypatch):
+        """模拟LLM：第一轮同时请求两个工具，第二轮总结"""
+        requests = []
+
+        async def fake_stream(messages, tools):
+            requests.append([dict(m) for m in messages])
+            if len(requests) == 1:
+                yield {"type": "message", "content": "", "tool_calls": [
+                    {"id": "c1", "name": "slow", "arguments": json.dumps({"delay": 0.15})},
+                    {"id": "c2", "name": "fast", "arguments": json.dumps({"delay": 0.1})},
+                ]}
+            else:
+                yield {"type": "token", "delta": "都好了"}
+                yield {"type": "message", "content": "都好了", "tool_calls": []}
+
+        monkeypatch.setattr(llm_client, "chat_with_tools_stream", fake_stream)
+        monkeypatch.setattr(tool_registry, "tools", {"slow": SleepTool("slow"), "fast": SleepTool("fast")})
+        return requests
+
+    def test_parallel_tool_calls_in_order(self, llm_requests):
+        """测试同一回复中的工具并发执行，结果按调用顺序返回"""
+        agent = ToolCallingAgent("system")
+
+        async def run():
+            return [event async for event in agent.astream("打开微信并把音量调到30")]
+
+        start = time.perf_counter()
+        events = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.22  # 串行执行需要0.25秒
+        assert [e["type"] for e in events] == [
+            "tool_start", "tool_start", "tool_end", "tool_end", "token", "final"
+        ]
+        assert [e["tool"] for e in events if e["type"] == "tool_end"] == ["slow", "fast"]
+
+        tool_messages = [m for m in llm_requests[1] if m["role"] == "tool"]
+        assert [m["tool_call_id"] for m in tool_messages] == ["c1", "c2"]
+        assert len(llm_requests) == 2
+        assert events[-1]["output"] == "都好了"
+        assert len(events[-1]["intermediate_steps"]) == 2
+
+    def test_template_reply_skips_summary(self, llm_requests):
+        """测试关闭LLM总结时，一轮工具执行完即结束并用模板生成回复"""
+        agent = ToolCallingAgent("system", summarize=False)
+
+        async def run():
+            return [event async for event in agent.astream("打开微信并把音量调到30")]
+
+        events = asyncio.run(run())
+
+        assert len(llm_requests) == 1
+        assert events[-1]["output"] == "slow完成；fast完成"
+        assert events[-1]["complete"] is True
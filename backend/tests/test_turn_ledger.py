@@ -0,0 +1,74 @@
+"""
+对话统计台账测试
+"""
+import asyncio
+from app.utils.turn_metrics import begin_turn, current_turn
+from app.services.ai.llm_client import llm_client
+from app.services.ai.turn_ledger import turn_ledger
+from tests.conftest import SleepTool
+
+
+class TestTurnLedger:
+    """对话统计测试类"""
+
+    def test_tool_and_llm_recorded_in_turn(self):
+        """测试工具耗时和LLM用量记录到当前轮次，并发子任务也计入"""
+        async def flow():
+            metrics = begin_turn("s1", "qwen-turbo")
+            tool = SleepTool(delay=0.02)
+            await asyncio.gather(tool.safe_execute(), tool.safe_execute())
+            current_turn().record_llm(120.0, {"prompt_tokens": 300, "completion_tokens": 20})
+            return metrics.finish().to_dict()
+
+        data = asyncio.run(flow())
+
+        assert data["tools"]["sleeper"] >= 40
+        assert data["llm_calls"] == 1
+        assert data["prompt_tokens"] == 300
+        assert data["total_ms"] >= 20
+
+    def test_cached_tokens_from_both_usage_shapes(self):
+        """测试DeepSeek和OpenAI兼容接口两种缓存命中字段都计入"""
+        class Details:
+            def __init__(self):
+                self.cached_tokens = 200
+
+        class Usage:
+            def __init__(self):
+                self.prompt_tokens = 300
+                self.prompt_tokens_details = Details()
+
+        metrics = begin_turn("s1", "qwen-turbo")
+        metrics.record_llm(100.0, {"prompt_tokens": 300, "prompt_cache_hit_tokens": 256})
+        details = {"prompt_tokens": 300, "prompt_tokens_details": {"cached_tokens": 128}}
+        metrics.record_llm(100.0, llm_client._usage_dict(details))
+        metrics.record_llm(100.0, llm_client._usage_dict(Usage()))
+
+        assert metrics.cached_tokens == 256 + 128 + 200
+
+    def test_persist_and_aggregate(self, db_context_mgr, run_db):
+        """测试统计随对话一起保存，可按路由和工具汇总"""
+        async def flow():
+            for route, tokens in (("agent", 500), ("fast_path", 0), ("agent", 700)):
+                metrics = begin_turn("s1", "qwen-turbo")
+                metrics.route = route
+                if tokens:
+                    metrics.record_llm(800.0, {"prompt_tokens": tokens, "completion_tokens": 30})
+                metrics.record_tool("app_control", 50.0)
+                await db_context_mgr.commit_turn("s1", "打开微信", "好的", None, metrics.finish())
+            return (
+                await turn_ledger.aggregate("route"),
+                await turn_ledger.aggregate("tool"),
+                await turn_ledger.aggregate("hour"),
+                await turn_ledger.recent("s1")
+            )
+
+        routes, tools, hours, recent = run_db(flow())
+
+        by_route = {row["route"]: row for row in routes}
+        assert by_route["agent"]["turns"] == 2
+        assert by_route["agent"]["prompt_tokens"] == 1200
+        assert by_route["fast_path"]["llm_calls"] == 0
+        assert tools == [{"tool": "app_control", "turns": 3, "total_ms": 150.0, "avg_ms": 50.0, "max_ms": 50.0}]
+        assert sum(row["turns"] for row in hours) == 3
+        assert len(recent) == 3 and recent[0]["tools"] == {"app_control": 50.0}
@@ -6,8 +6,11 @@ import { useAppStore } from '../store/useAppStore';
 import { useChatStore } from '../store/useChatStore';
 import { AudioCapture } from '../services/audioCapture';
 import { api } from '../services/api';
+import { wsClient } from '../services/websocket';
 
 let audioCapture: AudioCapture | null = null;
+// 本次录音是否通过WebSocket流式识别（否则录音结束后整段上传）
+let streaming = false;
 
 export const VoiceButton: React.FC = () => {
   const [isInitialized, setIsInitialized] = useState(false);
@@ -18,7 +21,16 @@ export const VoiceButton: React.FC = () => {
     // 初始化音频采集
     initAudio();
 
+    // 流式识别的最终结果作为用户消息展示，AI回复由chat_response推送
+    const onTranscript = (msg: any) => {
+      if (msg.data?.is_final && msg.data.text) {
+        addMessage({ role: 'user', content: msg.data.text });
+      }
+    };
+    wsClient.on('transcript', onTranscript);
+
     return () => {
+      wsClient.off('transcript', onTranscript);
       if (audioCapture) {
         audioCapture.destroy();
       }
@@ -35,6 +47,10 @@ export const VoiceButton: React.FC = () => {
 
       audioCapture.onDataAvailable = async (blob) => {
         console.log('📦 Audio recorded:', blob.size, 'bytes');
+        if (streaming) {
+          streaming = false;
+          return;
+        }
 
         try {
           setThinking(true);
@@ -113,14 +129,26 @@ export const VoiceButton: React.FC = () => {
 
   const handleMouseDown = () => {
     if (!isInitialized || !audioCapture) return;
+    if (audioCapture.getRecordingState()) return;
+
+    // WebSocket可用时边录边传PCM，松开按键即可很快拿到识别结果
+    streaming = wsClient.send({ type: 'audio_start', data: { sample_rate: 16000 } });
+    audioCapture.onPcmChunk = streaming
+      ? (chunk) => wsClient.sendBinary(chunk)
+      : undefined;
+
     audioCapture.startRecording();
     setRecording(true);
   };
 
   const handleMouseUp = () => {
     if (!isInitialized || !audioCapture) return;
+    if (!audioCapture.getRecordingState()) return;
     audioCapture.stopRecording();
     setRecording(false);
+    if (streaming) {
+      wsClient.send({ type: 'audio_end', data: {} });
+    }
   };
 
   // 优化：支持键盘快捷键（空格键）
@@ -13,6 +13,11 @@ export class AudioCapture {
   public onDataAvailable?: (blob: Blob) => void;
   public onError?: (error: Error) => void;
   public onVolumeChange?: (volume: number) => void;
+  // 设置后录音期间实时输出16kHz 16bit单声道PCM块（用于WebSocket流式识别）
+  public onPcmChunk?: (chunk: ArrayBuffer) => void;
+
+  private pcmProcessor: ScriptProcessorNode | null = null;
+  private pcmSource: MediaStreamAudioSourceNode | null = null;
 
   async initialize(): Promise<void> {
     try {
@@ -73,6 +78,7 @@ export class AudioCapture {
     this.mediaRecorder.start();
     this.isRecording = true;
     this.startVolumeMonitoring();
+    this.startPcmStreaming();
 
     console.log('🎤 Recording started');
   }
@@ -85,6 +91,7 @@ export class AudioCapture {
     this.mediaRecorder.stop();
     this.isRecording = false;
     this.stopVolumeMonitoring();
+    this.stopPcmStreaming();
 
     console.log('⏹️ Recording stopped');
   }
@@ -122,6 +129,37 @@ export class AudioCapture {
     }
   }
 
+  private startPcmStreaming(): void {
+    if (!this.onPcmChunk || !this.audioContext || !this.mediaStream) return;
+
+    this.pcmSource = this.audioContext.createMediaStreamSource(this.mediaStream);
+    // 4096帧@16kHz ≈ 256ms一块
+    this.pcmProcessor = this.audioContext.createScriptProcessor(4096, 1, 1);
+    this.pcmProcessor.onaudioprocess = (event) => {
+      const input = event.inputBuffer.getChannelData(0);
+      const pcm = new Int16Array(input.length);
+      for (let i = 0; i < input.length; i++) {
+        const sample = Math.max(-1, Math.min(1, input[i]));
+        pcm[i] = sample < 0 ? sample * 0x8000 : sample * 0x7fff;
+      }
+      this.onPcmChunk?.(pcm.buffer);
+    };
+    this.pcmSource.connect(this.pcmProcessor);
+    this.pcmProcessor.connect(this.audioContext.destination);
+  }
+
+  private stopPcmStreaming(): void {
+    if (this.pcmProcessor) {
+      this.pcmProcessor.disconnect();
+      this.pcmProcessor.onaudioprocess = null;
+      this.pcmProcessor = null;
+    }
+    if (this.pcmSource) {
+      this.pcmSource.disconnect();
+      this.pcmSource = null;
+    }
+  }
+
   getRecordingState(): boolean {
     return this.isRecording;
   }
@@ -11,6 +11,8 @@ export class WebSocketClient {
   private reconnectAttempts = 0;
   private maxReconnectAttempts = Number.MAX_SAFE_INTEGER; // 无限重连
   private reconnectDelay = 2000;
+  // 服务端分配的会话ID，重连时带上以恢复上下文并接收断线期间的结果
+  private sessionId: string | null = null;
 
   constructor(url?: string) {
     const protocol = location.protocol === 'https:' ? 'wss' : 'ws';
@@ -34,7 +36,10 @@ export class WebSocketClient {
   connect(): Promise<void> {
     return new Promise((resolve) => {
       try {
-        this.ws = new WebSocket(this.url);
+        const url = this.sessionId
+          ? `${this.url}${this.url.includes('?') ? '&' : '?'}session_id=${encodeURIComponent(this.sessionId)}`
+          : this.url;
+        this.ws = new WebSocket(url);
 
         this.ws.onopen = () => {
           console.log('✅ WebSocket connected');
@@ -73,6 +78,9 @@ export class WebSocketClient {
 
   private handleMessage(message: any) {
     const type = message.type;
+    if (type === 'session' && message.data?.session_id) {
+      this.sessionId = message.data.session_id;
+    }
     const handlers = this.handlers.get(type) || [];
     handlers.forEach(handler => handler(message));
 
@@ -112,6 +120,14 @@ export class WebSocketClient {
     }
   }
 
+  sendBinary(data: ArrayBuffer): boolean {
+    if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+      this.ws.send(data);
+      return true;
+    }
+    return false;
+  }
+
   private heartbeatInterval: any = null;
 
   private startHeartbeat() {
@@ -141,6 +157,10 @@ export class WebSocketClient {
     }
   }
 
+  getSessionId(): string | null {
+    return this.sessionId;
+  }
+
   isConnected(): boolean {
     return this.ws !== null && this.ws.readyState === WebSocket.OPEN;
   }